@@ -6,6 +6,7 @@ from collections import deque
 from bleak import BleakClient
 import sys
 import keyboard  # pip install keyboard
+from Sensorsv2.hrv import parse_heart_rate_measurement, HrvEngine
 
 if sys.platform.startswith('win'):
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
@@ -25,6 +26,7 @@ RMSSD_THRESHOLD = 20  # ms, estrés si RMSSD < 20
 gsr_buffer = deque(maxlen=WINDOW_SIZE * 10)
 hr_buffer = deque(maxlen=WINDOW_SIZE * 10)
 timestamps = deque(maxlen=WINDOW_SIZE * 10)
+hrv_engine = HrvEngine(window_beats=WINDOW_SIZE * 10)  # RMSSD from the RR intervals sent by the H10
 
 # CSV
 saving = False
@@ -32,19 +34,12 @@ csv_writer = None
 csv_file = None
 
 def parse_hr(data):
-    flag = data[0]
-    hr_format = flag & 0x01
-    return data[1] if hr_format == 0 else int.from_bytes(data[1:3], byteorder='little')
+    # Heart rate plus the RR intervals (1/1024 s) of every beat in the notification
+    return parse_heart_rate_measurement(data)
 
-def calculate_rmssd(hr_list):
-    if len(hr_list) < 2:
-        return None
-    rr_intervals = [60000 / hr for hr in hr_list if hr > 0]
-    diff_rr = [j - i for i, j in zip(rr_intervals[:-1], rr_intervals[1:])]
-    return (sum(d**2 for d in diff_rr) / len(diff_rr))**0.5 if diff_rr else None
-
-async def read_gsr():
-    async with BleakClient(ESP32_MAC) as client:
+async def read_gsr(address=ESP32_MAC, client_factory=BleakClient):
+    # client_factory: BleakClient, or a Sensorsv2.ble_simulator backend's for load tests
+    async with client_factory(address) as client:
         print(f"✅ Conectado al ESP32")
         while True:
             try:
@@ -56,13 +51,18 @@ async def read_gsr():
                 print(f"⚠️ GSR error: {e}")
             await asyncio.sleep(0.1)
 
-async def read_hr():
-    async with BleakClient(POLAR_MAC) as client:
+async def read_hr(address=POLAR_MAC, client_factory=BleakClient):
+    async with client_factory(address) as client:
         print(f"✅ Conectado al Polar H10")
 
         def callback(sender, data):
-            hr = parse_hr(data)
-            hr_buffer.append(hr)
+            try:
+                measurement = parse_hr(data)
+            except ValueError as e:
+                print(f"⚠️ HR error: {e}")
+                return
+            hr_buffer.append(measurement['heart_rate'])
+            hrv_engine.add(measurement['rr_raw'])
 
         await client.start_notify(HR_UUID, callback)
         while True:
@@ -89,12 +89,12 @@ def keyboard_monitor():
 
 async def stress_detector():
     while True:
-        if len(hr_buffer) >= 2 and len(gsr_buffer) > 0:
-            rmssd = calculate_rmssd(list(hr_buffer))
+        rmssd = hrv_engine.metrics()['rmssd']
+        if rmssd is not None and len(gsr_buffer) > 0:
             gsr = gsr_buffer[-1]
             hr = hr_buffer[-1]
             ts = timestamps[-1]
-            stress = rmssd is not None and rmssd < RMSSD_THRESHOLD
+            stress = rmssd < RMSSD_THRESHOLD
             status = "🚨 Estrés" if stress else "✅ Normal"
             print(f"{time.strftime('%H:%M:%S')} | GSR: {gsr} | HR: {hr} | RMSSD: {rmssd:.2f} ms | {status}")
             if saving and csv_writer:
@@ -1,47 +1,10 @@
 import cv2
 import mediapipe as mp
-import numpy as np
-import math
+from vision_metrics import hand_orientation  # shared with frame_bus.HandOrientationAnalyzer
 
 mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
 
-# Utilidad para calcular ángulo entre 3 puntos (en grados)
-def calculate_angle(p1, p2, p3):
-    v1 = np.array([p1.x - p2.x, p1.y - p2.y, p1.z - p2.z])
-    v2 = np.array([p3.x - p2.x, p3.y - p2.y, p3.z - p2.z])
-    angle_rad = math.atan2(np.linalg.norm(np.cross(v1, v2)), np.dot(v1, v2))
-    return np.degrees(angle_rad)
-
-# Función para obtener Pitch, Roll, Yaw de la mano
-def hand_orientation(landmarks):
-    # Tomamos landmarks clave: Wrist(0), Index MCP(5), Pinky MCP(17), Middle MCP(9)
-    wrist = landmarks[0]
-    index_mcp = landmarks[5]
-    pinky_mcp = landmarks[17]
-    middle_mcp = landmarks[9]
-
-    # Vector base de la mano (del wrist al middle_mcp)
-    hand_vector = np.array([middle_mcp.x - wrist.x, middle_mcp.y - wrist.y, middle_mcp.z - wrist.z])
-
-    # Vector lateral (index_mcp a pinky_mcp)
-    lateral_vector = np.array([pinky_mcp.x - index_mcp.x, pinky_mcp.y - index_mcp.y, pinky_mcp.z - index_mcp.z])
-
-    # Normal de la palma (producto cruz)
-    normal_vector = np.cross(hand_vector, lateral_vector)
-
-    # Normalizamos los vectores
-    normal_vector /= np.linalg.norm(normal_vector)
-    hand_vector /= np.linalg.norm(hand_vector)
-    lateral_vector /= np.linalg.norm(lateral_vector)
-
-    # Cálculo de Pitch, Roll, Yaw
-    pitch = math.asin(-normal_vector[1])  # Rotación sobre eje X
-    roll = math.atan2(normal_vector[0], normal_vector[2])  # Rotación sobre eje Z
-    yaw = math.atan2(lateral_vector[1], lateral_vector[0])  # Giro lateral (eje Y)
-
-    return np.degrees(pitch), np.degrees(roll), np.degrees(yaw)
-
 # Inicializamos cámara y MediaPipe Hands
 cap = cv2.VideoCapture(0)
 with mp_hands.Hands(static_image_mode=False, max_num_hands=2, min_detection_confidence=0.7) as hands:
@@ -1,57 +1,99 @@
+import argparse
+import collections
+import threading
 import cv2
 from datetime import datetime
+from Sensorsv2.video_overlay import TimestampOverlay
+from Sensorsv2.video_encoder import open_encoder
+from Sensorsv2.video_preview import PreviewWindow
+
+SEGMENT_SECONDS = 300  # Un archivo nuevo cada 5 minutos
+PREVIEW_FPS = 10       # La vista previa se actualiza a menor ritmo que la grabación
+PREVIEW_SCALE = 0.5    # ...y a menor resolución
 
 def get_timestamp():
     return datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
 
-def main():
+def main(stop_event=None, headless=False, preview_fps=PREVIEW_FPS, preview_scale=PREVIEW_SCALE):
+    """
+    Graba la cámara 0 con timestamp
+
+    Con ventana: 'r' empieza a grabar, 's' detiene, 'q' sale (teclas en la
+    vista previa, que corre en su propio hilo). Sin ventana (headless): graba
+    desde el inicio hasta que se activa stop_event o Ctrl+C.
+    """
+    stop_event = stop_event or threading.Event()
     cap = cv2.VideoCapture(0)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 20.0
     recording = False
     out = None
-    print("Presiona 'r' para comenzar a grabar, 's' para detener, 'q' para salir.")
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("No se pudo acceder a la cámara.")
-            break
-
-        # Obtener y dibujar el timestamp en el video
-        timestamp_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        cv2.putText(frame, timestamp_str, (10, 30), cv2.FONT_HERSHEY_SIMPLEX,
-                    1, (0, 255, 0), 2)
-
-        # Mostrar la imagen
-        cv2.imshow("Grabación", frame)
-
-        key = cv2.waitKey(1) & 0xFF
-
-        if key == ord('r') and not recording:
-            # Empezar a grabar
-            fourcc = cv2.VideoWriter_fourcc(*'XVID')
-            filename = f"grabacion_{get_timestamp()}.avi"
-            out = cv2.VideoWriter(filename, fourcc, 20.0, (frame.shape[1], frame.shape[0]))
-            recording = True
-            print(f"Grabando... ({filename})")
-
-        elif key == ord('s') and recording:
-            # Detener la grabación
-            recording = False
-            out.release()
-            print("Grabación detenida y guardada.")
+    # Etiqueta renderizada una vez por segundo y copiada sobre el frame
+    overlay = TimestampOverlay(position='top_left', font_scale=1, color=(0, 255, 0), thickness=2,
+                               line_type=cv2.LINE_8, background=None, margin=8, padding=0)
 
-        elif key == ord('q'):
-            # Salir
-            if recording:
+    # Las teclas llegan desde el hilo de la vista previa
+    keys = collections.deque()
+    preview = None
+    if headless:
+        print("Grabando sin ventana. Ctrl+C para detener.")
+    else:
+        preview = PreviewWindow("Grabación", preview_fps, preview_scale, on_key=keys.append).start()
+        if not preview.available:
+            print("No hay ventana disponible, usa --headless.")
+            keys.append('q')
+        else:
+            print("Presiona 'r' para comenzar a grabar, 's' para detener, 'q' para salir.")
+
+    try:
+        while not stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                print("No se pudo acceder a la cámara.")
+                break
+
+            # Obtener y dibujar el timestamp en el video
+            overlay(frame)
+
+            key = keys.popleft() if keys else None
+            if (key == 'r' or headless) and not recording:
+                # Empezar a grabar (ffmpeg si está instalado, si no cv2 con XVID)
+                out = open_encoder(f"grabacion_{get_timestamp()}", frame.shape[1], frame.shape[0], fps,
+                                   segment_seconds=SEGMENT_SECONDS, fourcc='XVID')
+                recording = True
+                print(f"Grabando... ({out.pattern}, {out.backend})")
+
+            elif key == 's' and recording:
+                # Detener la grabación
+                recording = False
                 out.release()
-                print("Grabación detenida y guardada antes de salir.")
-            break
+                print("Grabación detenida y guardada.")
 
-        if recording:
-            out.write(frame)
+            elif key == 'q':
+                # Salir
+                break
+
+            if recording:
+                out.write(frame)
+
+            # La vista previa solo toma una referencia al último frame
+            if preview is not None:
+                preview.show(frame)
 
-    cap.release()
-    cv2.destroyAllWindows()
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        if recording:
+            out.release()
+            print("Grabación detenida y guardada antes de salir.")
+        if preview is not None:
+            preview.close()
+        cap.release()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Grabar la cámara con timestamp")
+    parser.add_argument('--headless', action='store_true', help="Sin ventana: graba hasta Ctrl+C")
+    parser.add_argument('--preview-fps', type=float, default=PREVIEW_FPS, help="Frecuencia de la vista previa")
+    parser.add_argument('--preview-scale', type=float, default=PREVIEW_SCALE, help="Escala de la vista previa")
+    args = parser.parse_args()
+    main(headless=args.headless, preview_fps=args.preview_fps, preview_scale=args.preview_scale)
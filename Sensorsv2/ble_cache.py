@@ -0,0 +1,355 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from bleak import BleakClient, BleakScanner
+from bleak.backends.device import BLEDevice
+from bleak.exc import BleakError
+from bleak.uuids import normalize_uuid_str
+
+DEFAULT_CACHE = 'ble_cache.json'
+MAX_AGE_SECONDS = 30 * 24 * 3600  # Rescan a device not confirmed for a month
+
+
+class BleCache:
+    """
+    Persistent device/GATT cache keyed by MAC address
+
+    For every device it stores the name, when it was last confirmed, the
+    BlueZ D-Bus path it was found at (Linux), and the handle and
+    properties of each characteristic per service. With a fresh entry a
+    session can limit service discovery to the services it uses and
+    resolve characteristics by handle instead of walking the whole GATT
+    table; where the backend allows it (see device()) it also connects
+    without scanning.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE, max_age=MAX_AGE_SECONDS):
+        self.path = path
+        self.max_age = max_age
+        try:
+            with open(path) as f:
+                self.devices = json.load(f)
+        except (OSError, ValueError):
+            self.devices = {}
+        self.seen = {}  # BLEDevice objects scanned by this process, by address
+
+    @staticmethod
+    def _key(address):
+        return address.upper()
+
+    def entry(self, address):
+        return self.devices.get(self._key(address))
+
+    def is_fresh(self, address):
+        entry = self.entry(address)
+        return entry is not None and time.time() - entry.get('updated', 0) <= self.max_age
+
+    def handle(self, address, uuid):
+        """Cached handle of a characteristic, or None"""
+        entry = self.entry(address) or {}
+        uuid = normalize_uuid_str(uuid)
+        for characteristics in entry.get('services', {}).values():
+            if uuid in characteristics:
+                return characteristics[uuid]['handle']
+        return None
+
+    def services_for(self, address, uuids):
+        """Service UUIDs that contain the given characteristics, or None if any is unknown"""
+        entry = self.entry(address) or {}
+        wanted = {normalize_uuid_str(u) for u in uuids}
+        if not wanted:
+            return None
+        services = [service for service, characteristics in entry.get('services', {}).items()
+                    if wanted & set(characteristics)]
+        found = set().union(*(entry['services'][s] for s in services)) if services else set()
+        return services if wanted <= found else None
+
+    def device(self, address):
+        """
+        BLEDevice to connect to without scanning, or None
+
+        BleakClient given an address string scans for it before connecting
+        on every backend. A device scanned earlier by this process is
+        reused; otherwise WinRT connects from the address alone and BlueZ
+        from the D-Bus path saved in the entry (valid while BlueZ still
+        knows the device). CoreBluetooth only connects to peripherals
+        returned by a scan, so there it is None.
+        """
+        key = self._key(address)
+        if key in self.seen:
+            return self.seen[key]
+        entry = self.entry(address) or {}
+        if sys.platform == 'win32':
+            return BLEDevice(key, entry.get('name'), None)
+        if sys.platform.startswith('linux') and entry.get('bluez_path'):
+            return BLEDevice(key, entry.get('name'), {'path': entry['bluez_path'], 'props': {}})
+        return None
+
+    def remember(self, device):
+        """Keep a scanned BLEDevice for reconnects by this process"""
+        self.seen[self._key(device.address)] = device
+
+    def forget_device(self, address):
+        """Drop the scanned device and BlueZ path (the OS no longer knows it)"""
+        self.seen.pop(self._key(address), None)
+        (self.entry(address) or {}).pop('bluez_path', None)
+
+    def record(self, client, device=None):
+        """Merge the services discovered by a connected client (and the BLEDevice used) into the cache"""
+        entry = self.devices.setdefault(self._key(client.address), {'name': None, 'services': {}})
+        if getattr(device, 'name', None):
+            entry['name'] = device.name
+        details = getattr(device, 'details', None)
+        if isinstance(details, dict) and details.get('path'):
+            entry['bluez_path'] = details['path']
+        for service in client.services:
+            entry['services'][service.uuid] = {
+                char.uuid: {'handle': char.handle, 'properties': list(char.properties)}
+                for char in service.characteristics
+            }
+        entry['updated'] = time.time()
+
+    def touch(self, address):
+        """Mark an entry as confirmed now, so a device in regular use never goes stale"""
+        entry = self.entry(address)
+        if entry is not None:
+            entry['updated'] = time.time()
+
+    def invalidate(self, address):
+        self.devices.pop(self._key(address), None)
+
+    def save(self):
+        """Write atomically, so a crash never leaves a half-written cache"""
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.devices, f, indent=2)
+        os.replace(temporary, self.path)
+
+
+def resolve_characteristic(client, uuid, cache=None):
+    """Characteristic object for a UUID, by cached handle when possible"""
+    uuid = normalize_uuid_str(uuid)
+    handle = cache.handle(client.address, uuid) if cache is not None else None
+    if handle is not None:
+        char = client.services.get_characteristic(handle)
+        if char is not None and char.uuid == uuid:
+            return char
+    return client.services.get_characteristic(uuid)
+
+
+async def connect_cached(address, uuids, cache, client_factory=BleakClient, scanner=None,
+                         scan_timeout=10.0, **client_kwargs):
+    """
+    Connect and resolve characteristics, scanning only when it cannot be avoided
+
+    With a fresh cache entry the client discovers only the services that
+    hold the requested characteristics, and connects to BleCache.device()
+    without a scan when the backend allows it (if that connect fails, or
+    on macOS, it scans for this one address first). Otherwise (or if the
+    cached layout turns out to be wrong) it scans for the address,
+    connects with full discovery and updates the cache.
+
+    A client dropped to rediscover gets a `rediscovering` attribute set to
+    True before it disconnects, so a disconnected_callback can tell that
+    deliberate disconnect from a lost link.
+
+    Returns:
+        tuple: (connected client, {uuid: characteristic})
+    """
+    scanner = scanner or BleakScanner.find_device_by_address
+    start = time.perf_counter()
+    fresh = cache.is_fresh(address)
+    services = cache.services_for(address, uuids) if fresh else None
+    client = None
+    device = cache.device(address) if services is not None else None
+    how = 'cached'
+    if device is not None:
+        client = client_factory(device, services=services, **client_kwargs)
+        try:
+            await client.connect()
+        except (BleakError, asyncio.TimeoutError) as e:
+            # e.g. BlueZ removed the device object since the path was saved
+            print(f"BLE: {address} not reachable without a scan ({str(e) or type(e).__name__}), scanning")
+            cache.forget_device(address)
+            client = None
+    if client is None:
+        device = await scanner(address, timeout=scan_timeout)
+        if device is None:
+            raise BleakError(f"Device {address} not found")
+        cache.remember(device)
+        client = client_factory(device, services=services, **client_kwargs)
+        await client.connect()
+        how = 'scanned' if services is None else 'scanned, cached services'
+    characteristics = {uuid: resolve_characteristic(client, uuid, cache) for uuid in uuids}
+    missing = [uuid for uuid, char in characteristics.items() if char is None]
+    if missing:
+        if services is not None:
+            # The device changed (e.g. new firmware): forget it and rediscover. The
+            # disconnect is deliberate, disconnected callbacks should ignore it
+            client.rediscovering = True
+            await client.disconnect()
+            cache.invalidate(address)
+            return await connect_cached(address, uuids, cache, client_factory, scanner, scan_timeout,
+                                        **client_kwargs)
+        await client.disconnect()
+        raise BleakError(f"Characteristic {', '.join(missing)} not found on {address}")
+
+    # After a scan the entry also learns where the device is (BlueZ path)
+    if how != 'cached' or any(cache.handle(address, uuid) != char.handle
+                              for uuid, char in characteristics.items()):
+        cache.record(client, device)
+    else:
+        cache.touch(address)  # the cached layout was just verified
+    cache.save()
+    print(f"BLE: {address} ready in {time.perf_counter() - start:.2f} s ({how})")
+    return client, characteristics
+
+
+@asynccontextmanager
+async def cached_client(address, uuids, cache=None, **kwargs):
+    """async with cached_client(mac, [uuid]) as (client, characteristics): ..."""
+    cache = cache or BleCache()
+    client, characteristics = await connect_cached(address, uuids, cache, **kwargs)
+    try:
+        yield client, characteristics
+    finally:
+        if client.is_connected:
+            await client.disconnect()
+
+
+class _FakeChar:
+    def __init__(self, uuid, handle, service_uuid):
+        self.uuid = normalize_uuid_str(uuid)
+        self.handle = handle
+        self.service_uuid = service_uuid
+        self.properties = ['read', 'notify']
+
+
+class _FakeServices:
+    def __init__(self, layout, only=None):
+        self.services = []
+        self.characteristics = {}
+        for service_uuid, chars in layout.items():
+            if only is not None and service_uuid not in only:
+                continue
+            service = type('Service', (), {'uuid': service_uuid, 'characteristics': []})()
+            for uuid, handle in chars.items():
+                char = _FakeChar(uuid, handle, service_uuid)
+                service.characteristics.append(char)
+                self.characteristics[handle] = char
+            self.services.append(service)
+
+    def __iter__(self):
+        return iter(self.services)
+
+    def get_characteristic(self, specifier):
+        if isinstance(specifier, int):
+            return self.characteristics.get(specifier)
+        specifier = normalize_uuid_str(specifier)
+        return next((c for c in self.characteristics.values() if c.uuid == specifier), None)
+
+
+def _self_test(path='ble_cache_test.json'):
+    """Scan once, then connect from cache without scanning; rediscover after a firmware change"""
+    hr_service = normalize_uuid_str('180d')
+    layout = {
+        normalize_uuid_str('1800'): {'2a00': 3},
+        hr_service: {'2a37': 14, '2a38': 17},
+        normalize_uuid_str('180f'): {'2a19': 22},
+    }
+    scans = []
+    bluez_devices = {'/org/bluez/hci0/dev_AA_BB_CC_DD_EE_FF'}  # device objects BlueZ knows about
+    # Where the backend can connect from the cache alone (not CoreBluetooth)
+    direct = sys.platform == 'win32' or sys.platform.startswith('linux')
+
+    async def scanner(address, timeout):
+        scans.append(address)
+        await asyncio.sleep(0.05)  # stands in for several seconds of real scanning
+        path = '/org/bluez/hci0/dev_' + address.upper().replace(':', '_')
+        bluez_devices.add(path)  # a scan (re)creates the BlueZ device object
+        return BLEDevice(address.upper(), 'Polar H10', {'path': path, 'props': {}})
+
+    link_drops = []
+
+    class Client:
+        def __init__(self, target, services=None):
+            self.target = target
+            self.address = getattr(target, 'address', target)
+            self.requested = services
+            self.is_connected = False
+            # Like BleConnectionManager's callback: a deliberate disconnect is not a lost link
+            self.disconnected_callback = lambda client: (None if getattr(client, 'rediscovering', False)
+                                                         else link_drops.append(client))
+
+        async def connect(self):
+            if isinstance(self.target, str):
+                await scanner(self.target, 10.0)  # what BleakClient does with an address string
+            details = self.target.details if isinstance(self.target, BLEDevice) else None
+            if isinstance(details, dict) and details['path'] not in bluez_devices:
+                raise BleakError(f"Device {details['path']} not found")  # BlueZ removed it
+            self.services = _FakeServices(layout, self.requested)
+            self.is_connected = True
+
+        async def disconnect(self):
+            self.is_connected = False
+            self.disconnected_callback(self)
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    async def session():
+        async with cached_client('aa:bb:cc:dd:ee:ff', ['2a37'], BleCache(path), client_factory=Client,
+                                 scanner=scanner) as (client, chars):
+            return client, chars['2a37']
+
+    client, char = asyncio.run(session())
+    assert scans == ['aa:bb:cc:dd:ee:ff'] and char.handle == 14 and client.requested is None
+    aged = BleCache(path)
+    aged.devices['AA:BB:CC:DD:EE:FF']['updated'] -= 3600
+    aged.save()
+    client, char = asyncio.run(session())
+    assert len(scans) == (1 if direct else 2), "Fresh cache entry must not scan"
+    assert BleCache(path).devices['AA:BB:CC:DD:EE:FF']['updated'] > time.time() - 60, \
+        "A verified cached connect must refresh the entry"
+    assert client.requested == [hr_service] and char.handle == 14
+
+    if sys.platform.startswith('linux'):
+        # BlueZ forgot the device: fall back to a scan, then connect directly again
+        bluez_devices.clear()
+        scanned = len(scans)
+        asyncio.run(session())
+        asyncio.run(session())
+        assert len(scans) == scanned + 1, "A stale BlueZ path must fall back to one scan"
+
+    # Without a saved path (macOS), one scan per process: reconnects reuse the scanned device
+    cache = BleCache(path)
+    cache.forget_device('aa:bb:cc:dd:ee:ff')
+    scanned = len(scans)
+    for _ in range(3):
+        client, _ = asyncio.run(connect_cached('aa:bb:cc:dd:ee:ff', ['2a37'], cache, client_factory=Client,
+                                               scanner=scanner))
+        asyncio.run(client.disconnect())
+    assert len(scans) <= scanned + 1, "Reconnects must reuse the scanned device"
+
+    layout[hr_service] = {'2a37': 40}  # new firmware, handles moved
+    del link_drops[:]
+    client, char = asyncio.run(session())
+    assert link_drops == [client], "Rediscovery must not report a link drop"
+    assert char.handle == 40 and BleCache(path).handle('AA:BB:CC:DD:EE:FF', '2a37') == 40
+
+    stale = BleCache(path, max_age=0)
+    stale.devices['AA:BB:CC:DD:EE:FF']['updated'] -= 1
+    stale.save()
+    scanned = len(scans)
+    asyncio.run(connect_cached('aa:bb:cc:dd:ee:ff', ['2a37'], BleCache(path, max_age=0),
+                               client_factory=Client, scanner=scanner))
+    assert len(scans) == scanned + 1, "Stale entries must rescan"
+    os.remove(path)
+    print("BLE: cache self-test passed")
+
+
+if __name__ == "__main__":
+    _self_test()
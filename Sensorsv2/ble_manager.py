@@ -0,0 +1,343 @@
+import asyncio
+import random
+import time
+from bleak import BleakClient
+from bleak.exc import BleakError
+from ble_cache import connect_cached
+
+
+class BleDevice:
+    """
+    One BLE sensor handled by BleConnectionManager
+
+    Args:
+        name (str): Label used in logs and stats ("HR", "GSR", ...)
+        address (str): MAC address (or platform UUID on macOS)
+        notify (list): (characteristic UUID, callback(sender, data)) pairs,
+            subscribed again after every reconnect
+        poll (tuple): Optional (characteristic UUID, interval in s,
+            handler(data)) for sensors that are read instead of notifying
+        on_connect (list): Coroutine functions (client, characteristics)
+            awaited after the subscriptions on every (re)connect, e.g. to
+            start streams that the sensor forgets when the link drops
+    """
+
+    def __init__(self, name, address, notify=None, poll=None, on_connect=None):
+        self.name = name
+        self.address = address
+        self.notify = list(notify or [])
+        self.poll = poll
+        self.on_connect = list(on_connect or [])
+
+        # Counters
+        self.state = 'idle'
+        self.connects = 0
+        self.reconnects = 0
+        self.disconnects = 0
+        self.failed_attempts = 0
+        self.notifications = 0
+        self.reads = 0
+        self.connected_seconds = 0.0
+        self.connected_since = None
+        self.last_error = None
+
+    @property
+    def uptime(self):
+        """Seconds spent connected (including the current connection)"""
+        current = time.monotonic() - self.connected_since if self.connected_since is not None else 0.0
+        return self.connected_seconds + current
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'uptime_s': round(self.uptime, 1),
+            'connects': self.connects,
+            'reconnects': self.reconnects,
+            'disconnects': self.disconnects,
+            'failed_attempts': self.failed_attempts,
+            'notifications': self.notifications,
+            'reads': self.reads,
+            'last_error': self.last_error,
+        }
+
+    def summary(self):
+        return (f"{self.name}: {self.state}, up {self.uptime:.0f} s, {self.connects} connects "
+                f"({self.reconnects} reconnects, {self.failed_attempts} failed), "
+                f"{self.notifications} notifications, {self.reads} reads")
+
+
+class BleConnectionManager:
+    """
+    Run several BLE sensors concurrently in one event loop
+
+    Every device gets its own task that connects, subscribes to its
+    notifications (or polls), and waits for a disconnect. When the link
+    drops or a connect attempt fails, it retries with exponential backoff
+    (with jitter) up to max_backoff, so a sensor that walks out of range
+    comes back on its own instead of ending its modality for the session.
+
+    Args:
+        client_factory (callable): Builds a client, same signature as
+            BleakClient(address, disconnected_callback=..., timeout=...);
+            replace it to run against a fake backend
+        initial_backoff (float), max_backoff (float), backoff_factor (float):
+            Reconnect delay schedule in seconds
+        connect_timeout (float): Timeout of each connect attempt
+        report_every (float): Seconds between status prints (0 disables)
+        cache (ble_cache.BleCache): Optional device/GATT cache; with it,
+            known devices discover only the services they use, resolve
+            characteristics by handle and, where the backend allows it
+            (see BleCache.device), connect without scanning
+        scanner (callable): Address lookup used when a scan is needed
+            (default BleakScanner.find_device_by_address)
+    """
+
+    def __init__(self, client_factory=BleakClient, initial_backoff=1.0, max_backoff=30.0,
+                 backoff_factor=2.0, connect_timeout=15.0, report_every=60.0, cache=None, scanner=None):
+        self.client_factory = client_factory
+        self.cache = cache
+        self.scanner = scanner
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.backoff_factor = backoff_factor
+        self.connect_timeout = connect_timeout
+        self.report_every = report_every
+        self.devices = []
+        self._stopping = None
+
+    def add_device(self, device):
+        self.devices.append(device)
+        return device
+
+    async def run(self, stop_event):
+        """
+        Manage every device until stop_event (threading.Event) is set
+
+        Returns:
+            dict: Final stats per device name
+        """
+        self._stopping = asyncio.Event()
+        tasks = [asyncio.create_task(self._device_loop(device)) for device in self.devices]
+        next_report = time.monotonic() + self.report_every
+        try:
+            while not stop_event.is_set():
+                await asyncio.sleep(0.1)
+                if self.report_every and time.monotonic() >= next_report:
+                    next_report += self.report_every
+                    for device in self.devices:
+                        print(f"BLE: {device.summary()}")
+        finally:
+            self._stopping.set()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return self.stats()
+
+    def stats(self):
+        return {device.name: device.stats() for device in self.devices}
+
+    async def _sleep_or_stop(self, seconds):
+        """Sleep, but wake up immediately when stopping; True if stopping"""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        return self._stopping.is_set()
+
+    async def _device_loop(self, device):
+        backoff = self.initial_backoff
+        while not self._stopping.is_set():
+            disconnected = asyncio.Event()
+
+            def on_disconnect(client, event=disconnected):
+                # connect_cached drops the link on purpose when it has to rediscover services
+                if not getattr(client, 'rediscovering', False):
+                    event.set()
+
+            def factory(target, **kwargs):
+                return self.client_factory(target, timeout=self.connect_timeout,
+                                           disconnected_callback=on_disconnect, **kwargs)
+
+            client = None
+            characteristics = {}
+            device.state = 'connecting'
+            try:
+                if self.cache is not None:
+                    uuids = [uuid for uuid, _ in device.notify] + ([device.poll[0]] if device.poll else [])
+                    client, characteristics = await connect_cached(device.address, uuids, self.cache,
+                                                                   client_factory=factory, scanner=self.scanner)
+                else:
+                    client = factory(device.address)
+                    await client.connect()
+                device.connects += 1
+                if device.connects > 1:
+                    device.reconnects += 1
+                device.connected_since = time.monotonic()
+                device.state = 'connected'
+                print(f"BLE: ✅ {device.name} connected ({device.address})")
+
+                for uuid, callback in device.notify:
+                    await client.start_notify(characteristics.get(uuid, uuid), self._counted(device, callback))
+                for hook in device.on_connect:
+                    await hook(client, characteristics)
+                backoff = self.initial_backoff
+
+                if device.poll is not None:
+                    await self._poll(device, client, disconnected, characteristics)
+                else:
+                    stop_wait = asyncio.create_task(self._stopping.wait())
+                    link_wait = asyncio.create_task(disconnected.wait())
+                    await asyncio.wait([stop_wait, link_wait], return_when=asyncio.FIRST_COMPLETED)
+                    stop_wait.cancel()
+                    link_wait.cancel()
+            except Exception as e:
+                # Any failure (link, timeout, handler error) ends this connection, not the modality
+                device.last_error = str(e) or type(e).__name__
+                if device.connected_since is None:
+                    device.failed_attempts += 1
+                print(f"BLE: ⚠️ {device.name}: {device.last_error}")
+            finally:
+                if device.connected_since is not None:
+                    device.connected_seconds += time.monotonic() - device.connected_since
+                    device.connected_since = None
+                    if not self._stopping.is_set():
+                        device.disconnects += 1
+                        print(f"BLE: 🔌 {device.name} disconnected")
+                await self._close(device, client)
+
+            if self._stopping.is_set():
+                break
+            device.state = 'waiting'
+            delay = backoff * random.uniform(0.5, 1.0)
+            print(f"BLE: 🔁 {device.name} reconnecting in {delay:.1f} s")
+            if await self._sleep_or_stop(delay):
+                break
+            backoff = min(backoff * self.backoff_factor, self.max_backoff)
+        device.state = 'stopped'
+
+    async def _poll(self, device, client, disconnected, characteristics):
+        uuid, interval, handler = device.poll
+        char = characteristics.get(uuid, uuid)
+        while not self._stopping.is_set() and not disconnected.is_set():
+            try:
+                data = await client.read_gatt_char(char)
+            except BleakError:
+                if not client.is_connected:
+                    return
+                raise
+            device.reads += 1
+            handler(data)
+            await self._sleep_or_stop(interval)
+
+    @staticmethod
+    def _counted(device, callback):
+        def wrapper(sender, data):
+            device.notifications += 1
+            callback(sender, data)
+        return wrapper
+
+    async def _close(self, device, client):
+        if client is None or not client.is_connected:
+            return
+        try:
+            for uuid, _ in device.notify:
+                await client.stop_notify(uuid)
+            await client.disconnect()
+        except (BleakError, asyncio.TimeoutError, OSError) as e:
+            print(f"BLE: ⚠️ {device.name}: error while disconnecting: {e}")
+
+
+class _FakeClient:
+    """
+    Minimal stand-in for BleakClient: notifications at a fixed rate, a
+    disconnect injected every `drop_after` notifications and the first
+    `fail_connects` connect attempts failing
+    """
+
+    instances = []
+
+    def __init__(self, address, disconnected_callback=None, timeout=10.0, rate=50.0, drop_after=40,
+                 fail_connects=2):
+        self.address = address
+        self.disconnected_callback = disconnected_callback
+        self.rate = rate
+        self.drop_after = drop_after
+        self.fail_connects = fail_connects
+        self.is_connected = False
+        self.subscriptions = 0
+        self.tasks = []
+        _FakeClient.instances.append(self)
+
+    async def connect(self):
+        attempts = sum(1 for c in _FakeClient.instances if c.address == self.address)
+        await asyncio.sleep(0.01)
+        if attempts <= self.fail_connects:
+            raise BleakError(f"Device with address {self.address} was not found")
+        self.is_connected = True
+
+    async def start_notify(self, uuid, callback):
+        self.subscriptions += 1
+        self.tasks.append(asyncio.create_task(self._notify(callback)))
+
+    async def _notify(self, callback):
+        for i in range(self.drop_after):
+            await asyncio.sleep(1 / self.rate)
+            callback(None, bytearray([0x10, 70, i % 256, 3]))
+        self._drop()
+
+    def _drop(self):
+        self.is_connected = False
+        self.disconnected_callback(self)
+
+    async def read_gatt_char(self, uuid):
+        await asyncio.sleep(0.001)
+        if not self.is_connected:
+            raise BleakError("Not connected")
+        self.reads = getattr(self, 'reads', 0) + 1
+        if self.reads == self.drop_after:
+            self._drop()
+        return bytearray(b'2048')
+
+    async def stop_notify(self, uuid):
+        for task in self.tasks:
+            task.cancel()
+
+    async def disconnect(self):
+        await self.stop_notify(None)
+        self.is_connected = False
+
+
+def _self_test(seconds=4.0):
+    """Three fake devices (two notifying, one polled) that fail to connect twice and then keep dropping"""
+    import threading
+
+    received = {'HR': 0, 'GSR': 0, 'EDA': 0}
+
+    def callback_for(name):
+        def callback(sender, data=None):
+            received[name] += 1
+        return callback
+
+    manager = BleConnectionManager(client_factory=_FakeClient, initial_backoff=0.05, max_backoff=0.2,
+                                   report_every=0)
+    manager.add_device(BleDevice('HR', 'AA:AA', notify=[('2a37', callback_for('HR'))]))
+    manager.add_device(BleDevice('GSR', 'BB:BB', notify=[('gsr', callback_for('GSR'))]))
+    manager.add_device(BleDevice('EDA', 'CC:CC', poll=('gsr', 0.01, callback_for('EDA'))))
+    stop_event = threading.Event()
+    threading.Timer(seconds, stop_event.set).start()
+    stats = asyncio.run(manager.run(stop_event))
+
+    for device in manager.devices:
+        device_stats = stats[device.name]
+        connected = [c for c in _FakeClient.instances if c.address == device.address and c.is_connected is False
+                     and (c.subscriptions or getattr(c, 'reads', 0))]
+        assert device_stats['failed_attempts'] == 2, device_stats
+        assert device_stats['reconnects'] >= 2, device_stats
+        assert len(connected) == device_stats['connects'], "Stale clients left connected"
+        assert all(c.subscriptions == len(device.notify) for c in connected), "Notifications not re-subscribed"
+        assert device_stats['notifications'] + device_stats['reads'] == received[device.name] > 0
+        assert device_stats['state'] == 'stopped' and device_stats['uptime_s'] > seconds / 2
+        print(f"BLE: {device.summary()}")
+    print("BLE: connection manager self-test passed")
+
+
+if __name__ == "__main__":
+    _self_test()
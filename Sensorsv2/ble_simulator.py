@@ -0,0 +1,635 @@
+import argparse
+import asyncio
+import csv
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from bleak.backends.device import BLEDevice
+from bleak.exc import BleakError
+from bleak.uuids import normalize_uuid_str
+from gsr_notify import GSR_NOTIFY_UUID, encode_packet
+from heart_rate_monitor import HR_SERVICE, HR_CHARACTERISTIC, CSV_HEADER as HR_CSV_HEADER, create_hr_device
+from gsr_sensor import CHARACTERISTIC_UUID as GSR_CHARACTERISTIC, CSV_HEADERS as GSR_CSV_HEADERS, create_gsr_device
+from buffered_sink import BufferedCsvSink
+from ble_manager import BleConnectionManager
+
+GSR_SERVICE = "4fafc201-1fb5-459e-8fcc-c5c9c331914b"  # ESP32 BLE server example service
+
+# GATT layout per device kind: {service: {characteristic: (handle, properties)}}
+LAYOUTS = {
+    'hr': {
+        normalize_uuid_str('1800'): {normalize_uuid_str('2a00'): (3, ['read'])},
+        HR_SERVICE: {HR_CHARACTERISTIC: (14, ['notify']), normalize_uuid_str('2a38'): (17, ['read'])},
+        normalize_uuid_str('180f'): {normalize_uuid_str('2a19'): (22, ['read', 'notify'])},
+    },
+    'gsr': {
+        normalize_uuid_str('1800'): {normalize_uuid_str('2a00'): (3, ['read'])},
+        GSR_SERVICE: {GSR_CHARACTERISTIC: (42, ['read']), GSR_NOTIFY_UUID: (45, ['notify'])},
+    },
+}
+NAMES = {'hr': 'Polar H10 SIM', 'gsr': 'ESP32 GSR SIM'}
+BIOMETRICS_GSR_PERIOD = 0.1  # BiometricsESP_Polar.read_gsr sleeps this long after every read
+
+
+class SimulatedCharacteristic:
+    def __init__(self, uuid, handle, properties, service_uuid):
+        self.uuid = uuid
+        self.handle = handle
+        self.properties = properties
+        self.service_uuid = service_uuid
+
+    def __str__(self):
+        return f"{self.uuid} (Handle: {self.handle})"
+
+
+class SimulatedService:
+    def __init__(self, uuid, characteristics):
+        self.uuid = uuid
+        self.characteristics = characteristics
+
+
+class SimulatedServices:
+    """The subset of BleakGATTServiceCollection the recorders use"""
+
+    def __init__(self, layout, only=None):
+        self.services = []
+        self.by_handle = {}
+        for service_uuid, characteristics in layout.items():
+            if only is not None and service_uuid not in {normalize_uuid_str(s) for s in only}:
+                continue
+            chars = [SimulatedCharacteristic(uuid, handle, properties, service_uuid)
+                     for uuid, (handle, properties) in characteristics.items()]
+            self.by_handle.update((char.handle, char) for char in chars)
+            self.services.append(SimulatedService(service_uuid, chars))
+
+    def __iter__(self):
+        return iter(self.services)
+
+    def get_characteristic(self, specifier):
+        if isinstance(specifier, int):
+            return self.by_handle.get(specifier)
+        uuid = normalize_uuid_str(str(specifier))
+        return next((c for c in self.by_handle.values() if c.uuid == uuid), None)
+
+
+class SimulatedPeripheral:
+    """
+    One virtual sensor with its signal and link impairments
+
+    Args:
+        address (str): MAC address the recorders connect to
+        kind (str): 'hr' (Polar H10: 0x2A37 notifications with RR
+            intervals) or 'gsr' (ESP32: readable ADC characteristic plus
+            batched GSR_NOTIFY_UUID notifications, see gsr_notify)
+        rate (float): Notifications per second for 'hr', samples per
+            second for 'gsr' (sent in notifications of `batch` samples)
+        jitter (float): Std. deviation of the notification timing in s
+        loss (float): Probability that a notification is lost on the air
+        disconnect_every (float): Mean link lifetime in s (exponential),
+            None for a link that never drops
+        connect_delay (float), read_latency (float): Seconds per connect
+            and per GATT read
+        batch (int): GSR samples per notification (30 fit one 247-byte MTU)
+        gsr_format (str): Encoding of the readable ADC characteristic:
+            'uint16' (little-endian, as gsr_sensor reads it) or 'ascii'
+            (decimal text, as BiometricsESP_Polar, fixedEDA and
+            EDA_bluetooth read it)
+    """
+
+    def __init__(self, address, kind='hr', rate=1.0, jitter=0.0, loss=0.0, disconnect_every=None,
+                 connect_delay=0.05, read_latency=0.0075, batch=10, gsr_format='uint16', seed=None):
+        if kind not in LAYOUTS:
+            raise ValueError(f"Unknown device kind '{kind}' (expected one of {sorted(LAYOUTS)})")
+        self.address = address.upper()
+        self.name = NAMES[kind]
+        self.kind = kind
+        self.rate = rate
+        self.jitter = jitter
+        self.loss = loss
+        self.disconnect_every = disconnect_every
+        self.connect_delay = connect_delay
+        self.read_latency = read_latency
+        self.batch = batch
+        self.gsr_format = gsr_format
+        self.random = random.Random(seed)
+        self.started = time.monotonic()
+        self.sequence = 0
+        self.client = None
+
+        # Counters
+        self.sent = 0          # notifications generated (including lost ones)
+        self.lost = 0
+        self.delivered = 0
+        self.samples = 0       # samples delivered (RR intervals or GSR records)
+        self.reads = 0
+        self.connects = 0
+        self.drops = 0
+        self.callback_seconds = 0.0
+        self.lags = []         # delivery time - scheduled time, per notification
+
+    def adc(self, t):
+        """Synthetic skin response: slow drift plus phasic bumps, as 12-bit codes"""
+        level = 2000 + 300 * math.sin(2 * math.pi * t / 60) + 150 * max(0.0, math.sin(2 * math.pi * t / 7)) ** 8
+        return max(1, min(4094, int(level + self.random.gauss(0, 5))))
+
+    def read_value(self, uuid):
+        self.reads += 1
+        if uuid == GSR_CHARACTERISTIC:
+            adc = self.adc(time.monotonic() - self.started)
+            if self.gsr_format == 'ascii':
+                return bytearray(str(adc).encode())
+            # uint16 little-endian, as gsr_sensor decodes it in poll mode
+            return bytearray(adc.to_bytes(2, 'little'))
+        if uuid == normalize_uuid_str('2a19'):
+            return bytearray([87])
+        if uuid == normalize_uuid_str('2a00'):
+            return bytearray(self.name.encode())
+        raise BleakError(f"Characteristic {uuid} is not readable")
+
+    def notification(self, uuid, t):
+        """Payload of the next notification and the number of samples in it"""
+        if uuid == HR_CHARACTERISTIC:
+            rr = 60 / (70 + 8 * math.sin(2 * math.pi * t / 30)) + self.random.gauss(0, 0.02)
+            rr_raw = max(1, int(round(rr * 1024)))
+            return bytearray([0x10, int(round(61440 / rr_raw))]) + rr_raw.to_bytes(2, 'little'), 1
+        if uuid == GSR_NOTIFY_UUID:
+            period = 1 / self.rate
+            seq = range(self.sequence, self.sequence + self.batch)
+            ticks = [int((t - (self.batch - 1 - i) * period) * 1e6) for i in range(self.batch)]
+            self.sequence += self.batch
+            return bytearray(encode_packet(list(seq), ticks, [self.adc(tick / 1e6) for tick in ticks])), self.batch
+        raise BleakError(f"Characteristic {uuid} does not notify")
+
+    def interval(self, uuid):
+        return self.batch / self.rate if uuid == GSR_NOTIFY_UUID else 1 / self.rate
+
+    def stats(self):
+        lags = sorted(self.lags)
+        return {
+            'sent': self.sent, 'lost': self.lost, 'delivered': self.delivered, 'samples': self.samples,
+            'reads': self.reads, 'connects': self.connects, 'drops': self.drops,
+            'callback_us': self.callback_seconds / self.delivered * 1e6 if self.delivered else 0.0,
+            'lag_p99_ms': lags[int(0.99 * (len(lags) - 1))] * 1e3 if lags else 0.0,
+        }
+
+
+class SimulatedBleakClient:
+    """
+    Drop-in for BleakClient backed by SimulatedPeripheral objects
+
+    Supports what the recorders use: connect/disconnect, the async context
+    manager, services (honouring the services= filter), start/stop_notify,
+    read/write_gatt_char and disconnected_callback. Notifications are
+    scheduled on absolute times, so the measured lag is how late the
+    event loop delivered them.
+    """
+
+    def __init__(self, backend, address_or_ble_device, disconnected_callback=None, timeout=10.0,
+                 services=None, **kwargs):
+        self.backend = backend
+        self.address = getattr(address_or_ble_device, 'address', address_or_ble_device)
+        self.by_address = isinstance(address_or_ble_device, str)
+        self.disconnected_callback = disconnected_callback
+        self.timeout = timeout
+        self.service_filter = services
+        self.services = None
+        self.is_connected = False
+        self.peripheral = None
+        self.tasks = {}
+        self.link_task = None
+
+    async def connect(self, **kwargs):
+        if self.by_address:
+            await asyncio.sleep(self.backend.scan_delay)  # BleakClient scans for an address string first
+        peripheral = self.backend.devices.get(self.address.upper())
+        await asyncio.sleep(peripheral.connect_delay if peripheral else min(self.timeout, 0.1))
+        if peripheral is None:
+            raise BleakError(f"Device with address {self.address} was not found")
+        if peripheral.client is not None:
+            raise BleakError(f"Device {self.address} is already connected to another client")
+        peripheral.client = self
+        peripheral.connects += 1
+        self.peripheral = peripheral
+        self.services = SimulatedServices(LAYOUTS[peripheral.kind], self.service_filter)
+        self.is_connected = True
+        if peripheral.disconnect_every:
+            lifetime = peripheral.random.expovariate(1 / peripheral.disconnect_every)
+            self.link_task = asyncio.create_task(self._drop_after(lifetime))
+        return True
+
+    def _resolve(self, char_specifier):
+        if not self.is_connected:
+            raise BleakError("Not connected")
+        if isinstance(char_specifier, SimulatedCharacteristic):
+            return char_specifier.uuid
+        char = self.services.get_characteristic(char_specifier)
+        if char is None:
+            raise BleakError(f"Characteristic {char_specifier} was not found!")
+        return char.uuid
+
+    async def start_notify(self, char_specifier, callback, **kwargs):
+        uuid = self._resolve(char_specifier)
+        await self.stop_notify(uuid)
+        self.tasks[uuid] = asyncio.create_task(self._notify(uuid, callback))
+
+    async def _notify(self, uuid, callback):
+        peripheral = self.peripheral
+        char = self.services.get_characteristic(uuid)
+        interval = peripheral.interval(uuid)
+        start = time.monotonic()
+        scheduled = start
+        for k in range(1, 1 << 62):
+            # Absolute schedule with jitter, never earlier than the previous one
+            due = max(scheduled, start + k * interval + peripheral.random.gauss(0, peripheral.jitter))
+            scheduled = due
+            await asyncio.sleep(max(0.0, due - time.monotonic()))
+            data, samples = peripheral.notification(uuid, due - peripheral.started)
+            peripheral.sent += 1
+            if peripheral.random.random() < peripheral.loss:
+                peripheral.lost += 1
+                continue
+            delivered = time.perf_counter()
+            peripheral.lags.append(time.monotonic() - due)
+            callback(char, data)
+            peripheral.callback_seconds += time.perf_counter() - delivered
+            peripheral.delivered += 1
+            peripheral.samples += samples
+
+    async def stop_notify(self, char_specifier):
+        uuid = char_specifier if isinstance(char_specifier, str) else self._resolve(char_specifier)
+        task = self.tasks.pop(normalize_uuid_str(uuid), None)
+        if task is not None:
+            task.cancel()
+
+    async def read_gatt_char(self, char_specifier, **kwargs):
+        uuid = self._resolve(char_specifier)
+        await asyncio.sleep(self.peripheral.read_latency)
+        if not self.is_connected:
+            raise BleakError("Not connected")
+        return self.peripheral.read_value(uuid)
+
+    async def write_gatt_char(self, char_specifier, data, response=None):
+        self._resolve(char_specifier)
+        await asyncio.sleep(self.peripheral.read_latency)
+
+    async def _drop_after(self, seconds):
+        await asyncio.sleep(seconds)
+        self.peripheral.drops += 1
+        self._release()
+        if self.disconnected_callback is not None:
+            self.disconnected_callback(self)
+
+    def _release(self):
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks = {}
+        if self.peripheral is not None and self.peripheral.client is self:
+            self.peripheral.client = None
+        self.is_connected = False
+
+    async def disconnect(self):
+        if self.link_task is not None and self.link_task is not asyncio.current_task():
+            self.link_task.cancel()
+        self._release()
+        return True
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.disconnect()
+
+
+class SimulatedBackend:
+    """
+    A set of virtual peripherals and the factories that reach them
+
+    client_factory replaces BleakClient and scanner replaces
+    BleakScanner.find_device_by_address, e.g.
+        BleConnectionManager(client_factory=backend.client_factory, scanner=backend.scanner)
+        read_gsr(stop_event, address, ble_options=backend.ble_options())
+    """
+
+    def __init__(self, scan_delay=0.05):
+        self.devices = {}
+        self.scan_delay = scan_delay
+
+    def add_device(self, address, kind='hr', **kwargs):
+        peripheral = SimulatedPeripheral(address, kind, **kwargs)
+        self.devices[peripheral.address] = peripheral
+        return peripheral
+
+    def add_fleet(self, count, kind='hr', prefix=None, **kwargs):
+        """`count` devices with addresses <prefix>:00:01, <prefix>:00:02, ..."""
+        prefix = prefix or ('5E:00:00:00' if kind == 'hr' else '5E:00:00:01')
+        return [self.add_device(f"{prefix}:{i >> 8:02X}:{i & 0xFF:02X}", kind, seed=i, **kwargs)
+                for i in range(1, count + 1)]
+
+    def client_factory(self, address_or_ble_device, **kwargs):
+        return SimulatedBleakClient(self, address_or_ble_device, **kwargs)
+
+    async def scanner(self, address, timeout=10.0):
+        await asyncio.sleep(self.scan_delay)
+        peripheral = self.devices.get(address.upper())
+        if peripheral is None:
+            return None
+        path = '/org/bluez/hci0/dev_' + peripheral.address.replace(':', '_')
+        return BLEDevice(peripheral.address, peripheral.name, {'path': path, 'props': {}})
+
+    def ble_options(self, cache=None):
+        """Keyword arguments for ble_cache.cached_client (and the recorders that forward them)"""
+        from ble_cache import BleCache
+        cache = cache or BleCache(os.path.join(tempfile.gettempdir(), 'ble_simulator_cache.json'))
+        return {'client_factory': self.client_factory, 'scanner': self.scanner, 'cache': cache}
+
+    def report(self, seconds):
+        """Totals over all devices for a run of `seconds`"""
+        stats = [peripheral.stats() for peripheral in self.devices.values()]
+        lags = sorted(lag for peripheral in self.devices.values() for lag in peripheral.lags)
+        delivered = sum(s['delivered'] for s in stats)
+        return {
+            'devices': len(stats),
+            'offered_per_s': sum(p.sent for p in self.devices.values()) / seconds,
+            'delivered_per_s': delivered / seconds,
+            'samples_per_s': sum(s['samples'] for s in stats) / seconds,
+            'reads_per_s': sum(s['reads'] for s in stats) / seconds,
+            'lost': sum(s['lost'] for s in stats),
+            'drops': sum(s['drops'] for s in stats),
+            'connects': sum(s['connects'] for s in stats),
+            'callback_us': (sum(p.callback_seconds for p in self.devices.values()) / delivered * 1e6
+                            if delivered else 0.0),
+            'lag_p50_ms': lags[len(lags) // 2] * 1e3 if lags else 0.0,
+            'lag_p99_ms': lags[int(0.99 * (len(lags) - 1))] * 1e3 if lags else 0.0,
+            'lag_max_ms': lags[-1] * 1e3 if lags else 0.0,
+        }
+
+
+async def _run_manager(backend, kind, gsr_mode, seconds, directory):
+    """All devices in one BleConnectionManager, writing through the recorders' callbacks"""
+    sinks = []
+    manager = BleConnectionManager(client_factory=backend.client_factory, scanner=backend.scanner,
+                                   initial_backoff=0.1, max_backoff=1.0, report_every=0)
+    for i, peripheral in enumerate(backend.devices.values()):
+        filename = os.path.join(directory, f"{kind}_{i}.csv")
+        if kind == 'hr':
+            sink = BufferedCsvSink(filename, HR_CSV_HEADER)
+            manager.add_device(create_hr_device(sink, peripheral.address))
+        else:
+            sink = BufferedCsvSink(filename, GSR_CSV_HEADERS[gsr_mode])
+            manager.add_device(create_gsr_device(sink, peripheral.address, gsr_mode))
+        sink.start()
+        sinks.append(sink)
+    stop_event = threading.Event()
+    threading.Timer(seconds, stop_event.set).start()
+    try:
+        await manager.run(stop_event)
+    finally:
+        for sink in sinks:
+            await sink.close()
+    return sum(sink.rows_written for sink in sinks)
+
+
+def _run_threads(backend, kind, gsr_mode, seconds, directory):
+    """One thread and event loop per device, the way main.py starts the standalone recorders"""
+    from gsr_sensor import read_gsr
+    from heart_rate_monitor import monitor_heart_rate
+
+    from ble_cache import BleCache
+
+    stop_event = threading.Event()
+    threads = []
+    for i, peripheral in enumerate(backend.devices.values()):
+        filename = os.path.join(directory, f"{kind}_{i}.csv")
+        # A cache file per thread, so concurrent saves do not collide
+        options = backend.ble_options(BleCache(os.path.join(directory, f"cache_{i}.json")))
+        if kind == 'hr':
+            target = monitor_heart_rate
+            kwargs = {'mac_address': peripheral.address, 'csv_filename': filename, 'ble_options': options}
+        else:
+            target = read_gsr
+            kwargs = {'mac_address': peripheral.address, 'csv_filename': filename, 'mode': gsr_mode,
+                      'ble_options': options}
+        threads.append(threading.Thread(target=target, args=(stop_event,), kwargs=kwargs, daemon=True))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop_event.set()
+    for thread in threads:
+        thread.join(timeout=5.0)
+    rows = 0
+    for name in [n for n in os.listdir(directory) if n.endswith('.csv')]:
+        with open(os.path.join(directory, name)) as f:
+            rows += max(0, sum(1 for _ in f) - 1)
+    return rows
+
+
+
+def _import_biometrics():
+    """BiometricsESP_Polar lives in the repository root, next to the Sensorsv2 package it imports"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.append(root)
+    import BiometricsESP_Polar
+    return BiometricsESP_Polar
+
+
+async def _run_biometrics(backend, kind, seconds):
+    """
+    Every device through BiometricsESP_Polar.read_gsr / read_hr on one event loop, as its main() does
+
+    Returns:
+        list: The GSR codes or heart rates the readers parsed
+    """
+    biometrics = _import_biometrics()
+    reader = biometrics.read_hr if kind == 'hr' else biometrics.read_gsr
+    name = 'hr_buffer' if kind == 'hr' else 'gsr_buffer'
+    # The script keeps only the last window; collect every value for the report instead
+    bounded, values = getattr(biometrics, name), deque()
+    setattr(biometrics, name, values)
+    try:
+        tasks = [asyncio.create_task(reader(peripheral.address, client_factory=backend.client_factory))
+                 for peripheral in backend.devices.values()]
+        await asyncio.sleep(seconds)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        setattr(biometrics, name, bounded)
+    return list(values)
+
+
+def _gsr_value_range(directory):
+    """(min, max) of the gsr_value column over the recorded GSR CSVs, or None if empty"""
+    values = []
+    for name in [n for n in os.listdir(directory) if n.startswith('gsr_') and n.endswith('.csv')]:
+        with open(os.path.join(directory, name), newline='') as f:
+            values.extend(int(row['gsr_value']) for row in csv.DictReader(f) if row.get('gsr_value'))
+    return (min(values), max(values)) if values else None
+
+
+def run_load_test(devices=12, kind='hr', rate=None, seconds=10.0, target='manager', gsr_mode='notify',
+                  jitter=0.0, loss=0.0, disconnect_every=None, batch=10):
+    """
+    Record from `devices` virtual sensors for `seconds` and measure throughput
+
+    Args:
+        kind (str): 'hr' or 'gsr'
+        rate (float): Per device; default 1 Hz for 'hr', 100 samples/s for 'gsr'
+        target (str): 'manager' (single loop, ble_manager, as main2.py),
+            'threads' (one read_gsr/monitor_heart_rate thread per device)
+            or 'biometrics' (BiometricsESP_Polar.read_gsr/read_hr tasks on
+            one loop; its GSR reader polls an ASCII characteristic every
+            BIOMETRICS_GSR_PERIOD, so `rate` only applies to 'hr')
+        gsr_mode (str): 'poll' or 'notify' for the GSR recorder
+
+    Returns:
+        dict: SimulatedBackend.report() plus rows_per_s written to disk
+        (values parsed, for 'biometrics') and, for 'gsr', gsr_range
+        (min, max) of the recorded ADC codes
+    """
+    rate = rate or (1.0 if kind == 'hr' else 100.0)
+    backend = SimulatedBackend()
+    backend.add_fleet(devices, kind, rate=rate, jitter=jitter, loss=loss, disconnect_every=disconnect_every,
+                      batch=batch, gsr_format='ascii' if target == 'biometrics' else 'uint16')
+    with tempfile.TemporaryDirectory() as directory:
+        if target == 'manager':
+            rows = asyncio.run(_run_manager(backend, kind, gsr_mode, seconds, directory))
+        elif target == 'threads':
+            rows = _run_threads(backend, kind, gsr_mode, seconds, directory)
+        elif target == 'biometrics':
+            values = asyncio.run(_run_biometrics(backend, kind, seconds))
+            rows = len(values)
+        else:
+            raise ValueError(f"Unknown target '{target}' (expected 'manager', 'threads' or 'biometrics')")
+        if target == 'biometrics':
+            gsr_range = (min(values), max(values)) if kind == 'gsr' and values else None
+        else:
+            gsr_range = _gsr_value_range(directory) if kind == 'gsr' else None
+    report = backend.report(seconds)
+    if target == 'biometrics' and kind == 'gsr':
+        # Polled, not notified: offered is the read rate of an unloaded loop, delivered the reads made
+        period = BIOMETRICS_GSR_PERIOD + next(iter(backend.devices.values())).read_latency
+        report['offered_per_s'] = devices / period
+        report['delivered_per_s'] = report['reads_per_s']
+    report['gsr_range'] = gsr_range
+    report['rows_per_s'] = rows / seconds
+    return report
+
+
+def _format_report(report):
+    return (f"{report['devices']} devices: offered {report['offered_per_s']:.0f}/s, delivered "
+            f"{report['delivered_per_s']:.0f}/s ({report['samples_per_s']:.0f} samples/s, "
+            f"{report['reads_per_s']:.0f} reads/s), {report['rows_per_s']:.0f} rows/s on disk, "
+            f"lag p50 {report['lag_p50_ms']:.1f} / p99 {report['lag_p99_ms']:.1f} / max "
+            f"{report['lag_max_ms']:.1f} ms, callback {report['callback_us']:.0f} us, "
+            f"{report['lost']} lost, {report['drops']} link drops")
+
+
+def find_ceiling(kind='hr', rate=None, seconds=5.0, start=8, max_devices=1024, lag_budget_ms=50.0, **kwargs):
+    """
+    Double the number of devices until the recorders fall behind
+
+    The ceiling is reached when the p99 delivery lag exceeds lag_budget_ms
+    or less than 95% of the offered notifications (minus losses) arrive.
+
+    Returns:
+        list: (devices, report) for every step
+    """
+    steps = []
+    devices = start
+    while devices <= max_devices:
+        report = run_load_test(devices, kind, rate, seconds, **kwargs)
+        steps.append((devices, report))
+        print(f"BLE: SIM {_format_report(report)}")
+        expected = report['offered_per_s'] - report['lost'] / seconds
+        if report['lag_p99_ms'] > lag_budget_ms or report['delivered_per_s'] < 0.95 * expected:
+            print(f"BLE: SIM ceiling reached at {devices} devices")
+            break
+        devices *= 2
+    return steps
+
+
+def _self_test():
+    """Impairments behave as configured and the recorders run against the simulator"""
+    backend = SimulatedBackend()
+    peripheral = backend.add_device('AA:BB:CC:00:00:01', 'gsr', rate=200, loss=0.2, seed=1)
+
+    async def stream(seconds):
+        from gsr_notify import GsrStreamDecoder
+        decoder = GsrStreamDecoder()
+        packets = []
+        client = backend.client_factory('aa:bb:cc:00:00:01')
+        async with client:
+            assert client.services.get_characteristic(GSR_NOTIFY_UUID).handle == 45
+            await client.start_notify(GSR_NOTIFY_UUID, lambda sender, data: packets.append(bytes(data)))
+            await asyncio.sleep(seconds)
+            value = await client.read_gatt_char(GSR_CHARACTERISTIC)
+        decoder.decode(packets)
+        return decoder, int.from_bytes(value, 'little')
+
+    decoder, value = asyncio.run(stream(1.0))
+    assert 0 < value < 4095
+    assert decoder.received == peripheral.samples and 0.1 < peripheral.lost / peripheral.sent < 0.3
+    assert decoder.lost == peripheral.lost * peripheral.batch, (decoder.summary(), peripheral.stats())
+
+    report = run_load_test(devices=16, kind='hr', rate=20, seconds=2.0, disconnect_every=0.5)
+    assert report['drops'] > 0 and report['connects'] > report['devices'], report
+    assert report['rows_per_s'] > 0.5 * report['delivered_per_s'], report
+    print(f"BLE: SIM hr/manager {_format_report(report)}")
+    report = run_load_test(devices=8, kind='gsr', seconds=2.0, target='threads', gsr_mode='notify')
+    assert report['rows_per_s'] > 0.5 * report['samples_per_s'], report
+    print(f"BLE: SIM gsr/threads {_format_report(report)}")
+    assert report['gsr_range'] and 0 < report['gsr_range'][0] <= report['gsr_range'][1] < 4095, report
+    # Poll mode (the recorder's default) decodes the read characteristic as uint16 little-endian
+    report = run_load_test(devices=4, kind='gsr', seconds=2.0, target='manager', gsr_mode='poll')
+    assert report['reads_per_s'] > 0 and report['rows_per_s'] > 0, report
+    assert report['gsr_range'] and 0 < report['gsr_range'][0] <= report['gsr_range'][1] < 4095, report
+    print(f"BLE: SIM gsr/poll {_format_report(report)}, values {report['gsr_range']}")
+    # BiometricsESP_Polar's readers: ASCII GSR polling and HR notifications on one loop
+    report = run_load_test(devices=8, kind='gsr', seconds=2.0, target='biometrics')
+    assert report['rows_per_s'] > 0.8 * report['offered_per_s'], report
+    assert report['gsr_range'] and 0 < report['gsr_range'][0] <= report['gsr_range'][1] < 4095, report
+    print(f"BLE: SIM gsr/biometrics {_format_report(report)}, values {report['gsr_range']}")
+    report = run_load_test(devices=8, kind='hr', rate=20, seconds=2.0, target='biometrics')
+    assert report['rows_per_s'] > 0.9 * report['delivered_per_s'] > 0, report
+    print(f"BLE: SIM hr/biometrics {_format_report(report)}")
+    print("BLE: simulator self-test passed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the BLE recorders against simulated sensors")
+    parser.add_argument('--devices', type=int, default=12, help="Number of virtual sensors")
+    parser.add_argument('--kind', choices=sorted(LAYOUTS), default='hr')
+    parser.add_argument('--rate', type=float, default=None,
+                        help="Per device: notifications/s (hr, default 1) or samples/s (gsr, default 100)")
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--target', choices=['manager', 'threads', 'biometrics'], default='manager')
+    parser.add_argument('--gsr-mode', choices=['poll', 'notify'], default='notify')
+    parser.add_argument('--jitter', type=float, default=0.0, help="Timing jitter (s)")
+    parser.add_argument('--loss', type=float, default=0.0, help="Notification loss probability")
+    parser.add_argument('--disconnect-every', type=float, default=None, help="Mean link lifetime (s)")
+    parser.add_argument('--batch', type=int, default=10, help="GSR samples per notification")
+    parser.add_argument('--ceiling', action='store_true', help="Double --devices until the recorders fall behind")
+    parser.add_argument('--self-test', action='store_true')
+    args = parser.parse_args()
+
+    if args.self_test:
+        _self_test()
+        return
+    options = dict(target=args.target, gsr_mode=args.gsr_mode, jitter=args.jitter, loss=args.loss,
+                   disconnect_every=args.disconnect_every, batch=args.batch)
+    if args.ceiling:
+        find_ceiling(args.kind, args.rate, args.seconds, start=args.devices, **options)
+    else:
+        report = run_load_test(args.devices, args.kind, args.rate, args.seconds, **options)
+        print(f"BLE: SIM {_format_report(report)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import asyncio
+import csv
+import os
+import time
+
+DURABILITY_POLICIES = ('none', 'flush', 'fsync')
+
+
+class BufferedCsvSink:
+    """
+    CSV sink for BLE notification callbacks
+
+    write() only appends the row to an in-memory batch, so it is safe to
+    call from a Bleak callback. A writer task on the same event loop
+    writes the batch when it reaches max_rows or when max_latency seconds
+    have passed, whichever comes first.
+
+    Durability policies, applied after every batch:
+        'none'  - leave the rows in the file object's buffer (fastest)
+        'flush' - flush to the OS (survives a crash of this program)
+        'fsync' - flush and fsync, done in a worker thread so the event
+                  loop is not blocked (survives a power loss)
+
+    write()/writerows() must be called from the event loop thread, which
+    is where Bleak delivers notifications.
+    """
+
+    def __init__(self, filename, header=None, max_rows=256, max_latency=1.0,
+                 durability='flush', mode='w'):
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError(f"Unknown durability policy {durability}, use one of {DURABILITY_POLICIES}")
+        self.filename = filename
+        self.max_rows = max_rows
+        self.max_latency = max_latency
+        self.durability = durability
+        self.file = open(filename, mode, newline='')
+        self.writer = csv.writer(self.file)
+        if header is not None:
+            self.writer.writerow(header)
+            self._sync()
+        self.pending = []
+        self.rows_written = 0
+        self.batches = 0
+        self.max_batch = 0
+        self._wake = None
+        self._task = None
+        self._closing = False
+
+    def write(self, row):
+        """Queue one row (non-blocking)"""
+        self.pending.append(row)
+        if len(self.pending) >= self.max_rows and self._wake is not None:
+            self._wake.set()
+
+    def writerows(self, rows):
+        """Queue several rows (non-blocking)"""
+        self.pending.extend(rows)
+        if len(self.pending) >= self.max_rows and self._wake is not None:
+            self._wake.set()
+
+    def start(self):
+        """Start the writer task on the running event loop"""
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.max_latency)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write every queued row now, applying the durability policy"""
+        if not self.pending:
+            return
+        batch = self.pending
+        self.pending = []
+        if self.durability == 'fsync':
+            await asyncio.get_running_loop().run_in_executor(None, self._write_batch, batch)
+        else:
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        self.writer.writerows(batch)
+        self._sync()
+        self.rows_written += len(batch)
+        self.batches += 1
+        self.max_batch = max(self.max_batch, len(batch))
+
+    def _sync(self):
+        if self.durability != 'none':
+            self.file.flush()
+        if self.durability == 'fsync':
+            os.fsync(self.file.fileno())
+
+    async def close(self):
+        """Stop the writer task, write what is left and close the file"""
+        self._closing = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        self.file.close()
+
+    def summary(self):
+        return f"{self.rows_written} rows in {self.batches} batches (largest {self.max_batch})"
+
+    async def __aenter__(self):
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+def _benchmark(n=20000, filename='sink_benchmark.csv'):
+    """Per-callback cost: open/append/close per row (old save_to_csv) vs the buffered sink"""
+
+    def save_row(timestamp, value):
+        with open(filename, 'a', newline='') as file:
+            csv.writer(file).writerow([timestamp, value])
+
+    open(filename, 'w').close()
+    start = time.perf_counter()
+    for i in range(n // 10):
+        save_row('2025-01-01T00:00:00.000000', i)
+    per_row_old = (time.perf_counter() - start) / (n // 10)
+    print(f"Sink: open/append/close per row: {per_row_old * 1e6:8.1f} us per callback")
+
+    async def run(durability):
+        async with BufferedCsvSink(filename, ['timestamp', 'value'], durability=durability) as sink:
+            start = time.perf_counter()
+            for i in range(n):
+                sink.write(['2025-01-01T00:00:00.000000', i])
+                if i % 100 == 0:
+                    await asyncio.sleep(0)  # let the writer task run, as between notifications
+            per_row = (time.perf_counter() - start) / n
+        print(f"Sink: buffered ({durability:5s}):            {per_row * 1e6:8.1f} us per callback, "
+              f"{sink.summary()}, {per_row_old / per_row:.0f}x faster")
+
+    for durability in DURABILITY_POLICIES:
+        asyncio.run(run(durability))
+    with open(filename) as f:
+        assert sum(1 for _ in f) == n + 1
+    os.remove(filename)
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,353 @@
+import argparse
+import json
+import os
+import sys
+import time
+import cv2
+
+DEFAULT_CACHE = 'camera_cache.json'
+MAX_AGE_SECONDS = 30 * 24 * 3600  # Re-probe a camera not confirmed for a month
+COMMON_RESOLUTIONS = ((1920, 1080), (1280, 720), (640, 480))
+
+
+def default_backends():
+    """Backends to try, most specific for this platform first (CAP_ANY last)"""
+    if sys.platform.startswith('win'):
+        return [cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY]
+    if sys.platform == 'darwin':
+        return [cv2.CAP_AVFOUNDATION, cv2.CAP_ANY]
+    return [cv2.CAP_V4L2, cv2.CAP_ANY]
+
+
+def fourcc_to_str(code):
+    code = int(code)
+    text = ''.join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+    return text if code and text.isprintable() else None
+
+
+def _mode(width, height):
+    return f"{width}x{height}"
+
+
+class CameraCache:
+    """
+    Persistent capabilities cache keyed by camera index
+
+    For every camera it stores the backend that opened it, the
+    resolutions it accepted (each with the FOURCC it delivered and the
+    frame rate measured by reading frames, not the driver's claim), the
+    resolutions it rejected and its native one. With a fresh entry the
+    recorder opens the right backend and mode directly instead of trying
+    backends and indices and re-reading properties.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE, max_age=MAX_AGE_SECONDS):
+        self.path = path
+        self.max_age = max_age
+        try:
+            with open(path) as f:
+                self.devices = json.load(f)
+        except (OSError, ValueError):
+            self.devices = {}
+
+    @staticmethod
+    def _key(index):
+        return str(index)
+
+    def entry(self, index):
+        return self.devices.get(self._key(index))
+
+    def is_fresh(self, index):
+        entry = self.entry(index)
+        return entry is not None and time.time() - entry.get('updated', 0) <= self.max_age
+
+    def mode_for(self, index, width, height):
+        """(width, height, mode info) to open for a requested size, or None if the size was never probed"""
+        entry = self.entry(index) or {}
+        modes = entry.get('modes', {})
+        if _mode(width, height) in modes:
+            return width, height, modes[_mode(width, height)]
+        if _mode(width, height) in entry.get('rejected', []) and entry.get('native') in modes:
+            native = entry['native']
+            w, h = (int(v) for v in native.split('x'))
+            return w, h, modes[native]
+        return None
+
+    def record(self, index, capabilities):
+        """Merge a probe_camera() result into the cache"""
+        entry = self.devices.setdefault(self._key(index), {'modes': {}, 'rejected': []})
+        if capabilities['backend'] != entry.get('backend'):
+            entry['modes'], entry['rejected'] = {}, []
+        entry['backend'] = capabilities['backend']
+        entry['backend_name'] = capabilities['backend_name']
+        entry['native'] = capabilities['native']
+        entry['modes'].update(capabilities['modes'])
+        entry['rejected'] = sorted((set(entry['rejected']) | set(capabilities['rejected'])) - set(entry['modes']))
+        entry['updated'] = time.time()
+
+    def invalidate(self, index):
+        self.devices.pop(self._key(index), None)
+
+    def save(self):
+        """Write atomically, so a crash never leaves a half-written cache"""
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.devices, f, indent=2)
+        os.replace(temporary, self.path)
+
+
+def measure_fps(cap, frames=15, warmup=3):
+    """Frame rate actually delivered, from the time between reads (0.0 if reads fail)"""
+    for _ in range(warmup):
+        if not cap.read()[0]:
+            return 0.0
+    start = time.perf_counter()
+    for _ in range(frames):
+        if not cap.read()[0]:
+            return 0.0
+    return round(frames / (time.perf_counter() - start), 2)
+
+
+def _backend_name(backend):
+    try:
+        return cv2.videoio_registry.getBackendName(backend)
+    except (cv2.error, AttributeError):
+        return str(backend)
+
+
+def probe_camera(index, resolutions=COMMON_RESOLUTIONS, backends=None, measure_frames=15,
+                 capture_factory=cv2.VideoCapture):
+    """
+    Find the backend that opens a camera and the modes it supports (slow: opens and reads)
+
+    Returns:
+        dict: backend, backend_name, native ('WxH'), modes {'WxH': {'fps',
+        'reported_fps', 'fourcc'}}, rejected ['WxH'], or None if no
+        backend opens the camera
+    """
+    for backend in backends or default_backends():
+        try:
+            cap = capture_factory(index, backend)
+        except cv2.error:
+            continue
+        if not cap.isOpened():
+            cap.release()
+            continue
+        try:
+            if not cap.read()[0]:
+                continue
+            native = _mode(int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            modes, rejected = {}, []
+            for width, height in list(dict.fromkeys(tuple(r) for r in resolutions)):
+                cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+                actual = _mode(int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+                if actual != _mode(width, height):
+                    rejected.append(_mode(width, height))
+                    continue
+                fps = measure_fps(cap, measure_frames)
+                if not fps:
+                    rejected.append(_mode(width, height))
+                    continue
+                modes[actual] = {'fps': fps, 'reported_fps': cap.get(cv2.CAP_PROP_FPS),
+                                 'fourcc': fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC))}
+            if native not in modes:
+                native = next(iter(modes), native)
+            return {'backend': backend, 'backend_name': _backend_name(backend), 'native': native,
+                    'modes': modes, 'rejected': rejected}
+        finally:
+            cap.release()
+    return None
+
+
+def _open_mode(index, backend, width, height, info, capture_factory):
+    """Open straight into a cached mode; None if the camera no longer matches it"""
+    cap = capture_factory(index, backend)
+    if not cap.isOpened():
+        cap.release()
+        return None
+    if info.get('fourcc'):
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*info['fourcc']))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    actual = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    if actual != (width, height) or not cap.read()[0]:
+        cap.release()
+        return None
+    return cap
+
+
+def open_camera_cached(index, width=1280, height=720, cache=None, capture_factory=cv2.VideoCapture, **probe_options):
+    """
+    Open a camera in the requested (or nearest known) mode, probing only when the cache is stale
+
+    With a fresh entry the camera is opened with the cached backend and
+    mode and checked with one read. If that fails (different camera at
+    this index, driver change) the camera is re-probed once and the entry
+    replaced; if nothing opens at all, the entry is kept.
+
+    Returns:
+        tuple: (opened capture, config dict with index, backend, width,
+        height, fps, fourcc and source 'cached' or 'probed'), or
+        (None, None) if the camera cannot be opened
+    """
+    cache = cache or CameraCache()
+    start = time.perf_counter()
+    source = 'cached'
+    mode = cache.mode_for(index, width, height) if cache.is_fresh(index) else None
+    mismatch = False
+    if mode is not None:
+        cap = _open_mode(index, cache.entry(index)['backend'], *mode, capture_factory)
+        if cap is None:
+            print(f"Video: Camera {index} does not match its cached configuration, probing again")
+            mismatch = True
+            mode = None
+    if mode is None:
+        source = 'probed'
+        resolutions = [(width, height)] + [r for r in probe_options.pop('resolutions', COMMON_RESOLUTIONS)
+                                           if tuple(r) != (width, height)]
+        capabilities = probe_camera(index, resolutions, capture_factory=capture_factory, **probe_options)
+        if capabilities is None or not capabilities['modes']:
+            # Unplugged rather than changed: keep the entry for when it is back
+            print(f"Video: Error: Could not open camera {index}")
+            return None, None
+        if mismatch:
+            cache.invalidate(index)
+        cache.record(index, capabilities)
+        cache.save()
+        mode = cache.mode_for(index, width, height)
+        if mode is None:
+            # The requested size was accepted by no backend mode: use the first that works
+            native = capabilities['native']
+            mode = tuple(int(v) for v in native.split('x')) + (capabilities['modes'][native],)
+        cap = _open_mode(index, capabilities['backend'], *mode, capture_factory)
+        if cap is None:
+            print(f"Video: Error: Camera {index} failed right after probing")
+            return None, None
+
+    entry = cache.entry(index)
+    w, h, info = mode
+    config = {'index': index, 'backend': entry['backend'], 'backend_name': entry.get('backend_name'),
+              'width': w, 'height': h, 'fps': info['fps'], 'fourcc': info.get('fourcc'), 'source': source}
+    print(f"Video: Camera {index} ready in {time.perf_counter() - start:.2f} s ({source}): "
+          f"{w}x{h} @ {info['fps']} fps {info.get('fourcc') or ''} via {config['backend_name']}")
+    return cap, config
+
+
+class _FakeCapture:
+    """cv2.VideoCapture stand-in: one camera per index with per-backend open delays and supported sizes"""
+
+    def __init__(self, cameras, index, backend):
+        self.camera = cameras.get(index)
+        self.backend = backend
+        self.opened = self.camera is not None and backend in self.camera['backends']
+        time.sleep(self.camera['backends'].get(backend, 0.05) if self.camera else 0.05)
+        self.props = {}
+        self.pending_width = 640
+        if self.opened:
+            self.props = {cv2.CAP_PROP_FRAME_WIDTH: 640, cv2.CAP_PROP_FRAME_HEIGHT: 480, cv2.CAP_PROP_FPS: 30.0,
+                          cv2.CAP_PROP_FOURCC: cv2.VideoWriter_fourcc(*'YUYV')}
+
+    def isOpened(self):
+        return self.opened
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            self.pending_width = int(value)
+        elif prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            # Like a driver: unsupported sizes fall back to the native mode
+            time.sleep(0.02)
+            size = (self.pending_width, int(value))
+            if size not in self.camera['sizes']:
+                size = (640, 480)
+            self.props[cv2.CAP_PROP_FRAME_WIDTH], self.props[cv2.CAP_PROP_FRAME_HEIGHT] = size
+            self.props[cv2.CAP_PROP_FOURCC] = cv2.VideoWriter_fourcc(*self.camera['sizes'][size][1])
+        else:
+            self.props[prop] = value
+        return True
+
+    def get(self, prop):
+        return self.props.get(prop, 0.0)
+
+    def read(self):
+        if not self.opened:
+            return False, None
+        size = (int(self.props[cv2.CAP_PROP_FRAME_WIDTH]), int(self.props[cv2.CAP_PROP_FRAME_HEIGHT]))
+        time.sleep(1.0 / self.camera['sizes'][size][0])
+        return True, None
+
+    def release(self):
+        self.opened = False
+
+
+def _self_test(path='camera_cache_test.json'):
+    """Probe once, then open from cache; re-probe when the camera changes"""
+    cameras = {0: {'backends': {cv2.CAP_V4L2: 0.3, cv2.CAP_ANY: 0.3},
+                   'sizes': {(640, 480): (30.0, 'YUYV'), (1280, 720): (60.0, 'MJPG'), (1920, 1080): (30.0, 'MJPG')}}}
+    opens = []
+
+    def factory(index, backend):
+        opens.append(backend)
+        return _FakeCapture(cameras, index, backend)
+
+    if os.path.exists(path):
+        os.remove(path)
+    backends = [cv2.CAP_DSHOW, cv2.CAP_V4L2, cv2.CAP_ANY]
+
+    start = time.perf_counter()
+    cap, config = open_camera_cached(0, 1280, 720, CameraCache(path), factory, backends=backends, measure_frames=10)
+    probed = time.perf_counter() - start
+    assert config['source'] == 'probed' and (config['width'], config['height']) == (1280, 720)
+    assert config['fourcc'] == 'MJPG' and 50 < config['fps'] <= 61 and config['backend'] == cv2.CAP_V4L2
+    cap.release()
+
+    opens.clear()
+    start = time.perf_counter()
+    cap, config = open_camera_cached(0, 1280, 720, CameraCache(path), factory, backends=backends)
+    cached = time.perf_counter() - start
+    assert config['source'] == 'cached' and opens == [cv2.CAP_V4L2], opens
+    cap.release()
+
+    # A size the camera rejected opens in its native mode without probing
+    cameras[0]['sizes'].pop((1920, 1080))
+    entry_cache = CameraCache(path)
+    entry_cache.devices['0']['rejected'].append('800x600')
+    entry_cache.save()
+    cap, config = open_camera_cached(0, 800, 600, CameraCache(path), factory, backends=backends)
+    assert config['source'] == 'cached' and (config['width'], config['height']) == (640, 480)
+
+    # A different camera at the index: the cached 1080p mode fails, so probe again
+    cap, config = open_camera_cached(0, 1920, 1080, CameraCache(path), factory, backends=backends, measure_frames=5)
+    assert config['source'] == 'probed' and (config['width'], config['height']) == (640, 480), config
+    assert '1920x1080' in CameraCache(path).entry(0)['rejected']
+    cap.release()
+    os.remove(path)
+    print(f"Video: camera cache self-test passed; startup {probed:.2f} s probed, {cached:.2f} s cached")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe cameras and store their capabilities")
+    parser.add_argument('indices', nargs='*', type=int, help="Camera indices to probe (default 0-3)")
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help="Capabilities JSON file")
+    parser.add_argument('--self-test', action='store_true', help="Run the simulated camera test")
+    args = parser.parse_args()
+    if args.self_test:
+        _self_test()
+        return
+    cache = CameraCache(args.cache)
+    for index in args.indices or range(4):
+        capabilities = probe_camera(index)
+        if capabilities is None:
+            print(f"Video: No camera at index {index}")
+            continue
+        cache.record(index, capabilities)
+        print(f"Video: Camera {index} via {capabilities['backend_name']}, native {capabilities['native']}")
+        for mode, info in capabilities['modes'].items():
+            print(f"Video:   {mode} @ {info['fps']} fps measured ({info['reported_fps']} reported) {info['fourcc']}")
+        if capabilities['rejected']:
+            print(f"Video:   rejected {', '.join(capabilities['rejected'])}")
+    cache.save()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,29 @@
 import cv2
+from camera_cache import CameraCache, probe_camera
+from video_preview import gui_available
 
-# Try different camera indices
+# Probe camera indices 0-3 and store what works in camera_cache.json,
+# so the recorders open the right backend and mode directly
+cache = CameraCache()
 for i in range(0, 4):
-    cap = cv2.VideoCapture(i)
-    if cap.isOpened():
-        print(f"Camera found at index {i}")
+    capabilities = probe_camera(i)
+    if capabilities is None:
+        print(f"No camera at index {i}")
+        continue
+    cache.record(i, capabilities)
+    print(f"Camera found at index {i} ({capabilities['backend_name']}, native {capabilities['native']})")
+    for mode, info in capabilities['modes'].items():
+        print(f"  {mode}: {info['fps']} fps measured ({info['reported_fps']} reported), {info['fourcc']}")
+
+    if gui_available():
+        cap = cv2.VideoCapture(i, capabilities['backend'])
         ret, frame = cap.read()
         if ret:
             print("Frame captured successfully")
             cv2.imshow('Frame', frame)
             cv2.waitKey(1000)
         cap.release()
-    else:
-        print(f"No camera at index {i}")
 
-cv2.destroyAllWindows()
\ No newline at end of file
+cache.save()
+if gui_available():
+    cv2.destroyAllWindows()
@@ -0,0 +1,287 @@
+import argparse
+import csv
+import glob
+import math
+import os
+import time
+from collections import deque
+import numpy as np
+from scipy.ndimage import minimum_filter1d
+from scipy.signal import lfilter
+
+SCR_FIELDS = ['onset_index', 'peak_index', 'onset_s', 'peak_s', 'amplitude_us', 'rise_time_s']
+
+
+class EdaParams:
+    """
+    Settings shared by the streaming and offline EDA analysis
+
+    Args:
+        sampling_rate (float): Samples per second
+        smoothing_hz (float): Cutoff of the one-pole low-pass applied first
+        tonic_seconds (float): Window of the sliding minimum and of the
+            moving average that turn it into the tonic level
+        onset_slope (float): Slope (uS/s) that marks an SCR onset
+        min_amplitude (float): Smallest SCR amplitude (uS) reported
+        rise_time (tuple): Accepted (min, max) onset-to-peak time in seconds
+    """
+
+    def __init__(self, sampling_rate, smoothing_hz=1.0, tonic_seconds=8.0, onset_slope=0.02,
+                 min_amplitude=0.02, rise_time=(0.3, 5.0)):
+        self.sampling_rate = sampling_rate
+        self.alpha = 1.0 - math.exp(-2 * math.pi * smoothing_hz / sampling_rate)
+        self.tonic_size = max(1, int(round(tonic_seconds * sampling_rate)))
+        self.onset_slope = onset_slope
+        self.min_amplitude = min_amplitude
+        self.rise_time = rise_time
+
+    def accept(self, amplitude, rise_samples):
+        rise = rise_samples / self.sampling_rate
+        return amplitude >= self.min_amplitude and self.rise_time[0] <= rise <= self.rise_time[1]
+
+
+def _scr_event(onset, peak, amplitude, sampling_rate):
+    return {
+        'onset_index': onset,
+        'peak_index': peak,
+        'onset_s': onset / sampling_rate,
+        'peak_s': peak / sampling_rate,
+        'amplitude_us': amplitude,
+        'rise_time_s': (peak - onset) / sampling_rate,
+    }
+
+
+class EdaStream:
+    """
+    Online tonic/phasic separation and SCR detection, O(1) amortized per sample
+
+    - smoothed: one-pole low-pass of the conductance
+    - tonic: moving average of the sliding minimum of the smoothed signal
+      (monotonic deque for the minimum, ring buffer with a running sum for
+      the average)
+    - phasic: smoothed - tonic
+    - SCR: onset where the slope crosses onset_slope, peak where the slope
+      returns to zero; amplitude and rise time are measured between them
+
+    eda_offline() computes exactly the same quantities on a whole recording.
+    """
+
+    def __init__(self, sampling_rate, **kwargs):
+        self.params = EdaParams(sampling_rate, **kwargs)
+        self.index = -1
+        self.smoothed = None
+        self.slope = None
+        self.minima = deque()   # (index, value), values increasing
+        self.ring = np.zeros(self.params.tonic_size)
+        self.ring_sum = 0.0
+        self.onset = None       # (index, smoothed value) of the rise in progress
+        self.events = []
+
+    def push(self, value):
+        """
+        Add one conductance sample (uS)
+
+        Returns:
+            tuple: (tonic, phasic, SCR event dict or None)
+        """
+        p = self.params
+        self.index += 1
+        i = self.index
+
+        # Smoothing (same arithmetic as scipy.signal.lfilter in eda_offline)
+        previous = value if self.smoothed is None else self.smoothed
+        smoothed = p.alpha * value + (1.0 - p.alpha) * previous
+        slope = None if self.smoothed is None else (smoothed - self.smoothed) * p.sampling_rate
+
+        # Sliding minimum over the last tonic_size samples
+        while self.minima and self.minima[-1][1] >= smoothed:
+            self.minima.pop()
+        self.minima.append((i, smoothed))
+        if self.minima[0][0] <= i - p.tonic_size:
+            self.minima.popleft()
+        floor = self.minima[0][1]
+
+        # Moving average of the minimum; the running sum is rebuilt once per lap
+        slot = i % p.tonic_size
+        self.ring_sum += floor - self.ring[slot]
+        self.ring[slot] = floor
+        if slot == p.tonic_size - 1:
+            self.ring_sum = float(self.ring.sum())
+        tonic = self.ring_sum / min(i + 1, p.tonic_size)
+
+        event = None
+        if self.slope is not None:
+            if self.onset is None and self.slope < p.onset_slope <= slope:
+                self.onset = (i, smoothed)
+            elif self.onset is not None and slope <= 0 < self.slope:
+                onset, onset_value = self.onset
+                amplitude = self.smoothed - onset_value
+                if p.accept(amplitude, i - 1 - onset):
+                    event = _scr_event(onset, i - 1, amplitude, p.sampling_rate)
+                    self.events.append(event)
+                self.onset = None
+
+        self.smoothed = smoothed
+        self.slope = slope
+        return tonic, smoothed - tonic, event
+
+    def push_block(self, values):
+        """Add several samples; returns (tonic, phasic, events) for the block"""
+        tonic = np.empty(len(values))
+        phasic = np.empty(len(values))
+        events = []
+        for k, value in enumerate(values):
+            tonic[k], phasic[k], event = self.push(float(value))
+            if event is not None:
+                events.append(event)
+        return tonic, phasic, events
+
+
+def eda_offline(conductance, sampling_rate, **kwargs):
+    """
+    Vectorized EdaStream over a whole recording
+
+    Returns:
+        tuple: (smoothed, tonic, phasic, list of SCR event dicts)
+    """
+    p = EdaParams(sampling_rate, **kwargs)
+    x = np.asarray(conductance, dtype=np.float64)
+    n = len(x)
+    if n == 0:
+        empty = np.empty(0)
+        return empty, empty, empty, []
+
+    smoothed = lfilter([p.alpha], [1.0, -(1.0 - p.alpha)], x, zi=[(1.0 - p.alpha) * x[0]])[0]
+
+    # Trailing minimum: pad the front so partial windows match the streaming deque
+    w = p.tonic_size
+    padded = np.concatenate([np.full(w - 1, smoothed[0]), smoothed])
+    floor = minimum_filter1d(padded, w, mode='nearest')[w // 2:w // 2 + n]
+    cumulative = np.concatenate([[0.0], np.cumsum(floor)])
+    starts = np.maximum(np.arange(1, n + 1) - w, 0)
+    tonic = (cumulative[1:] - cumulative[starts]) / (np.arange(1, n + 1) - starts)
+    phasic = smoothed - tonic
+
+    # slope[i] is defined from sample 1 on; crossings need two slopes
+    slope = np.diff(smoothed) * sampling_rate
+    onsets = np.flatnonzero((slope[:-1] < p.onset_slope) & (slope[1:] >= p.onset_slope)) + 2
+    peaks = np.flatnonzero((slope[:-1] > 0) & (slope[1:] <= 0)) + 1   # index of the maximum
+    events = []
+    if len(onsets) and len(peaks):
+        # Each onset ends at the next peak; later onsets inside the same rise are ignored
+        following = np.searchsorted(peaks, onsets, side='left')
+        valid = following < len(peaks)
+        onsets, following = onsets[valid], following[valid]
+        first = np.concatenate([[True], following[1:] != following[:-1]])
+        onsets, peak_index = onsets[first], peaks[following[first]]
+        amplitudes = smoothed[peak_index] - smoothed[onsets]
+        for onset, peak, amplitude in zip(onsets.tolist(), peak_index.tolist(), amplitudes.tolist()):
+            if p.accept(amplitude, peak - onset):
+                events.append(_scr_event(onset, peak, amplitude, sampling_rate))
+    return smoothed, tonic, phasic, events
+
+
+def load_gsr_csv(path):
+    """
+    Read a GSR_data_*.csv recording (timestamp, datetime, ADC, microsiemens, impulse)
+
+    Samples without a valid conductance (saturated or open-circuit ADC
+    codes, see gsr_calibration) are stored as an empty field by
+    ColumnarCsvLogger (older files may have 'nan'); both are read as NaN
+    and linearly interpolated.
+
+    Returns:
+        tuple: (unix timestamps, conductance in uS)
+    """
+    data = np.loadtxt(path, delimiter=',', skiprows=1, usecols=(0, 3), ndmin=2,
+                      converters={3: lambda field: float(field or 'nan')})
+    timestamps, conductance = data[:, 0], data[:, 1]
+    invalid = np.isnan(conductance)
+    if invalid.any() and not invalid.all():
+        conductance[invalid] = np.interp(timestamps[invalid], timestamps[~invalid], conductance[~invalid])
+    return timestamps, conductance
+
+
+def analyze_csv(path, out_dir=None, sampling_rate=None, **kwargs):
+    """
+    Offline analysis of one recording; writes <name>_eda.csv and <name>_scr.csv
+
+    The sampling rate is estimated from the timestamps unless given.
+    """
+    timestamps, conductance = load_gsr_csv(path)
+    if sampling_rate is None:
+        sampling_rate = 1.0 / np.median(np.diff(timestamps)) if len(timestamps) > 1 else 1.0
+    smoothed, tonic, phasic, events = eda_offline(conductance, sampling_rate, **kwargs)
+
+    stem = os.path.join(out_dir or os.path.dirname(path), os.path.splitext(os.path.basename(path))[0])
+    with open(f'{stem}_eda.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'microsiemens', 'smoothed', 'tonic', 'phasic'])
+        writer.writerows(np.column_stack([timestamps, conductance, smoothed, tonic, phasic]))
+    with open(f'{stem}_scr.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['onset_timestamp'] + SCR_FIELDS)
+        for event in events:
+            writer.writerow([timestamps[event['onset_index']]] + [event[key] for key in SCR_FIELDS])
+    return sampling_rate, events
+
+
+def _synthetic_eda(sampling_rate, seconds, onsets, rng):
+    """Drifting tonic level plus Bateman-shaped SCRs and sensor noise"""
+    t = np.arange(int(seconds * sampling_rate)) / sampling_rate
+    signal = 2.0 + 0.3 * np.sin(2 * np.pi * t / 120)
+    for onset, amplitude in onsets:
+        dt = np.clip(t - onset, 0, None)
+        shape = np.exp(-dt / 4.0) - np.exp(-dt / 0.75)
+        signal += amplitude * shape / shape.max()
+    return signal + rng.normal(0, 0.002, len(t))
+
+
+def _self_test(sampling_rate=100, seconds=300):
+    """Streaming and offline paths agree and recover synthetic SCRs"""
+    rng = np.random.default_rng(1)
+    onsets = [(20 + 25 * k, 0.1 + 0.05 * (k % 4)) for k in range(11)]
+    conductance = _synthetic_eda(sampling_rate, seconds, onsets, rng)
+
+    stream = EdaStream(sampling_rate)
+    start = time.perf_counter()
+    tonic, phasic, events = stream.push_block(conductance)
+    per_sample = (time.perf_counter() - start) / len(conductance)
+
+    start = time.perf_counter()
+    smoothed, tonic_offline, phasic_offline, events_offline = eda_offline(conductance, sampling_rate)
+    offline = time.perf_counter() - start
+
+    assert np.allclose(tonic, tonic_offline, atol=1e-9) and np.allclose(phasic, phasic_offline, atol=1e-9)
+    assert [(e['onset_index'], e['peak_index']) for e in events] == \
+           [(e['onset_index'], e['peak_index']) for e in events_offline]
+    found = [e['onset_s'] for e in events]
+    for onset, _ in onsets:
+        assert any(abs(f - onset) < 1.0 for f in found), f"SCR at {onset} s not detected: {found}"
+    print(f"GSR: EDA self-test passed: {len(events)} SCRs ({len(onsets)} simulated), "
+          f"streaming {per_sample * 1e6:.1f} us/sample ({1 / per_sample:.0f} Hz max), "
+          f"offline {len(conductance) / offline / 1e6:.1f} M samples/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline tonic/phasic decomposition and SCR detection")
+    parser.add_argument('inputs', nargs='*', help="GSR_data_*.csv files or glob patterns")
+    parser.add_argument('-o', '--out', default=None, help="Output directory (default: next to each input)")
+    parser.add_argument('--rate', type=float, default=None, help="Sampling rate (default: from timestamps)")
+    parser.add_argument('--min-amplitude', type=float, default=0.02, help="Smallest SCR in uS")
+    parser.add_argument('--self-test', action='store_true', help="Run the synthetic self-test")
+    args = parser.parse_args()
+
+    if args.self_test or not args.inputs:
+        _self_test()
+        return
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+    paths = sorted({p for pattern in args.inputs for p in glob.glob(pattern)})
+    for path in paths:
+        rate, events = analyze_csv(path, args.out, args.rate, min_amplitude=args.min_amplitude)
+        print(f"GSR: {os.path.basename(path)}: {len(events)} SCRs at {rate:.1f} Hz")
+
+
+if __name__ == "__main__":
+    main()
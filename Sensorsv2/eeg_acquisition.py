@@ -0,0 +1,225 @@
+import time
+import numpy as np
+from brainflow.board_shim import BoardShim, BrainFlowError
+
+PACKAGE_MODULO = 256       # Cyton package counter is one byte
+MAX_BUFFER_SECONDS = 120   # Ring buffer cap for long sessions (memory stays constant)
+MIN_BUFFER_SECONDS = 10
+HIGH_WATER_FRACTION = 0.8  # Warn when the ring buffer is this full
+
+
+def buffer_size_for_session(sampling_rate, session_seconds=None, margin=1.25,
+                            max_seconds=MAX_BUFFER_SECONDS, min_seconds=MIN_BUFFER_SECONDS):
+    """
+    Ring buffer size (samples) for start_stream
+
+    Short sessions get a buffer that holds the whole session plus a margin,
+    so nothing is lost even if polling stalls. Long or open-ended sessions
+    get a fixed cap and rely on polling, which keeps memory constant.
+    """
+    if session_seconds is None:
+        seconds = max_seconds
+    else:
+        seconds = min(max(session_seconds * margin, min_seconds), max_seconds)
+    return int(seconds * sampling_rate)
+
+
+class GapTracker:
+    """
+    Detect dropped samples from the wrapping package-number channel
+
+    The counter wraps every 256 packages, so when timestamps are given
+    they decide how many whole wraps a long gap spans.
+    """
+
+    def __init__(self, sampling_rate, modulo=PACKAGE_MODULO, step=None):
+        self.sampling_rate = sampling_rate
+        self.modulo = modulo
+        self.step = step
+        self.last = None
+        self.last_timestamp = None
+        self.dropped = 0
+        self.gap_events = 0
+
+    def update(self, packages, timestamps=None):
+        """
+        Check one block of package numbers
+
+        Returns:
+            list: (previous package, next package, dropped samples) per gap
+        """
+        packages = np.asarray(packages).astype(np.int64)
+        if len(packages) == 0:
+            return []
+        if timestamps is not None and self.last_timestamp is not None:
+            timestamps = np.concatenate([[self.last_timestamp], timestamps])
+        if self.last is not None:
+            packages = np.concatenate([[self.last], packages])
+        self.last = int(packages[-1])
+        if timestamps is not None:
+            self.last_timestamp = float(timestamps[-1])
+            if len(timestamps) != len(packages):
+                timestamps = None
+        if len(packages) < 2:
+            return []
+
+        diffs = np.diff(packages) % self.modulo
+        if self.step is None:
+            # Cyton increments by 1, Daisy-merged packets may step by 2
+            values, counts = np.unique(diffs, return_counts=True)
+            self.step = int(values[np.argmax(counts)]) or 1
+        gaps = np.flatnonzero(diffs != self.step)
+        events = []
+        for i in gaps:
+            missing = int(((diffs[i] - self.step) % self.modulo) // self.step)
+            if timestamps is not None:
+                elapsed = round((timestamps[i + 1] - timestamps[i]) * self.sampling_rate / self.step) - 1
+                wrap = self.modulo // self.step
+                missing += wrap * max(0, int(round((elapsed - missing) / wrap)))
+            if missing == 0:
+                continue
+            events.append((int(packages[i]), int(packages[i + 1]), missing))
+            self.dropped += missing
+        self.gap_events += len(events)
+        return events
+
+
+class AcquisitionStats:
+    def __init__(self, buffer_size):
+        self.buffer_size = buffer_size
+        self.samples = 0
+        self.polls = 0
+        self.max_pending = 0
+        self.high_water_events = 0
+        self.above_high_water = False
+        self.started = time.time()
+
+    def summary(self, gaps):
+        elapsed = time.time() - self.started
+        return (f"{self.samples} samples in {elapsed:.0f} s, {self.polls} polls, "
+                f"{gaps.dropped} dropped in {gaps.gap_events} gaps, "
+                f"peak buffer use {self.max_pending}/{self.buffer_size}")
+
+
+def acquire(board, board_id, on_block, stop_event, poll_seconds=0.1, buffer_size=None,
+            min_sleep=0.005, package_step=None, report_every=60.0):
+    """
+    Poll a streaming board until stop_event is set, in constant memory
+
+    Each poll reads exactly the samples available (get_board_data_count),
+    hands the block to on_block and forgets it. The next sleep is sized so
+    that roughly poll_seconds of data is waiting at the next poll. Dropped
+    samples (ring buffer overflow, serial hiccups) are reported as soon as
+    the package-number channel shows a gap.
+
+    Args:
+        board: BoardShim with an active stream
+        board_id: Board id (for channel layout and sampling rate)
+        on_block (callable): Receives every block (rows x samples)
+        stop_event: Event to signal when to stop
+        poll_seconds (float): Target amount of data per poll
+        buffer_size (int): Size passed to start_stream, for overflow warnings
+
+    Returns:
+        tuple: (AcquisitionStats, GapTracker)
+    """
+    sampling_rate = BoardShim.get_sampling_rate(board_id)
+    try:
+        package_channel = BoardShim.get_package_num_channel(board_id)
+    except BrainFlowError:
+        package_channel = None
+    try:
+        timestamp_channel = BoardShim.get_timestamp_channel(board_id)
+    except BrainFlowError:
+        timestamp_channel = None
+    target = max(1, int(poll_seconds * sampling_rate))
+    buffer_size = buffer_size or buffer_size_for_session(sampling_rate)
+
+    stats = AcquisitionStats(buffer_size)
+    gaps = GapTracker(sampling_rate, step=package_step)
+    next_report = time.time() + report_every
+
+    def poll():
+        count = board.get_board_data_count()
+        stats.max_pending = max(stats.max_pending, count)
+        # Warn once per episode: when the buffer crosses the high-water mark and when it recovers
+        above = count >= HIGH_WATER_FRACTION * buffer_size
+        if above and not stats.above_high_water:
+            stats.high_water_events += 1
+            print(f"EEG: ⚠️ Ring buffer {count}/{buffer_size} full, samples may be overwritten")
+        elif stats.above_high_water and not above:
+            print(f"EEG: Ring buffer back to {count}/{buffer_size}")
+        stats.above_high_water = above
+        if count > 0:
+            data = board.get_board_data(count)
+            stats.samples += data.shape[1]
+            stats.polls += 1
+            if package_channel is not None:
+                timestamps = data[timestamp_channel] if timestamp_channel is not None else None
+                for previous, following, missing in gaps.update(data[package_channel], timestamps):
+                    print(f"EEG: ⚠️ {missing} samples dropped (package {previous} -> {following}), "
+                          f"{gaps.dropped} total")
+            on_block(data)
+
+    while not stop_event.is_set():
+        poll()
+        # Sleep until about `target` samples are waiting
+        waiting = board.get_board_data_count()
+        time.sleep(max(min_sleep, (target - waiting) / sampling_rate))
+        if report_every and time.time() >= next_report:
+            next_report += report_every
+            print(f"EEG: {stats.summary(gaps)}")
+
+    # Drain whatever arrived after the last poll
+    poll()
+    return stats, gaps
+
+
+def _self_test(seconds=10):
+    """Run on SYNTHETIC_BOARD: normal polling, then a stalled consumer that overflows"""
+    import threading
+    import tracemalloc
+    from brainflow.board_shim import BoardIds, BrainFlowInputParams
+
+    board_id = BoardIds.SYNTHETIC_BOARD
+    sampling_rate = BoardShim.get_sampling_rate(board_id)
+    BoardShim.disable_board_logger()
+
+    def run(buffer_size, consumer_delay, duration):
+        board = BoardShim(board_id, BrainFlowInputParams())
+        board.prepare_session()
+        board.start_stream(buffer_size)
+        stop_event = threading.Event()
+        timer = threading.Timer(duration, stop_event.set)
+        timer.start()
+
+        def on_block(data):
+            time.sleep(consumer_delay)
+
+        tracemalloc.start()
+        try:
+            stats, gaps = acquire(board, board_id, on_block, stop_event, buffer_size=buffer_size,
+                                  report_every=0)
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            board.stop_stream()
+            board.release_session()
+        print(f"EEG: {stats.summary(gaps)}, python peak memory {peak / 1e3:.0f} kB")
+        return stats, gaps
+
+    print("EEG: Normal polling")
+    stats, gaps = run(buffer_size_for_session(sampling_rate, seconds), 0.0, seconds)
+    expected = seconds * sampling_rate
+    ok = gaps.dropped == 0 and abs(stats.samples - expected) < 0.1 * expected
+
+    print("EEG: Stalled consumer with a 0.2 s ring buffer")
+    stats, gaps = run(int(0.2 * sampling_rate), 0.5, 3)
+    # Full on every poll, but warned about once per episode
+    ok = ok and gaps.dropped > 0 and 0 < stats.high_water_events < stats.polls
+    print("EEG: Self-test passed" if ok else "EEG: ❌ Self-test failed")
+    return ok
+
+
+if __name__ == "__main__":
+    _self_test()
@@ -0,0 +1,184 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from brainflow.board_shim import BoardShim, BoardIds
+from eeg_binary import EegBinaryReader, EegBinaryWriter
+from eeg_codec import EegCodecReader
+from eeg_filters import filter_offline
+from eeg_features import band_power_offline, workload_indices, BANDS
+from eeg_preprocessing import preprocess
+
+DEFAULT_PATTERNS = ('eeg_*.csv', 'eeg_*.eegb', 'eeg_*.eegz')
+# Names of the files written next to each session (see output_paths)
+OUTPUT_SUFFIXES = {
+    'filtered': '_filtered.eegb',
+    'bandpower': '_bandpower.csv',
+    'manifest': '_manifest.json',
+}
+BOARDS = {
+    'cyton': BoardIds.CYTON_BOARD,
+    'daisy': BoardIds.CYTON_DAISY_BOARD,
+    'synthetic': BoardIds.SYNTHETIC_BOARD,
+}
+
+
+def is_output(path):
+    """True for files this batch writes, which the session patterns would otherwise match"""
+    return os.path.basename(path).endswith(tuple(OUTPUT_SUFFIXES.values()))
+
+
+def find_sessions(inputs, patterns=DEFAULT_PATTERNS):
+    """
+    Expand directories and glob patterns into a sorted list of session files
+
+    Outputs of earlier runs (e.g. with --out pointing at the input
+    directory) are left out unless a file is named explicitly.
+    """
+    sessions = set()
+    for item in inputs:
+        if os.path.isfile(item):
+            sessions.add(item)
+        elif os.path.isdir(item):
+            for pattern in patterns:
+                sessions.update(p for p in glob.glob(os.path.join(item, pattern)) if not is_output(p))
+        else:
+            sessions.update(p for p in glob.glob(item) if os.path.isfile(p) and not is_output(p))
+    return sorted(sessions)
+
+
+def load_session(path, board_id):
+    """
+    Load a recording written by eegHeadset
+
+    Returns:
+        tuple: (rows x samples array, board_id)
+    """
+    if path.endswith(('.eegb', '.eegz')):
+        reader = EegBinaryReader(path) if path.endswith('.eegb') else EegCodecReader(path)
+        board_id = reader.header.get('metadata', {}).get('board_id', board_id)
+        return np.asarray(reader.read(), dtype=np.float64), board_id
+
+    data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+    return data.T, board_id
+
+
+def output_paths(path, out_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return {kind: os.path.join(out_dir, stem + suffix) for kind, suffix in OUTPUT_SUFFIXES.items()}
+
+
+def is_up_to_date(path, out_dir, params):
+    """True if every output exists and was produced from this input with these parameters"""
+    outputs = output_paths(path, out_dir)
+    if not all(os.path.exists(p) for p in outputs.values()):
+        return False
+    try:
+        with open(outputs['manifest']) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    stat = os.stat(path)
+    return (manifest.get('input_mtime') == stat.st_mtime and manifest.get('input_size') == stat.st_size
+            and manifest.get('params') == params)
+
+
+def process_session(path, out_dir, params):
+    """Filter, optionally clean, and extract band power for one session (runs in a worker)"""
+    start = time.perf_counter()
+    data, board_id = load_session(path, BOARDS[params['board']])
+    sampling_rate = BoardShim.get_sampling_rate(board_id)
+    eeg_channels = BoardShim.get_eeg_channels(board_id)
+    names = BoardShim.get_eeg_names(board_id)
+
+    eeg = filter_offline(data[eeg_channels], sampling_rate)
+    info = {}
+    if params['preprocess']:
+        eeg, info = preprocess(eeg, sampling_rate, names)
+        info = {'bad_channels': [names[i] for i in info['bad_channels']],
+                'asr_windows_repaired': info['asr_windows_repaired']}
+
+    outputs = output_paths(path, out_dir)
+    with EegBinaryWriter(outputs['filtered'], len(eeg_channels), sampling_rate, channel_names=names,
+                         csv_header=names, metadata={'board_id': int(board_id), 'source': path}) as writer:
+        writer.write(eeg)
+
+    ends, power = band_power_offline(eeg, sampling_rate, window_seconds=params['window'],
+                                     step_seconds=params['step'])
+    mean_power = power.mean(axis=1)
+    indices = workload_indices(mean_power, list(BANDS))
+    with open(outputs['bandpower'], 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['sample', 'time_s']
+                        + [f'{name}_{band}' for name in names for band in BANDS]
+                        + list(indices))
+        columns = [ends[:, None], ends[:, None] / sampling_rate,
+                   power.reshape(len(ends), -1)] + [v[:, None] for v in indices.values()]
+        writer.writerows(np.hstack(columns))
+
+    stat = os.stat(path)
+    with open(outputs['manifest'], 'w') as f:
+        json.dump({'input': path, 'input_mtime': stat.st_mtime, 'input_size': stat.st_size,
+                   'params': params, 'samples': int(data.shape[1]), 'windows': int(len(ends)),
+                   **info}, f, indent=2)
+    return path, time.perf_counter() - start
+
+
+def run_batch(inputs, out_dir, params, jobs=None, force=False):
+    """
+    Process every session not already up to date
+
+    Returns:
+        tuple: (processed paths, skipped paths, failed paths)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    sessions = find_sessions(inputs)
+    todo = [p for p in sessions if force or not is_up_to_date(p, out_dir, params)]
+    skipped = [p for p in sessions if p not in todo]
+    print(f"EEG batch: {len(sessions)} sessions found, {len(skipped)} up to date, {len(todo)} to process")
+
+    processed, failed = [], []
+    if not todo:
+        return processed, skipped, failed
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(process_session, p, out_dir, params): p for p in todo}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                _, elapsed = future.result()
+                processed.append(path)
+                print(f"EEG batch: [{done}/{len(todo)}] {os.path.basename(path)} done in {elapsed:.1f} s")
+            except Exception as e:
+                failed.append(path)
+                print(f"EEG batch: [{done}/{len(todo)}] ❌ {os.path.basename(path)}: {e}")
+    return processed, skipped, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch reprocessing of recorded EEG sessions")
+    parser.add_argument('inputs', nargs='+', help="Session files, directories or glob patterns")
+    parser.add_argument('-o', '--out', default='eeg_results', help="Output directory")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--board', choices=sorted(BOARDS), default='cyton',
+                        help="Board used for CSV recordings (.eegb/.eegz files store it)")
+    parser.add_argument('--preprocess', action='store_true',
+                        help="Also run bad channel interpolation, average reference and ASR")
+    parser.add_argument('--window', type=float, default=2.0, help="Band power window in seconds")
+    parser.add_argument('--step', type=float, default=0.25, help="Band power step in seconds")
+    parser.add_argument('--force', action='store_true', help="Reprocess even if outputs are up to date")
+    args = parser.parse_args()
+
+    params = {'board': args.board, 'preprocess': args.preprocess, 'window': args.window, 'step': args.step}
+    start = time.perf_counter()
+    processed, skipped, failed = run_batch(args.inputs, args.out, params, args.jobs, args.force)
+    print(f"EEG batch: {len(processed)} processed, {len(skipped)} skipped, {len(failed)} failed "
+          f"in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
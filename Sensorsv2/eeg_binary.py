@@ -0,0 +1,230 @@
+import csv
+import json
+import os
+import struct
+import time
+import numpy as np
+
+# File layout:
+#   b'EEGB' | uint32 header length | JSON header (padded to 64 bytes)
+#   then blocks of: b'BLK1' | uint32 n_samples | uint64 first sample | payload
+# Each payload is one polled block stored column-wise (channels x samples),
+# exactly as BrainFlow returns it, so it can be memory-mapped without copies.
+FILE_MAGIC = b'EEGB'
+BLOCK_MAGIC = b'BLK1'
+FORMAT_VERSION = 1
+HEADER_ALIGN = 64
+BLOCK_HEADER = struct.Struct('<4sIQ')
+DTYPES = {'float32': '<f4', 'float64': '<f8'}
+
+
+class EegBinaryWriter:
+    def __init__(self, filename, n_channels, sampling_rate, channel_names=None,
+                 csv_header=None, dtype='float64', metadata=None):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype}, use one of {list(DTYPES)}")
+
+        self.filename = filename
+        self.n_channels = n_channels
+        self.dtype = np.dtype(DTYPES[dtype])
+        self.samples_written = 0
+        self.blocks_written = 0
+
+        header = {
+            'version': FORMAT_VERSION,
+            'dtype': dtype,
+            'n_channels': n_channels,
+            'sampling_rate': sampling_rate,
+            'channel_names': channel_names or [f'Ch_{i}' for i in range(n_channels)],
+            'csv_header': csv_header,
+            'created': time.time(),
+            'metadata': metadata or {},
+        }
+        payload = json.dumps(header).encode('utf-8')
+        # Pad so the first block starts on an aligned offset
+        used = len(FILE_MAGIC) + 4 + len(payload)
+        payload += b' ' * (-used % HEADER_ALIGN)
+
+        self.file = open(filename, 'wb')
+        self.file.write(FILE_MAGIC)
+        self.file.write(struct.pack('<I', len(payload)))
+        self.file.write(payload)
+
+    def write(self, data):
+        """Append one polled block (channels x samples) to the file"""
+        if data.ndim != 2 or data.shape[0] != self.n_channels:
+            raise ValueError(f"Expected block with {self.n_channels} rows, got shape {data.shape}")
+        n_samples = data.shape[1]
+        if n_samples == 0:
+            return
+
+        block = np.ascontiguousarray(data, dtype=self.dtype)
+        self.file.write(BLOCK_HEADER.pack(BLOCK_MAGIC, n_samples, self.samples_written))
+        self.file.write(memoryview(block).cast('B'))
+        self.samples_written += n_samples
+        self.blocks_written += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EegBinaryReader:
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            if f.read(4) != FILE_MAGIC:
+                raise ValueError(f"{filename} is not an EEG binary recording")
+            header_len = struct.unpack('<I', f.read(4))[0]
+            self.header = json.loads(f.read(header_len).decode('utf-8'))
+
+        self.n_channels = self.header['n_channels']
+        self.sampling_rate = self.header['sampling_rate']
+        self.channel_names = self.header['channel_names']
+        self.csv_header = self.header.get('csv_header')
+        self.dtype = np.dtype(DTYPES[self.header['dtype']])
+        self._data_start = 8 + header_len
+
+        self._mm = None
+        if os.path.getsize(filename) > self._data_start:
+            self._mm = np.memmap(filename, dtype=np.uint8, mode='r')
+        self.blocks = self._index_blocks()
+        self.n_samples = sum(b.shape[1] for b in self.blocks)
+
+    def _index_blocks(self):
+        """Map every complete block; a truncated trailing block is ignored"""
+        blocks = []
+        if self._mm is None:
+            return blocks
+
+        size = len(self._mm)
+        offset = self._data_start
+        row_bytes = self.n_channels * self.dtype.itemsize
+        while offset + BLOCK_HEADER.size <= size:
+            magic, n_samples, _ = BLOCK_HEADER.unpack_from(self._mm, offset)
+            if magic != BLOCK_MAGIC:
+                print(f"EEG: Corrupt block header at byte {offset} in {self.filename}, stopping")
+                break
+            start = offset + BLOCK_HEADER.size
+            end = start + n_samples * row_bytes
+            if end > size:
+                break
+            blocks.append(np.ndarray((self.n_channels, n_samples), dtype=self.dtype,
+                                     buffer=self._mm, offset=start))
+            offset = end
+        return blocks
+
+    def iter_blocks(self):
+        """Yield memory-mapped blocks (channels x samples) without copying"""
+        yield from self.blocks
+
+    def read(self, start=0, stop=None):
+        """Return samples [start, stop) as one channels x samples array"""
+        stop = self.n_samples if stop is None else min(stop, self.n_samples)
+        if not self.blocks or start >= stop:
+            return np.empty((self.n_channels, 0), dtype=self.dtype)
+
+        pieces = []
+        position = 0
+        for block in self.blocks:
+            block_end = position + block.shape[1]
+            if block_end > start and position < stop:
+                pieces.append(block[:, max(start - position, 0):min(stop, block_end) - position])
+            if block_end >= stop:
+                break
+            position = block_end
+        return np.concatenate(pieces, axis=1)
+
+
+def convert_to_csv(binary_filename, csv_filename=None):
+    """
+    Convert a binary EEG recording into the CSV layout written by eegHeadset
+
+    Args:
+        binary_filename (str): Input .eegb file
+        csv_filename (str): Output CSV (defaults to same name with .csv)
+
+    Returns:
+        str: Path of the CSV file
+    """
+    if csv_filename is None:
+        csv_filename = os.path.splitext(binary_filename)[0] + '.csv'
+
+    reader = EegBinaryReader(binary_filename)
+    header = reader.csv_header or reader.channel_names
+
+    with open(csv_filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for block in reader.iter_blocks():
+            writer.writerows(block.T.astype(np.float64))
+
+    print(f"EEG: Converted {reader.n_samples} samples to {csv_filename}")
+    return csv_filename
+
+
+def _benchmark(seconds=600, block_seconds=0.1):
+    """Compare the per-row CSV writer with the binary writer on SYNTHETIC_BOARD data"""
+    import tempfile
+    from brainflow.board_shim import BoardShim, BoardIds, BrainFlowInputParams
+
+    board_id = BoardIds.SYNTHETIC_BOARD
+    BoardShim.disable_board_logger()
+    board = BoardShim(board_id, BrainFlowInputParams())
+    board.prepare_session()
+    board.start_stream()
+    time.sleep(2)
+    recorded = board.get_board_data()
+    board.stop_stream()
+    board.release_session()
+
+    sampling_rate = BoardShim.get_sampling_rate(board_id)
+    block_size = int(sampling_rate * block_seconds)
+    n_blocks = int(seconds / block_seconds)
+    reps = int(np.ceil(block_size * n_blocks / recorded.shape[1]))
+    data = np.tile(recorded, reps)[:, :block_size * n_blocks]
+    blocks = [data[:, i * block_size:(i + 1) * block_size] for i in range(n_blocks)]
+
+    print(f"Benchmark: {seconds} s of SYNTHETIC_BOARD data, {data.shape[0]} channels, "
+          f"{sampling_rate} Hz, {n_blocks} blocks of {block_size} samples")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'eeg.csv')
+        start = time.perf_counter()
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            for block in blocks:
+                for row in block.T:
+                    writer.writerow(row)
+        csv_time = time.perf_counter() - start
+
+        results = [('csv (per row)', csv_time, os.path.getsize(csv_path))]
+        for dtype in DTYPES:
+            bin_path = os.path.join(tmp, f'eeg_{dtype}.eegb')
+            start = time.perf_counter()
+            with EegBinaryWriter(bin_path, data.shape[0], sampling_rate, dtype=dtype) as writer:
+                for block in blocks:
+                    writer.write(block)
+            results.append((f'binary {dtype}', time.perf_counter() - start, os.path.getsize(bin_path)))
+
+        start = time.perf_counter()
+        convert_to_csv(os.path.join(tmp, 'eeg_float64.eegb'), os.path.join(tmp, 'converted.csv'))
+        convert_time = time.perf_counter() - start
+
+    for label, elapsed, size in results:
+        print(f"{label:>16}: {elapsed:8.3f} s total, {elapsed / n_blocks * 1e3:8.3f} ms/block, "
+              f"{size / 1e6:8.1f} MB")
+    print(f"{'csv conversion':>16}: {convert_time:8.3f} s")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,401 @@
+import csv
+import json
+import os
+import struct
+import time
+import zlib
+import numpy as np
+
+# File layout:
+#   b'EEGZ' | uint32 header length | JSON header
+#   frames: b'FRM1' | uint32 n_samples | uint32 payload length
+#           | per channel: uint8 mode, uint8 order, uint8 width, uint8 scale
+#           | zlib payload
+#   footer: frame index (uint64 offset, uint64 first sample, uint32 samples)
+#           | uint64 index offset | uint32 frame count | b'EZIX'
+# Frames are independent, so any time range is decoded from the frames
+# that overlap it. A file without footer (crash) is indexed by scanning.
+FILE_MAGIC = b'EEGZ'
+FRAME_MAGIC = b'FRM1'
+FOOTER_MAGIC = b'EZIX'
+FORMAT_VERSION = 1
+FRAME_HEADER = struct.Struct('<4sII')
+CHANNEL_HEADER = struct.Struct('<BBBB')
+INDEX_ENTRY = np.dtype([('offset', '<u8'), ('first_sample', '<u8'), ('n_samples', '<u4')])
+FOOTER = struct.Struct('<QI4s')
+
+MODE_INTEGER = 0  # value == count * scale, residuals of predicted counts
+MODE_FLOAT = 1    # raw float64 bits, XOR with previous sample
+
+# Cyton/Daisy rows are ADC counts times a constant, computed by BrainFlow as
+# 4.5 / (2^23 - 1) / gain * 1e6 uV for EEG and 0.002 / 2^4 g for the accelerometer.
+CYTON_GAINS = (24, 12, 8, 6, 4, 2, 1)
+DEFAULT_SCALES = [1.0, 0.002 / (2 ** 4)] + [4.5 / float(2 ** 23 - 1) / gain * 1000000. for gain in CYTON_GAINS]
+
+
+def _zigzag(values):
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def _unzigzag(values):
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+def _byte_planes(values, width):
+    """Split uint64 values into `width` byte planes (low byte first)"""
+    return values.view(np.uint8).reshape(-1, 8)[:, :width].T.tobytes()
+
+
+def _from_byte_planes(buffer, width, n_samples):
+    planes = np.frombuffer(buffer, dtype=np.uint8).reshape(width, n_samples)
+    values = np.zeros((n_samples, 8), dtype=np.uint8)
+    values[:, :width] = planes.T
+    return values.view(np.uint64).ravel()
+
+
+def _predict(counts):
+    """Pick the best of 0th/1st/2nd order fixed predictors, return (order, residuals)"""
+    first = np.diff(counts, prepend=0)
+    second = np.diff(first, prepend=0)
+    candidates = (counts, first, second)
+    costs = [np.abs(c).sum() for c in candidates]
+    order = int(np.argmin(costs))
+    return order, candidates[order]
+
+
+def _integer_counts(values, scale):
+    """Return integer counts if values == counts * scale exactly, else None"""
+    counts = np.rint(values / scale)
+    if not np.isfinite(counts).all() or np.abs(counts).max(initial=0) >= 2 ** 52:
+        return None
+    counts = counts.astype(np.int64)
+    if not np.array_equal((counts * scale).view(np.int64), values.view(np.int64)):
+        return None
+    return counts
+
+
+def encode_frame(frame, scales, hints=None):
+    """
+    Encode one frame (channels x samples float64) losslessly
+
+    Args:
+        hints (dict): Per-channel scale index tried first (updated in place)
+
+    Returns:
+        bytes: Encoded frame
+    """
+    n_channels, n_samples = frame.shape
+    headers = []
+    planes = []
+    for ch in range(n_channels):
+        values = np.ascontiguousarray(frame[ch], dtype=np.float64)
+        hint = hints.get(ch) if hints is not None else None
+        tried = ([hint] if hint is not None else []) + [i for i in range(len(scales)) if i != hint]
+        counts = None
+        for scale_index in tried:
+            counts = _integer_counts(values, scales[scale_index])
+            if counts is not None:
+                break
+
+        if counts is not None:
+            if hints is not None:
+                hints[ch] = scale_index
+            order, residuals = _predict(counts)
+            encoded = _zigzag(residuals)
+            mode = MODE_INTEGER
+        else:
+            bits = values.view(np.uint64)
+            encoded = bits ^ np.concatenate([[np.uint64(0)], bits[:-1]])
+            mode, order, scale_index = MODE_FLOAT, 0, 0
+
+        largest = int(encoded.max(initial=0))
+        width = max(1, (largest.bit_length() + 7) // 8)
+        headers.append(CHANNEL_HEADER.pack(mode, order, width, scale_index))
+        planes.append(_byte_planes(encoded, width))
+
+    payload = zlib.compress(b''.join(planes), 6)
+    return FRAME_HEADER.pack(FRAME_MAGIC, n_samples, len(payload)) + b''.join(headers) + payload
+
+
+def decode_frame(buffer, n_channels, scales):
+    """Decode a frame produced by encode_frame into channels x samples float64"""
+    _, n_samples, payload_len = FRAME_HEADER.unpack_from(buffer, 0)
+    offset = FRAME_HEADER.size
+    headers = [CHANNEL_HEADER.unpack_from(buffer, offset + i * CHANNEL_HEADER.size) for i in range(n_channels)]
+    offset += n_channels * CHANNEL_HEADER.size
+    raw = zlib.decompress(bytes(buffer[offset:offset + payload_len]))
+
+    frame = np.empty((n_channels, n_samples))
+    position = 0
+    for ch, (mode, order, width, scale_index) in enumerate(headers):
+        size = width * n_samples
+        encoded = _from_byte_planes(raw[position:position + size], width, n_samples)
+        position += size
+        if mode == MODE_INTEGER:
+            counts = _unzigzag(encoded)
+            for _ in range(order):
+                counts = np.cumsum(counts)
+            frame[ch] = counts * scales[scale_index]
+        else:
+            frame[ch] = np.bitwise_xor.accumulate(encoded).view(np.float64)
+    return frame
+
+
+class EegCodecWriter:
+    """Lossless compressed EEG writer, same interface as EegBinaryWriter"""
+
+    def __init__(self, filename, n_channels, sampling_rate, channel_names=None, csv_header=None,
+                 frame_samples=1000, scales=None, metadata=None):
+        self.filename = filename
+        self.n_channels = n_channels
+        self.frame_samples = frame_samples
+        self.scales = list(scales or DEFAULT_SCALES)
+        self.samples_written = 0
+        self.hints = {}
+        self.index = []
+        self.pending = []
+        self.pending_samples = 0
+
+        header = {
+            'version': FORMAT_VERSION,
+            'n_channels': n_channels,
+            'sampling_rate': sampling_rate,
+            'channel_names': channel_names or [f'Ch_{i}' for i in range(n_channels)],
+            'csv_header': csv_header,
+            'frame_samples': frame_samples,
+            'scales': self.scales,
+            'created': time.time(),
+            'metadata': metadata or {},
+        }
+        payload = json.dumps(header).encode('utf-8')
+        self.file = open(filename, 'wb')
+        self.file.write(FILE_MAGIC)
+        self.file.write(struct.pack('<I', len(payload)))
+        self.file.write(payload)
+
+    def write(self, data):
+        """Append a block (channels x samples); full frames are encoded immediately"""
+        if data.ndim != 2 or data.shape[0] != self.n_channels:
+            raise ValueError(f"Expected block with {self.n_channels} rows, got shape {data.shape}")
+        if data.shape[1] == 0:
+            return
+        self.pending.append(np.asarray(data, dtype=np.float64))
+        self.pending_samples += data.shape[1]
+        if self.pending_samples >= self.frame_samples:
+            buffered = np.concatenate(self.pending, axis=1)
+            n_full = buffered.shape[1] // self.frame_samples * self.frame_samples
+            for start in range(0, n_full, self.frame_samples):
+                self._write_frame(buffered[:, start:start + self.frame_samples])
+            rest = buffered[:, n_full:]
+            self.pending = [rest] if rest.shape[1] else []
+            self.pending_samples = rest.shape[1]
+
+    def _write_frame(self, frame):
+        self.index.append((self.file.tell(), self.samples_written, frame.shape[1]))
+        self.file.write(encode_frame(frame, self.scales, self.hints))
+        self.samples_written += frame.shape[1]
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.pending_samples:
+            self._write_frame(np.concatenate(self.pending, axis=1))
+            self.pending = []
+            self.pending_samples = 0
+        index_offset = self.file.tell()
+        self.file.write(np.array(self.index, dtype=INDEX_ENTRY).tobytes())
+        self.file.write(FOOTER.pack(index_offset, len(self.index), FOOTER_MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EegCodecReader:
+    """Random access to a compressed recording, decoding only the frames needed"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            if f.read(4) != FILE_MAGIC:
+                raise ValueError(f"{filename} is not a compressed EEG recording")
+            header_len = struct.unpack('<I', f.read(4))[0]
+            self.header = json.loads(f.read(header_len).decode('utf-8'))
+        self.n_channels = self.header['n_channels']
+        self.sampling_rate = self.header['sampling_rate']
+        self.channel_names = self.header['channel_names']
+        self.csv_header = self.header.get('csv_header')
+        self.scales = self.header['scales']
+        self._data_start = 8 + header_len
+        self._mm = np.memmap(filename, dtype=np.uint8, mode='r')
+        self.index = self._read_index()
+        self.n_samples = int(self.index['n_samples'].sum()) if len(self.index) else 0
+
+    def _read_index(self):
+        size = len(self._mm)
+        if size >= self._data_start + FOOTER.size:
+            index_offset, n_frames, magic = FOOTER.unpack_from(self._mm, size - FOOTER.size)
+            if magic == FOOTER_MAGIC and index_offset + n_frames * INDEX_ENTRY.itemsize == size - FOOTER.size:
+                return np.frombuffer(self._mm, dtype=INDEX_ENTRY, count=n_frames, offset=index_offset)
+
+        # No footer (recording interrupted): walk the frame headers
+        entries = []
+        offset = self._data_start
+        first = 0
+        frame_overhead = FRAME_HEADER.size + self.n_channels * CHANNEL_HEADER.size
+        while offset + frame_overhead <= size:
+            magic, n_samples, payload_len = FRAME_HEADER.unpack_from(self._mm, offset)
+            end = offset + frame_overhead + payload_len
+            if magic != FRAME_MAGIC or end > size:
+                break
+            entries.append((offset, first, n_samples))
+            first += n_samples
+            offset = end
+        print(f"EEG: {self.filename} has no index, recovered {len(entries)} frames")
+        return np.array(entries, dtype=INDEX_ENTRY)
+
+    def read(self, start=0, stop=None):
+        """Decode samples [start, stop) as channels x samples float64"""
+        stop = self.n_samples if stop is None else min(stop, self.n_samples)
+        if start >= stop:
+            return np.empty((self.n_channels, 0))
+        firsts = self.index['first_sample'].astype(np.int64)
+        lo = np.searchsorted(firsts, start, side='right') - 1
+        hi = np.searchsorted(firsts, stop, side='left')
+        frames = [decode_frame(self._mm[int(entry['offset']):], self.n_channels, self.scales)
+                  for entry in self.index[lo:hi]]
+        data = np.concatenate(frames, axis=1)
+        offset = start - int(firsts[lo])
+        return data[:, offset:offset + stop - start]
+
+    def read_seconds(self, start_s, stop_s):
+        """Decode the samples between two times (seconds from the start)"""
+        return self.read(int(start_s * self.sampling_rate), int(np.ceil(stop_s * self.sampling_rate)))
+
+
+def csv_to_codec(csv_filename, codec_filename=None, sampling_rate=250, chunk_rows=100000):
+    """
+    Compress a CSV recorded by eegHeadset
+
+    Returns:
+        str: Path of the .eegz file
+    """
+    if codec_filename is None:
+        codec_filename = os.path.splitext(csv_filename)[0] + '.eegz'
+    with open(csv_filename, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        writer = None
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if len(rows) >= chunk_rows:
+                writer = _write_rows(writer, rows, codec_filename, sampling_rate, header)
+                rows = []
+        writer = _write_rows(writer, rows, codec_filename, sampling_rate, header)
+    if writer is not None:
+        writer.close()
+        print(f"EEG: Compressed {csv_filename} ({os.path.getsize(csv_filename) / 1e6:.1f} MB) -> "
+              f"{codec_filename} ({os.path.getsize(codec_filename) / 1e6:.1f} MB)")
+    return codec_filename
+
+
+def _write_rows(writer, rows, codec_filename, sampling_rate, header):
+    if not rows:
+        return writer
+    block = np.array(rows, dtype=np.float64).T
+    if writer is None:
+        writer = EegCodecWriter(codec_filename, block.shape[0], sampling_rate, csv_header=header)
+    writer.write(block)
+    return writer
+
+
+def codec_to_csv(codec_filename, csv_filename=None, chunk_samples=100000):
+    """
+    Restore the eegHeadset CSV layout from a compressed recording
+
+    Returns:
+        str: Path of the CSV file
+    """
+    if csv_filename is None:
+        csv_filename = os.path.splitext(codec_filename)[0] + '.csv'
+    reader = EegCodecReader(codec_filename)
+    with open(csv_filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(reader.csv_header or reader.channel_names)
+        for start in range(0, reader.n_samples, chunk_samples):
+            writer.writerows(reader.read(start, start + chunk_samples).T)
+    print(f"EEG: Restored {reader.n_samples} samples to {csv_filename}")
+    return csv_filename
+
+
+def _benchmark(hours=2.0, sampling_rate=250):
+    """Compression ratio, speed and one-minute random access on simulated Cyton data"""
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    n_samples = int(hours * 3600 * sampling_rate)
+    eeg_scale = DEFAULT_SCALES[2]
+    # 24 rows like a Cyton get_board_data() array
+    data = np.zeros((24, n_samples))
+    data[0] = np.arange(n_samples) % 256
+    walk = np.cumsum(rng.normal(0, 40, (8, n_samples)), axis=1)
+    data[1:9] = np.rint(walk + rng.normal(0, 200, (8, n_samples))) * eeg_scale
+    data[9:12] = rng.integers(-200, 200, (3, n_samples)) * DEFAULT_SCALES[1]
+    data[22] = 1.7e9 + np.arange(n_samples) / sampling_rate + rng.normal(0, 1e-4, n_samples)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'eeg.eegz')
+        start = time.perf_counter()
+        with EegCodecWriter(path, 24, sampling_rate) as writer:
+            for i in range(0, n_samples, sampling_rate // 10):
+                writer.write(data[:, i:i + sampling_rate // 10])
+        encode_time = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        reader = EegCodecReader(path)
+        start = time.perf_counter()
+        decoded = reader.read()
+        decode_time = time.perf_counter() - start
+        lossless = np.array_equal(decoded.view(np.int64), data.view(np.int64))
+
+        access = []
+        for t in rng.uniform(0, hours * 3600 - 60, 20):
+            start = time.perf_counter()
+            reader.read_seconds(t, t + 60)
+            access.append(time.perf_counter() - start)
+
+    raw_size = data.nbytes
+    print(f"EEG: {hours:.0f} h, 24 rows at {sampling_rate} Hz: float64 {raw_size / 1e6:.0f} MB -> "
+          f"{size / 1e6:.0f} MB ({raw_size / size:.1f}x), lossless: {lossless}")
+    print(f"EEG: Encode {encode_time:.1f} s ({n_samples / encode_time / 1e3:.0f} k samples/s), "
+          f"full decode {decode_time:.1f} s")
+    print(f"EEG: Random one-minute window: mean {np.mean(access) * 1e3:.1f} ms, max {np.max(access) * 1e3:.1f} ms")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Lossless EEG codec: convert CSV recordings or benchmark")
+    parser.add_argument('command', choices=['compress', 'decompress', 'benchmark'])
+    parser.add_argument('files', nargs='*', help="CSV files to compress or .eegz files to decompress")
+    parser.add_argument('--rate', type=int, default=250, help="Sampling rate stored for CSV inputs")
+    args = parser.parse_args()
+
+    if args.command == 'benchmark':
+        _benchmark()
+    for path in args.files:
+        if args.command == 'compress':
+            csv_to_codec(path, sampling_rate=args.rate)
+        else:
+            codec_to_csv(path)
+
+
+if __name__ == "__main__":
+    main()
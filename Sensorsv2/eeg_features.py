@@ -0,0 +1,217 @@
+import time
+import numpy as np
+
+# Frequency bands in Hz, [low, high)
+BANDS = {
+    'delta': (1.0, 4.0),
+    'theta': (4.0, 8.0),
+    'alpha': (8.0, 13.0),
+    'beta': (13.0, 30.0),
+    'gamma': (30.0, 45.0),
+}
+
+
+def workload_indices(band_power, band_names):
+    """
+    Derived workload indices from band powers (..., bands)
+
+    theta_alpha: theta / alpha (rises with working-memory load)
+    theta_beta: theta / beta
+    engagement: beta / (alpha + theta)
+    """
+    bands = {name: band_power[..., i] for i, name in enumerate(band_names)}
+    eps = np.finfo(np.float64).tiny
+    indices = {}
+    if 'theta' in bands and 'alpha' in bands:
+        indices['theta_alpha'] = bands['theta'] / (bands['alpha'] + eps)
+    if 'theta' in bands and 'beta' in bands:
+        indices['theta_beta'] = bands['theta'] / (bands['beta'] + eps)
+    if all(b in bands for b in ('alpha', 'beta', 'theta')):
+        indices['engagement'] = bands['beta'] / (bands['alpha'] + bands['theta'] + eps)
+    return indices
+
+
+class _WelchBandPower:
+    """Batched Welch estimate of band power for stacks of windows"""
+
+    def __init__(self, sampling_rate, window_size, segment_size, bands):
+        self.band_names = list(bands)
+        segment_step = segment_size - segment_size // 2  # 50% overlap, as scipy.signal.welch
+        starts = np.arange(0, window_size - segment_size + 1, segment_step)
+        # (segments x segment_size) gather index into a window
+        self.segment_index = starts[:, None] + np.arange(segment_size)
+        self.taper = np.hanning(segment_size + 1)[:-1]  # periodic Hann, as scipy.signal.welch
+
+        freqs = np.fft.rfftfreq(segment_size, 1.0 / sampling_rate)
+        scale = np.full(len(freqs), 2.0 / (sampling_rate * np.sum(self.taper ** 2)))
+        scale[0] /= 2
+        if segment_size % 2 == 0:
+            scale[-1] /= 2
+        df = freqs[1] - freqs[0]
+
+        # (freqs x bands) matrix: integrates the PSD over each band in one matmul
+        band_matrix = np.zeros((len(freqs), len(bands)))
+        for i, (low, high) in enumerate(bands.values()):
+            band_matrix[(freqs >= low) & (freqs < high), i] = df
+        self.band_matrix = scale[:, None] * band_matrix
+
+    def __call__(self, windows):
+        """windows: (..., channels, window_size) -> band power (..., channels, bands)"""
+        segments = windows[..., self.segment_index]
+        segments = segments - segments.mean(axis=-1, keepdims=True)
+        spectrum = np.fft.rfft(segments * self.taper, axis=-1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        return power.mean(axis=-2) @ self.band_matrix
+
+
+class BandPowerEngine:
+    """
+    Sliding-window band power for live EEG blocks
+
+    Samples go into a ring buffer; every step_seconds the last
+    window_seconds of data are turned into band power for all channels at
+    once (Welch with 50% overlapping Hann segments over a channels x window
+    matrix). Each update is returned and passed to subscribed callbacks as a
+    dict with 'sample', 'timestamp', 'band_power' (channels x bands),
+    'mean_band_power' and 'indices'.
+    """
+
+    def __init__(self, n_channels, sampling_rate, window_seconds=2.0, step_seconds=0.25,
+                 segment_seconds=1.0, bands=BANDS):
+        self.n_channels = n_channels
+        self.sampling_rate = sampling_rate
+        self.window_size = int(round(window_seconds * sampling_rate))
+        self.step_size = max(1, int(round(step_seconds * sampling_rate)))
+        segment_size = min(int(round(segment_seconds * sampling_rate)), self.window_size)
+        self.estimator = _WelchBandPower(sampling_rate, self.window_size, segment_size, bands)
+        self.band_names = self.estimator.band_names
+        self.callbacks = []
+
+        # Samples are written twice so buffer[:, pos:pos + window] is always
+        # the latest window in order, without np.roll or concatenation
+        self.buffer = np.zeros((n_channels, 2 * self.window_size))
+        self.pos = 0
+        self.samples_seen = 0
+        self.until_update = self.window_size
+        self.latest = None
+        self.update_times = []
+
+    def subscribe(self, callback):
+        """Register callback(update) for every new band power estimate"""
+        self.callbacks.append(callback)
+
+    def _write(self, chunk):
+        n = chunk.shape[1]
+        first = min(n, self.window_size - self.pos)
+        self.buffer[:, self.pos:self.pos + first] = chunk[:, :first]
+        self.buffer[:, self.pos + self.window_size:self.pos + self.window_size + first] = chunk[:, :first]
+        if n > first:
+            rest = n - first
+            self.buffer[:, :rest] = chunk[:, first:]
+            self.buffer[:, self.window_size:self.window_size + rest] = chunk[:, first:]
+        self.pos = (self.pos + n) % self.window_size
+
+    def push(self, block, timestamp=None):
+        """
+        Add a block (channels x samples) and compute any due updates
+
+        Args:
+            block (np.ndarray): e.g. data[eeg_channels] from get_board_data()
+            timestamp (float): Time of the last sample in the block (optional)
+
+        Returns:
+            list: Updates produced by this block (may be empty)
+        """
+        block = np.asarray(block, dtype=np.float64)
+        if block.shape[0] != self.n_channels:
+            raise ValueError(f"Expected {self.n_channels} channels, got {block.shape[0]}")
+
+        updates = []
+        offset = 0
+        n = block.shape[1]
+        while offset < n:
+            take = min(n - offset, self.until_update, self.window_size)
+            self._write(block[:, offset:offset + take])
+            offset += take
+            self.samples_seen += take
+            self.until_update -= take
+            if self.until_update == 0:
+                self.until_update = self.step_size
+                ts = None if timestamp is None else timestamp - (n - offset) / self.sampling_rate
+                updates.append(self._update(ts))
+        return updates
+
+    def _update(self, timestamp):
+        start = time.perf_counter()
+        window = self.buffer[:, self.pos:self.pos + self.window_size]
+        band_power = self.estimator(window)
+        mean_power = band_power.mean(axis=0)
+        update = {
+            'sample': self.samples_seen,
+            'timestamp': timestamp,
+            'band_names': self.band_names,
+            'band_power': band_power,
+            'mean_band_power': mean_power,
+            'indices': workload_indices(mean_power, self.band_names),
+        }
+        self.update_times.append(time.perf_counter() - start)
+        self.latest = update
+        for callback in self.callbacks:
+            callback(update)
+        return update
+
+
+def band_power_offline(data, sampling_rate, window_seconds=2.0, step_seconds=0.25,
+                       segment_seconds=1.0, bands=BANDS, chunk_windows=512):
+    """
+    Band power for a whole recording, same windows as BandPowerEngine
+
+    Args:
+        data (np.ndarray): channels x samples
+
+    Returns:
+        tuple: (end sample of each window, band power windows x channels x bands)
+    """
+    data = np.asarray(data, dtype=np.float64)
+    window_size = int(round(window_seconds * sampling_rate))
+    step_size = max(1, int(round(step_seconds * sampling_rate)))
+    segment_size = min(int(round(segment_seconds * sampling_rate)), window_size)
+    estimator = _WelchBandPower(sampling_rate, window_size, segment_size, bands)
+
+    if data.shape[1] < window_size:
+        return np.empty(0, dtype=int), np.empty((0, data.shape[0], len(bands)))
+
+    # (channels x windows x window_size) view, no copy
+    windows = np.lib.stride_tricks.sliding_window_view(data, window_size, axis=1)[:, ::step_size]
+    results = []
+    for start in range(0, windows.shape[1], chunk_windows):
+        chunk = windows[:, start:start + chunk_windows].transpose(1, 0, 2)
+        results.append(estimator(chunk))
+    ends = window_size + step_size * np.arange(windows.shape[1])
+    return ends, np.concatenate(results, axis=0)
+
+
+def _benchmark(seconds=120, n_channels=16, sampling_rate=125, block_seconds=0.1):
+    """Per-update latency for 16-channel Cyton+Daisy rate input"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sampling_rate)) / sampling_rate
+    data = rng.normal(0, 10, (n_channels, len(t))) + 20 * np.sin(2 * np.pi * 10 * t)
+
+    engine = BandPowerEngine(n_channels, sampling_rate)
+    block_size = int(block_seconds * sampling_rate)
+    start = time.perf_counter()
+    for i in range(0, data.shape[1], block_size):
+        engine.push(data[:, i:i + block_size])
+    total = time.perf_counter() - start
+
+    latencies = np.array(engine.update_times) * 1e3
+    print(f"EEG: {n_channels} channels at {sampling_rate} Hz, {seconds} s of data, "
+          f"{len(latencies)} updates")
+    print(f"EEG: Update latency mean {latencies.mean():.3f} ms, p99 {np.percentile(latencies, 99):.3f} ms, "
+          f"max {latencies.max():.3f} ms")
+    print(f"EEG: Processed {seconds} s in {total:.3f} s ({seconds / total:.0f}x real time)")
+    print("EEG: Last indices: " + ", ".join(f"{k}={v:.3f}" for k, v in engine.latest['indices'].items()))
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,142 @@
+import numpy as np
+from scipy import signal
+
+# Same chain EEGdata.py applies after a recording:
+# 50 Hz lowpass (order 5), 2 Hz highpass (order 4), 58-62 Hz bandstop (order 4)
+DEFAULT_LOWPASS = 50.0
+DEFAULT_LOWPASS_ORDER = 5
+DEFAULT_HIGHPASS = 2.0
+DEFAULT_HIGHPASS_ORDER = 4
+DEFAULT_BANDSTOP = (58.0, 62.0)
+DEFAULT_BANDSTOP_ORDER = 4
+
+
+def design_filter_chain(sampling_rate, lowpass=DEFAULT_LOWPASS, lowpass_order=DEFAULT_LOWPASS_ORDER,
+                        highpass=DEFAULT_HIGHPASS, highpass_order=DEFAULT_HIGHPASS_ORDER,
+                        bandstop=DEFAULT_BANDSTOP, bandstop_order=DEFAULT_BANDSTOP_ORDER):
+    """
+    Build the Butterworth chain as one cascade of second-order sections
+
+    The sections reproduce DataFilter.perform_lowpass/perform_highpass/
+    perform_bandstop with FilterTypes.BUTTERWORTH. Pass None to skip a stage.
+
+    Returns:
+        np.ndarray: SOS matrix (n_sections x 6)
+    """
+    stages = []
+    if lowpass is not None:
+        stages.append(signal.butter(lowpass_order, lowpass, 'lowpass', fs=sampling_rate, output='sos'))
+    if highpass is not None:
+        stages.append(signal.butter(highpass_order, highpass, 'highpass', fs=sampling_rate, output='sos'))
+    if bandstop is not None:
+        stages.append(signal.butter(bandstop_order, bandstop, 'bandstop', fs=sampling_rate, output='sos'))
+    if not stages:
+        raise ValueError("At least one filter stage is required")
+    return np.vstack(stages)
+
+
+class StreamingFilterBank:
+    """
+    Causal IIR filter bank that keeps its state between polled blocks
+
+    Every block (channels x samples) is filtered for all channels in a single
+    sosfilt call. The filter is causal, so output is available as soon as a
+    block arrives: latency is bounded by the polling interval, never by the
+    recording length.
+    """
+
+    def __init__(self, n_channels, sampling_rate, **filter_kwargs):
+        self.n_channels = n_channels
+        self.sampling_rate = sampling_rate
+        self.sos = design_filter_chain(sampling_rate, **filter_kwargs)
+        self.samples_processed = 0
+        self.reset()
+
+    def reset(self):
+        """Clear the filter state (same as starting a new recording)"""
+        self.zi = np.zeros((self.sos.shape[0], self.n_channels, 2))
+        self.samples_processed = 0
+
+    def process(self, block):
+        """
+        Filter one block
+
+        Args:
+            block (np.ndarray): channels x samples, e.g. data[eeg_channels]
+                from board.get_board_data()
+
+        Returns:
+            np.ndarray: Filtered block with the same shape
+        """
+        block = np.asarray(block, dtype=np.float64)
+        if block.shape[0] != self.n_channels:
+            raise ValueError(f"Expected {self.n_channels} channels, got {block.shape[0]}")
+        if block.shape[1] == 0:
+            return block.copy()
+
+        filtered, self.zi = signal.sosfilt(self.sos, block, axis=1, zi=self.zi)
+        self.samples_processed += block.shape[1]
+        return filtered
+
+
+def filter_offline(data, sampling_rate, **filter_kwargs):
+    """Filter a whole recording (channels x samples) with the same chain"""
+    data = np.asarray(data, dtype=np.float64)
+    return signal.sosfilt(design_filter_chain(sampling_rate, **filter_kwargs), data, axis=1)
+
+
+def _compare_with_datafilter(seconds=20, block_seconds=0.1):
+    """Check the streaming output against DataFilter on a SYNTHETIC_BOARD recording"""
+    import time
+    from brainflow.board_shim import BoardShim, BoardIds, BrainFlowInputParams
+    from brainflow.data_filter import DataFilter, FilterTypes
+
+    board_id = BoardIds.SYNTHETIC_BOARD
+    BoardShim.disable_board_logger()
+    board = BoardShim(board_id, BrainFlowInputParams())
+    board.prepare_session()
+    board.start_stream()
+
+    sampling_rate = BoardShim.get_sampling_rate(board_id)
+    eeg_channels = BoardShim.get_eeg_channels(board_id)
+    bank = StreamingFilterBank(len(eeg_channels), sampling_rate)
+
+    print(f"EEG: Recording {seconds} s from SYNTHETIC_BOARD...")
+    raw_blocks = []
+    streamed = []
+    block_times = []
+    end = time.time() + seconds
+    while time.time() < end:
+        time.sleep(block_seconds)
+        data = board.get_board_data()
+        if data.shape[1] == 0:
+            continue
+        raw_blocks.append(data[eeg_channels])
+        start = time.perf_counter()
+        streamed.append(bank.process(data[eeg_channels]))
+        block_times.append(time.perf_counter() - start)
+    board.stop_stream()
+    board.release_session()
+
+    raw = np.concatenate(raw_blocks, axis=1)
+    streamed = np.concatenate(streamed, axis=1)
+
+    # Offline reference, exactly as EEGdata.py does it
+    offline = raw.copy()
+    for channel in range(offline.shape[0]):
+        DataFilter.perform_lowpass(offline[channel], sampling_rate, 50.0, 5, FilterTypes.BUTTERWORTH, 0)
+        DataFilter.perform_highpass(offline[channel], sampling_rate, 2.0, 4, FilterTypes.BUTTERWORTH, 0)
+        DataFilter.perform_bandstop(offline[channel], sampling_rate, 58.0, 62.0, 4, FilterTypes.BUTTERWORTH, 0)
+
+    error = np.abs(streamed - offline).max()
+    scale = np.abs(offline).max()
+    print(f"EEG: {raw.shape[1]} samples x {raw.shape[0]} channels in {len(raw_blocks)} blocks")
+    print(f"EEG: Max abs difference vs DataFilter: {error:.3e} uV (signal peak {scale:.1f} uV)")
+    print(f"EEG: Filter time per block: mean {np.mean(block_times) * 1e3:.3f} ms, "
+          f"max {np.max(block_times) * 1e3:.3f} ms")
+    return error <= 1e-6 * max(scale, 1.0)
+
+
+if __name__ == "__main__":
+    ok = _compare_with_datafilter()
+    print("EEG: Streaming filter matches offline result" if ok else "EEG: ❌ Streaming filter mismatch")
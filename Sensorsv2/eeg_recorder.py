@@ -1,70 +1,136 @@
 from brainflow.board_shim import BoardShim, BoardIds, BrainFlowInputParams, BrainFlowError
-from brainflow.data_filter import DataFilter
-import time
 import csv
 import datetime
+from eeg_binary import EegBinaryWriter
+from eeg_codec import EegCodecWriter
+from eeg_acquisition import acquire, buffer_size_for_session
+
+def get_channel_headers(board_id):
+    """Build the CSV header used for EEG recordings"""
+    headers = []
+    for prefix, getter in (('EEG', BoardShim.get_eeg_channels),
+                           ('Accel', BoardShim.get_accel_channels),
+                           ('Other', BoardShim.get_other_channels)):
+        try:
+            channels = getter(board_id)
+        except BrainFlowError:
+            # Not every board exposes every channel type (e.g. SYNTHETIC_BOARD)
+            channels = []
+        headers.extend([f'{prefix}_{i}' for i in range(len(channels))])
+    headers.append('Timestamp')
+    return headers
+
+def get_row_names(board_id):
+    """Name every row returned by get_board_data"""
+    names = [f'Row_{i}' for i in range(BoardShim.get_num_rows(board_id))]
+    descr = BoardShim.get_board_descr(board_id)
+    for key, prefix in (('eeg_channels', 'EEG'), ('accel_channels', 'Accel'),
+                        ('other_channels', 'Other'), ('analog_channels', 'Analog')):
+        for i, row in enumerate(descr.get(key) or []):
+            if names[row].startswith('Row_'):
+                names[row] = f'{prefix}_{i}'
+    for key, label in (('package_num_channel', 'Package'), ('timestamp_channel', 'Timestamp'),
+                       ('marker_channel', 'Marker')):
+        if descr.get(key) is not None:
+            names[descr[key]] = label
+    return names
+
+class CsvBlockWriter:
+    """Write polled blocks in the original CSV layout (one row per sample)"""
+
+    def __init__(self, filename, headers):
+        self.file = open(filename, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(headers)
+        self.samples_written = 0
+
+    def write(self, data):
+        self.writer.writerows(data.T)
+        self.samples_written += data.shape[1]
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+def eegHeadset(name, stop_event, file_format='csv', dtype='float64', on_block=None, session_seconds=None):
+    """
+    Record EEG until stop_event is set
+
+    Args:
+        name (str): Subject identifier used in the filename
+        stop_event: Event to signal when to stop
+        file_format (str): 'csv' (text, one row per sample), 'binary'
+            (each polled block appended to a memory-mappable .eegb file,
+            convert with eeg_binary.convert_to_csv) or 'compressed'
+            (lossless .eegz file, convert with eeg_codec.codec_to_csv)
+        dtype (str): Sample type for binary files, 'float64' or 'float32'
+        on_block (callable): Optional, called with every polled block
+            (rows x samples) for live processing, e.g. a StreamingFilterBank
+        session_seconds (float): Expected session length, used to size the
+            BrainFlow ring buffer (None for open-ended sessions)
+    """
+    if file_format not in ('csv', 'binary', 'compressed'):
+        print(f'EEG: Unknown file format {file_format}')
+        return
 
-def eegHeadset(name, stop_event):
     # EEG setup
     params = BrainFlowInputParams()
     params.serial_port = 'COM3'  # Update this with your COM port
     board_id = BoardIds.CYTON_BOARD
     board = BoardShim(board_id, params)
+    sampling_rate = BoardShim.get_sampling_rate(board_id)
+    buffer_size = buffer_size_for_session(sampling_rate, session_seconds)
 
     try:
         board.prepare_session()
-        board.start_stream()
-        print('EEG: Board prepared successfully. Streaming started...')
+        board.start_stream(buffer_size)
+        print(f'EEG: Board prepared successfully. Streaming started (buffer {buffer_size} samples)...')
     except BrainFlowError as e:
         print(f'EEG: Error connecting to board: {e}')
         return
 
     # Create filename with timestamp
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"eeg_{name}_{timestamp}.csv"
-
-    # Get channel names
-    eeg_channels = board.get_eeg_channels(board_id)
-    accel_channels = board.get_accel_channels(board_id)
-    other_channels = board.get_other_channels(board_id)
-    timestamp_channel = board.get_timestamp_channel(board_id)
-    
+
     # Create header
-    headers = []
-    if eeg_channels:
-        headers.extend([f'EEG_{i}' for i in range(len(eeg_channels))])
-    if accel_channels:
-        headers.extend([f'Accel_{i}' for i in range(len(accel_channels))])
-    if other_channels:
-        headers.extend([f'Other_{i}' for i in range(len(other_channels))])
-    headers.append('Timestamp')
+    headers = get_channel_headers(board_id)
+    extension = {'binary': 'eegb', 'compressed': 'eegz'}.get(file_format, 'csv')
+    filename = f"eeg_{name}_{timestamp}.{extension}"
+    writer = _open_writer(filename, board_id, headers, file_format, dtype)
+    print(f"EEG: Recording {file_format} data to {filename}...")
 
-    # Open CSV file and write header
-    with open(filename, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(headers)
-        
-        print(f"EEG: Recording data to {filename}...")
-        
-        try:
-            while not stop_event.is_set():
-                # Get all available data
-                data = board.get_board_data()
-                
-                if data.shape[1] > 0:  # If there's new data
-                    # Transpose data to have channels as columns
-                    data = data.T
-                    # Write each sample to CSV
-                    for row in data:
-                        writer.writerow(row)
-                
-                time.sleep(0.1)  # Small delay to prevent CPU overload
-                
-        except Exception as e:
-            print(f"EEG: Error during recording: {e}")
-        finally:
-            # Cleanup
-            board.stop_stream()
-            board.release_session()
-            print(f'EEG: Data saved to {filename}')
-            print('EEG: Stream ended and session released.')
\ No newline at end of file
+    def handle_block(data):
+        writer.write(data)
+        if on_block is not None:
+            on_block(data)
+
+    try:
+        stats, gaps = acquire(board, board_id, handle_block, stop_event, buffer_size=buffer_size)
+        print(f"EEG: {stats.summary(gaps)}")
+    except Exception as e:
+        print(f"EEG: Error during recording: {e}")
+    finally:
+        # Cleanup
+        writer.close()
+        board.stop_stream()
+        board.release_session()
+        print(f'EEG: {writer.samples_written} samples saved to {filename}')
+        print('EEG: Stream ended and session released.')
+
+def _open_writer(filename, board_id, headers, file_format, dtype):
+    """Create the writer for the requested file format"""
+    if file_format == 'csv':
+        return CsvBlockWriter(filename, headers)
+
+    n_rows = BoardShim.get_num_rows(board_id)
+    sampling_rate = BoardShim.get_sampling_rate(board_id)
+    metadata = {'board_id': int(board_id)}
+    if file_format == 'compressed':
+        return EegCodecWriter(filename, n_rows, sampling_rate,
+                              channel_names=get_row_names(board_id),
+                              csv_header=headers, metadata=metadata)
+    if file_format == 'binary':
+        return EegBinaryWriter(filename, n_rows, sampling_rate,
+                               channel_names=get_row_names(board_id),
+                               csv_header=headers, dtype=dtype, metadata=metadata)
+    raise ValueError(f"Unknown file format {file_format}")
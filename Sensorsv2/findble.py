@@ -1,17 +1,49 @@
+import argparse
 import asyncio
-from bleak import BleakClient, BleakScanner
+import time
+from bleak import BleakScanner
+from ble_cache import BleCache, cached_client
 
-async def main():
-    devices = await BleakScanner.discover()
-    for d in devices:
-        print(d)
+def print_services(services):
+    """Print the cached services ({service uuid: {characteristic uuid: info}})"""
+    for service_uuid, characteristics in services.items():
+        print(f"[Service] {service_uuid}")
+        for uuid, info in characteristics.items():
+            print(f"  [Characteristic] {uuid} (handle {info['handle']}): {info['properties']}")
 
-    # Replace with desire device mac address
-    address = "XX:XX:XX:XX:XX:XX"   #esp32 mac address 08:A6:F7:6B:48:36 (gsr)
-    async with BleakClient(address) as client:
-        for service in client.services:
-            print(f"[Service] {service.uuid}: {service.description}")
-            for char in service.characteristics:
-                print(f"  [Characteristic] {char.uuid}: {char.properties}")
+async def main(addresses, refresh=False, scan_time=5.0, cache_path='ble_cache.json'):
+    cache = BleCache(cache_path)
 
-asyncio.run(main())
+    if not addresses:
+        # No device given: list everything nearby (full scan)
+        devices = await BleakScanner.discover(timeout=scan_time)
+        for d in devices:
+            print(d)
+        return
+
+    for address in addresses:
+        if refresh:
+            cache.invalidate(address)
+        entry = cache.entry(address)
+        if cache.is_fresh(address):
+            # Known device: no scan and no connection needed
+            print(f"{address} ({entry.get('name')}) from cache:")
+            print_services(entry['services'])
+            continue
+
+        start = time.perf_counter()
+        # Scans for this one address only, connects with full discovery and updates the cache
+        async with cached_client(address, [], cache, scan_timeout=scan_time):
+            pass
+        print(f"{address} discovered in {time.perf_counter() - start:.1f} s:")
+        print_services(cache.entry(address)['services'])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List BLE devices and their GATT services (cached)")
+    parser.add_argument('addresses', nargs='*',
+                        help="Device MAC addresses, e.g. 08:A6:F7:6B:48:36 (gsr) 24:AC:AC:02:FA:11 (polar)")
+    parser.add_argument('--refresh', action='store_true', help="Ignore the cache and rediscover")
+    parser.add_argument('--scan-time', type=float, default=5.0, help="Scan timeout in seconds")
+    parser.add_argument('--cache', default='ble_cache.json', help="Cache file")
+    args = parser.parse_args()
+    asyncio.run(main(args.addresses, args.refresh, args.scan_time, args.cache))
@@ -0,0 +1,199 @@
+import argparse
+import csv
+import glob
+import json
+import math
+import os
+import time
+import numpy as np
+
+ADC_CODES = 4096  # ESP32 ADC, 12 bit
+
+# Status of every ADC code
+VALID = 0
+SATURATED = 1     # skin resistance ~0 (electrodes shorted)
+OPEN_CIRCUIT = 2  # no measurable conductance (electrodes off)
+STATUS_NAMES = {VALID: 'ok', SATURATED: 'saturated', OPEN_CIRCUIT: 'open_circuit'}
+
+
+class GsrCalibration:
+    """
+    ADC code -> skin conductance (uS) lookup table for the ESP32 GSR divider
+
+    The skin is the upper resistor of a divider with r_fixed, so
+    v = code / adc_max * vcc (after the per-device gain/offset correction)
+    and G = (vcc - v) / (r_fixed * v). Every one of the 4096 codes is
+    computed once, so converting any number of samples is one indexing
+    operation.
+
+    Codes at or below saturation_code (v ~ 0, shorted electrodes) and at
+    or above open_circuit_code (v ~ vcc, electrodes off) have no valid
+    conductance: they map to invalid_value (NaN by default) and are
+    reported by status().
+
+    Args:
+        vcc (float): Divider supply voltage
+        r_fixed (float): Fixed resistor in ohms (measured value if known)
+        adc_max (int): Code that corresponds to vcc
+        adc_gain (float), adc_offset (float): Per-device correction,
+            corrected code = code * adc_gain + adc_offset
+        saturation_code (int), open_circuit_code (int): Limits of the valid range
+    """
+
+    def __init__(self, vcc=3.3, r_fixed=10000, adc_max=4095, adc_gain=1.0, adc_offset=0.0,
+                 saturation_code=0, open_circuit_code=4095, invalid_value=np.nan):
+        self.params = {
+            'vcc': vcc, 'r_fixed': r_fixed, 'adc_max': adc_max, 'adc_gain': adc_gain,
+            'adc_offset': adc_offset, 'saturation_code': saturation_code,
+            'open_circuit_code': open_circuit_code,
+        }
+        codes = np.arange(ADC_CODES)
+        corrected = codes * adc_gain + adc_offset
+        v_out = corrected / adc_max * vcc
+
+        self.status_table = np.full(ADC_CODES, VALID, dtype=np.uint8)
+        self.status_table[(codes <= saturation_code) | (v_out <= 0)] = SATURATED
+        self.status_table[(codes >= open_circuit_code) | (v_out >= vcc)] = OPEN_CIRCUIT
+
+        valid = self.status_table == VALID
+        self.table = np.full(ADC_CODES, invalid_value, dtype=np.float64)
+        self.table[valid] = (vcc - v_out[valid]) / (r_fixed * v_out[valid]) * 1e6
+
+    def _codes(self, adc):
+        codes = np.asarray(adc)
+        if codes.size and (codes.min() < 0 or codes.max() >= ADC_CODES):
+            raise ValueError(f"ADC codes must be in 0..{ADC_CODES - 1}")
+        return codes.astype(np.intp, copy=False)
+
+    def convert(self, adc):
+        """Conductance in uS for a code or an array of codes (invalid codes -> invalid_value)"""
+        return self.table[self._codes(adc)]
+
+    def status(self, adc):
+        """VALID, SATURATED or OPEN_CIRCUIT for each code"""
+        return self.status_table[self._codes(adc)]
+
+    def to_dict(self):
+        return dict(self.params)
+
+    @classmethod
+    def from_dict(cls, params):
+        return cls(**params)
+
+
+def load_calibration(device, path='gsr_calibration.json'):
+    """
+    Calibration for one device (keyed by MAC address) from a JSON file
+
+    Falls back to the nominal calibration if the file or the device entry
+    is missing.
+    """
+    try:
+        with open(path) as f:
+            devices = json.load(f)
+    except (OSError, ValueError):
+        return GsrCalibration()
+    params = devices.get(device)
+    return GsrCalibration.from_dict(params) if params else GsrCalibration()
+
+
+def save_calibration(device, calibration, path='gsr_calibration.json'):
+    """Store (or replace) the calibration of one device in the JSON file"""
+    try:
+        with open(path) as f:
+            devices = json.load(f)
+    except (OSError, ValueError):
+        devices = {}
+    devices[device] = calibration.to_dict()
+    with open(path, 'w') as f:
+        json.dump(devices, f, indent=2)
+
+
+def convert_csv(path, out_path=None, calibration=None):
+    """
+    Recompute the microsiemens column of an archived GSR_data_*.csv from its ADC column
+
+    Older files stored 0 uS for codes that hit a division by zero; the
+    output leaves those fields empty instead (the same as live recordings
+    written by ColumnarCsvLogger), plus an adc_status column.
+
+    Returns:
+        dict: Count of samples per status
+    """
+    calibration = calibration or GsrCalibration()
+    out_path = out_path or os.path.splitext(path)[0] + '_calibrated.csv'
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+    header, rows = rows[0], rows[1:]
+    adc_column = header.index('ADC')
+    us_column = header.index('microsiemens')
+
+    adc = np.array([row[adc_column] for row in rows], dtype=np.int64)
+    microsiemens = calibration.convert(adc).tolist()
+    status = calibration.status(adc)
+    names = [STATUS_NAMES[s] for s in status.tolist()]
+
+    with open(out_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header + ['adc_status'])
+        for row, value, name in zip(rows, microsiemens, names):
+            row[us_column] = '' if math.isnan(value) else value
+            writer.writerow(row + [name])
+    return {name: int((status == code).sum()) for code, name in STATUS_NAMES.items()}
+
+
+def _self_test(n=1_000_000):
+    """Table matches the per-sample formula, edges are explicit, and it is fast"""
+    vcc, r_fixed, adc_max = 3.3, 10000, 4095
+
+    def per_sample(adc_value):
+        # Original adc_to_microsiemens
+        v_out = adc_value / adc_max * vcc
+        try:
+            r_skin = r_fixed * (v_out / (vcc - v_out))
+            return (1 / r_skin) * 1e6
+        except ZeroDivisionError:
+            return 0
+
+    calibration = GsrCalibration(vcc, r_fixed, adc_max)
+    codes = np.arange(1, ADC_CODES - 1)
+    assert np.allclose(calibration.convert(codes), [per_sample(c) for c in codes.tolist()], rtol=1e-12)
+    assert calibration.status(0) == SATURATED and np.isnan(calibration.convert(0))
+    assert calibration.status(4095) == OPEN_CIRCUIT and np.isnan(calibration.convert(4095))
+    try:
+        calibration.convert([5000])
+        raise AssertionError("Out-of-range code accepted")
+    except ValueError:
+        pass
+
+    adc = np.random.default_rng(0).integers(0, ADC_CODES, n)
+    samples = adc.tolist()
+    start = time.perf_counter()
+    for value in samples[:n // 10]:
+        per_sample(value)
+    old = (time.perf_counter() - start) / (n // 10)
+    start = time.perf_counter()
+    calibration.convert(adc)
+    new = (time.perf_counter() - start) / n
+    print(f"GSR: calibration self-test passed; per-sample {old * 1e9:.0f} ns, "
+          f"table {new * 1e9:.1f} ns per sample ({old / new:.0f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute microsiemens in archived GSR CSV files")
+    parser.add_argument('inputs', nargs='*', help="GSR_data_*.csv files or glob patterns")
+    parser.add_argument('--device', default=None, help="Device MAC to look up in the calibration file")
+    parser.add_argument('--calibration', default='gsr_calibration.json', help="Calibration JSON file")
+    args = parser.parse_args()
+
+    if not args.inputs:
+        _self_test()
+        return
+    calibration = load_calibration(args.device, args.calibration) if args.device else GsrCalibration()
+    for path in sorted({p for pattern in args.inputs for p in glob.glob(pattern)}):
+        counts = convert_csv(path, calibration=calibration)
+        print(f"GSR: {os.path.basename(path)} -> " + ", ".join(f"{k}: {v}" for k, v in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+from collections import deque
+import numpy as np
+
+# Batched GSR notifications from the ESP32.
+# Each notification carries N packed little-endian records:
+#   uint16 sequence number (per sample, wraps at 65536)
+#   uint32 device tick in microseconds (micros(), wraps after ~71 min)
+#   uint16 raw ADC value (12 bit)
+# 30 records fit in one 247-byte MTU notification, so 100 Hz needs
+# only ~4 notifications per second instead of 100 GATT reads.
+# Only gsr_sensor.py (mode='notify') records this stream; EDA_bluetooth.py,
+# fixedEDA.py and BiometricsESP_Polar.py still poll the read characteristic.
+GSR_NOTIFY_UUID = "beb5483e-36e1-4688-b7f5-ea07361b26a9"  # must match the ESP32 firmware
+GSR_RECORD = np.dtype([('seq', '<u2'), ('tick_us', '<u4'), ('adc', '<u2')])
+SEQ_MODULO = 1 << 16
+TICK_MODULO = 1 << 32
+REORDER_WINDOW = 128  # A sample at most this far behind the newest one is late or repeated, not lost
+
+# Captured notification: 4 samples at 100 Hz across both counter wraps,
+# the last one a saturated ADC reading
+FIXTURE_PACKET = bytes.fromhex('feff80e3ffff0008ffff900a000003080000a031000007080100b0580000ff0f')
+
+
+def decode_packets(packets):
+    """
+    Decode one or more notifications in a single np.frombuffer call
+
+    Args:
+        packets (bytes or list of bytes): Raw notification payloads
+
+    Returns:
+        np.ndarray: Structured array with 'seq', 'tick_us' and 'adc'
+    """
+    if not isinstance(packets, (bytes, bytearray, memoryview)):
+        packets = b''.join(packets)
+    usable = len(packets) - len(packets) % GSR_RECORD.itemsize
+    return np.frombuffer(packets, dtype=GSR_RECORD, count=usable // GSR_RECORD.itemsize)
+
+
+def encode_packet(seq, tick_us, adc):
+    """Pack records the way the firmware does (used for fixtures and simulation)"""
+    records = np.empty(len(adc), dtype=GSR_RECORD)
+    records['seq'] = np.asarray(seq) % SEQ_MODULO
+    records['tick_us'] = np.asarray(tick_us) % TICK_MODULO
+    records['adc'] = adc
+    return records.tobytes()
+
+
+class _Unwrapper:
+    """Turn a wrapping counter into an int64 sequence (a late value may step back across the wrap)"""
+
+    def __init__(self, modulo):
+        self.modulo = modulo
+        self.last = None
+        self.offset = 0
+
+    def __call__(self, values):
+        values = values.astype(np.int64)
+        previous = np.concatenate([[values[0] if self.last is None else self.last], values[:-1]])
+        steps = values - previous
+        wraps = self.offset + np.cumsum((steps < -self.modulo // 2).astype(np.int64) - (steps > self.modulo // 2))
+        self.last = int(values[-1])
+        self.offset = int(wraps[-1])
+        return values + wraps * self.modulo
+
+
+class GsrStreamDecoder:
+    """
+    Stateful decoder: unwraps sequence numbers and device ticks across
+    notifications and counts lost samples
+
+    Samples that skip ahead are counted as lost until they turn up: a
+    sample arriving up to REORDER_WINDOW behind the newest one fills its
+    gap again (out of order), or is counted as repeated if it was already
+    received. A jump further back is taken as a counter restart.
+    """
+
+    def __init__(self):
+        self.seq = _Unwrapper(SEQ_MODULO)
+        self.ticks = _Unwrapper(TICK_MODULO)
+        self.last_index = None
+        self.received = 0
+        self.lost = 0
+        self.gap_events = 0
+        self.out_of_order = 0
+        self.repeated = 0
+        self.missing = {}    # missing index -> first index of its gap, within the reorder window
+        self.gap_sizes = {}  # first index of a gap -> samples of it still missing
+
+    def decode(self, packets):
+        """
+        Decode pending notifications
+
+        Returns:
+            tuple: (sample index, device time in seconds, adc) as arrays;
+            sample index is the unwrapped sequence number
+        """
+        records = decode_packets(packets)
+        if len(records) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, np.empty(0), empty
+
+        index = self.seq(records['seq'])
+        ticks = self.ticks(records['tick_us'])
+
+        if self.last_index is None:
+            self.last_index = int(index[0]) - 1
+        steps = np.diff(index, prepend=self.last_index)
+        if (steps > 0).all():
+            # In order (the usual case): only the gaps need attention
+            for following, step in zip(index[steps > 1].tolist(), steps[steps > 1].tolist()):
+                self._gap(following - step + 1, following)
+            self.last_index = int(index[-1])
+        else:
+            for i in index.tolist():
+                self._sample(i)
+        if self.missing:
+            self._forget_before(self.last_index - REORDER_WINDOW)
+        self.received += len(records)
+        return index, ticks / 1e6, records['adc'].astype(np.int64)
+
+    def _gap(self, first, following):
+        """Count samples first..following-1 as lost, remembering the recent ones"""
+        self.lost += following - first
+        self.gap_events += 1
+        recent = range(max(first, following - REORDER_WINDOW), following)
+        self.missing.update(dict.fromkeys(recent, first))
+        self.gap_sizes[first] = following - first
+
+    def _sample(self, i):
+        """Account for one sample of a block that is not in order"""
+        if i > self.last_index:
+            if i > self.last_index + 1:
+                self._gap(self.last_index + 1, i)
+            self.last_index = i
+        elif self.last_index - i <= REORDER_WINDOW:
+            self.out_of_order += 1
+            first = self.missing.pop(i, None)
+            if first is None:
+                self.repeated += 1
+                return
+            self.lost -= 1
+            self.gap_sizes[first] -= 1
+            if self.gap_sizes[first] == 0:
+                del self.gap_sizes[first]
+                self.gap_events -= 1
+        else:
+            # Far behind: the device restarted its counter
+            self.out_of_order += 1
+            self.last_index = i
+            self.missing.clear()
+            self.gap_sizes.clear()
+
+    def _forget_before(self, oldest):
+        """Stop waiting for missing samples that are too old to still arrive"""
+        for i in [i for i in self.missing if i < oldest]:
+            del self.missing[i]
+        self.gap_sizes = {first: size for first, size in self.gap_sizes.items()
+                          if first in self.missing.values()}
+
+    @property
+    def loss_ratio(self):
+        total = self.received + self.lost
+        return self.lost / total if total else 0.0
+
+    def summary(self):
+        return (f"{self.received} samples, {self.lost} lost in {self.gap_events} gaps "
+                f"({self.loss_ratio:.2%}), {self.out_of_order} out of order ({self.repeated} repeated)")
+
+
+class DeviceClock:
+    """
+    Map device time onto host time from notification receive times
+
+    Every notification gives one pair: the device time of its newest
+    sample and the host time.time() at which it arrived. Transmission
+    only adds delay, so the offset host - device is the smallest one seen
+    over the last window_s seconds; it is re-fitted with every pair, so
+    the drift between the ESP32 crystal and the host clock is followed.
+
+    Args:
+        window_s (float): Host seconds of pairs the offset is taken from
+    """
+
+    def __init__(self, window_s=60.0):
+        self.window_s = window_s
+        self.candidates = deque()  # (host time, offset), offsets increasing: a sliding minimum
+        self.pairs = 0
+
+    def add(self, device_time, host_time):
+        offset = host_time - device_time
+        while self.candidates and self.candidates[-1][1] >= offset:
+            self.candidates.pop()
+        self.candidates.append((host_time, offset))
+        while self.candidates[0][0] < host_time - self.window_s:
+            self.candidates.popleft()
+        self.pairs += 1
+
+    @property
+    def offset(self):
+        """Seconds to add to device time to get host (Unix) time, None before the first pair"""
+        return self.candidates[0][1] if self.candidates else None
+
+    def to_host(self, device_time):
+        return device_time + self.offset
+
+
+def _self_test():
+    """Decoder checks on recorded-style packet fixtures (100 Hz, 30 samples per packet)"""
+    period_us = 10000
+    n = 30 * 40
+    seq = np.arange(65000, 65000 + n)                       # crosses the uint16 wrap
+    ticks = TICK_MODULO - 600000 + np.arange(n) * period_us  # crosses the uint32 wrap
+    adc = (2048 + 300 * np.sin(np.arange(n) / 50)).astype(np.uint16)
+    packets = [encode_packet(seq[i:i + 30], ticks[i:i + 30], adc[i:i + 30]) for i in range(0, n, 30)]
+
+    fixture = GsrStreamDecoder()
+    index, t, values = fixture.decode(FIXTURE_PACKET)
+    assert index.tolist() == [65534, 65535, 65536, 65537]
+    assert np.allclose(np.diff(t), 0.01) and values.tolist() == [2048, 2051, 2055, 4095]
+    assert fixture.lost == 0 and len(decode_packets(FIXTURE_PACKET[:-3])) == 3
+
+    # Lose two whole notifications and decode the rest in uneven groups
+    kept = packets[:5] + packets[7:]
+    decoder = GsrStreamDecoder()
+    indices, times, values = [], [], []
+    for i in range(0, len(kept), 3):
+        index, t, v = decoder.decode(kept[i:i + 3])
+        indices.append(index)
+        times.append(t)
+        values.append(v)
+    indices = np.concatenate(indices)
+    times = np.concatenate(times)
+    values = np.concatenate(values)
+
+    assert decoder.lost == 60 and decoder.gap_events == 1, decoder.summary()
+    assert np.all(np.diff(indices) >= 1) and indices[-1] == seq[-1]
+    assert np.allclose(np.diff(times)[np.diff(indices) == 1], period_us / 1e6)
+    assert np.array_equal(values, np.concatenate([adc[:150], adc[210:]]))
+
+    # Swap two notifications across the uint16 wrap, repeat one, lose one: only the lost one counts
+    shuffled = packets[:17] + [packets[18], packets[17]] + packets[19:21] + [packets[20]] + \
+        packets[21:25] + packets[26:]
+    reordered = GsrStreamDecoder()
+    index = np.concatenate([reordered.decode(packet)[0] for packet in shuffled])
+    assert reordered.lost == 30 and reordered.gap_events == 1, reordered.summary()
+    assert reordered.out_of_order == 60 and reordered.repeated == 30, reordered.summary()
+    assert np.array_equal(np.unique(index), np.concatenate([seq[:750], seq[780:]]))
+    # A counter that jumps back by more than the window is a device restart, not loss
+    reordered.decode(packets[:2])
+    assert reordered.lost == 30 and reordered.last_index == seq[59], reordered.summary()
+
+    # Host time from receive times: 0-80 ms of BLE latency, 40 ppm drift, up to 0.5 s between drains
+    rng = np.random.default_rng(0)
+    host_start = 1.7e9
+    clock = DeviceClock(window_s=30.0)
+    errors = []
+    for k in range(4 * 600):  # 10 minutes of notifications at 4 per second
+        device_time = k * 0.25
+        true_host = host_start + device_time * (1 + 40e-6)
+        clock.add(device_time, true_host + rng.uniform(0.0, 0.08))
+        errors.append(clock.to_host(device_time) - true_host)
+    errors = np.abs(errors[40:])
+    assert errors.max() < 0.01, f"Host time off by {errors.max() * 1e3:.1f} ms"
+
+    rate = (indices[-1] - indices[0]) / (times[-1] - times[0])
+    print(f"GSR: decoder self-test passed: {decoder.summary()}, sample rate {rate:.0f} Hz, "
+          f"host time error {errors.mean() * 1e3:.1f} ms mean / {errors.max() * 1e3:.1f} ms max")
+
+
+if __name__ == "__main__":
+    _self_test()
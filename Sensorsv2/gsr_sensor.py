@@ -2,43 +2,138 @@ import asyncio
 import csv
 import time
 from datetime import datetime
-from bleak import BleakClient
+import numpy as np
 from bleak.exc import BleakError
+from gsr_notify import GSR_NOTIFY_UUID, GSR_RECORD, DeviceClock, GsrStreamDecoder
+from buffered_sink import BufferedCsvSink
+from gsr_calibration import GsrCalibration, load_calibration
+from ble_manager import BleDevice
+from ble_cache import cached_client
 
 # BLE config
 ESP32_MAC = "08:A6:F7:6B:48:36"  # Note: removed spaces from the MAC address
-CHARACTERISTIC_UUID = "beb5483e-361-4688-b7f5-ea07361b26a8"
+CHARACTERISTIC_UUID = "beb5483e-36e1-4688-b7f5-ea07361b26a8"
 
-async def _read_gsr_internal(mac_address, csv_filename, stop_event):
+CSV_HEADERS = {
+    'poll': ['timestamp', 'gsr_value'],
+    'notify': ['timestamp', 'gsr_value', 'microsiemens', 'seq', 'device_time_s'],
+}
+
+class GsrNotifyRecorder:
+    """
+    Decode batched GSR notifications and write the samples to a CSV writer or sink
+
+    Timestamps are the device clock mapped onto host time with the
+    receive time of every notification (see gsr_notify.DeviceClock), so
+    they do not depend on when the queue is drained.
+    """
+
+    def __init__(self, writer, calibration=None):
+        self.writer = writer
+        self.calibration = calibration or GsrCalibration()
+        self.decoder = GsrStreamDecoder()
+        self.clock = DeviceClock()
+        self.pending = []
+
+    def queue(self, sender, data):
+        """Notification callback that only stores the bytes and receive time (decode later with drain)"""
+        self.pending.append((time.time(), bytes(data)))
+
+    def handle(self, sender, data):
+        """Notification callback that decodes right away"""
+        self.queue(sender, data)
+        self.drain()
+
+    def drain(self):
+        entries = self.pending[:]
+        del self.pending[:len(entries)]
+        index, device_time, adc = self.decoder.decode([data for _, data in entries])
+        if len(index) == 0:
+            return
+
+        # Each notification pairs the time of its newest sample with when it arrived
+        counts = np.array([len(data) // GSR_RECORD.itemsize for _, data in entries])
+        newest = np.cumsum(counts[counts > 0]) - 1
+        received = [t for (t, _), count in zip(entries, counts.tolist()) if count]
+        for device_newest, host in zip(device_time[newest].tolist(), received):
+            self.clock.add(device_newest, host)
+
+        # Unix time -> local ISO strings, like datetime.now().isoformat() in poll mode
+        host_time = self.clock.to_host(device_time)
+        utc_offset = datetime.fromtimestamp(received[-1]).astimezone().utcoffset().total_seconds()
+        timestamps = np.datetime_as_string(np.rint((host_time + utc_offset) * 1e6).astype('datetime64[us]'),
+                                           unit='us')
+        microsiemens = self.calibration.convert(adc)
+        self.writer.writerows(zip(timestamps.tolist(), adc.tolist(), microsiemens.tolist(),
+                                  index.tolist(), device_time.tolist()))
+
+async def _stream_gsr_notify(client, writer, stop_event, flush_interval=0.5, report_interval=10.0,
+                             calibration=None):
+    """Receive batched GSR notifications and decode them a batch at a time"""
+    recorder = GsrNotifyRecorder(writer, calibration)
+
+    # Keep the callback cheap: decoding happens in the loop below
+    await client.start_notify(GSR_NOTIFY_UUID, recorder.queue)
+    print("GSR: 📡 Notifications started")
+    next_report = time.time() + report_interval
+
+    try:
+        while not stop_event.is_set():
+            await asyncio.sleep(flush_interval)
+            recorder.drain()
+            if time.time() >= next_report:
+                next_report += report_interval
+                print(f"GSR: 📊 {recorder.decoder.summary()}")
+    finally:
+        if client.is_connected:
+            await client.stop_notify(GSR_NOTIFY_UUID)
+        recorder.drain()
+        print(f"GSR: 📊 {recorder.decoder.summary()}")
+
+def create_gsr_device(sink, mac_address=ESP32_MAC, mode='poll', poll_interval=0.1):
+    """
+    GSR sensor description for ble_manager.BleConnectionManager
+
+    Args:
+        sink: BufferedCsvSink with CSV_HEADERS[mode] columns
+        mac_address (str): ESP32 MAC address
+        mode (str): 'poll' or 'notify', see read_gsr
+        poll_interval (float): Seconds between reads in poll mode
+    """
+    if mode == 'notify':
+        recorder = GsrNotifyRecorder(sink, load_calibration(mac_address))
+        return BleDevice('GSR', mac_address, notify=[(GSR_NOTIFY_UUID, recorder.handle)])
+
+    def handle_read(data):
+        sink.write([datetime.now().isoformat(), int.from_bytes(data, byteorder='little')])
+    return BleDevice('GSR', mac_address, poll=(CHARACTERISTIC_UUID, poll_interval, handle_read))
+
+async def _read_gsr_internal(mac_address, csv_filename, stop_event, mode='poll', ble_options=None):
     """Internal function to read GSR data from ESP32"""
     print(f"GSR: Connecting to ESP32 at {mac_address}...")
+    characteristic_uuid = GSR_NOTIFY_UUID if mode == 'notify' else CHARACTERISTIC_UUID
     
     # Create CSV file with headers
     try:
         with open(csv_filename, 'w', newline='') as file:
             writer = csv.writer(file)
-            writer.writerow(['timestamp', 'gsr_value'])
+            writer.writerow(CSV_HEADERS[mode])
         print(f"GSR: CSV file {csv_filename} created")
     except Exception as e:
         print(f"GSR: Error creating CSV: {e}")
         return False
     
     try:
-        async with BleakClient(mac_address) as client:
+        # Connects from the device cache when possible; raises if the characteristic is missing
+        async with cached_client(mac_address, [characteristic_uuid], **(ble_options or {})) as (client, characteristics):
             print("GSR: ✅ Connected to ESP32")
             
-            # Check if the characteristic exists
-            services = await client.get_services()
-            characteristic_found = False
-            for service in services:
-                for char in service.characteristics:
-                    if char.uuid == CHARACTERISTIC_UUID:
-                        characteristic_found = True
-                        break
-            
-            if not characteristic_found:
-                print(f"GSR: ❌ Characteristic {CHARACTERISTIC_UUID} not found")
-                return False
+            if mode == 'notify':
+                async with BufferedCsvSink(csv_filename, mode='a') as sink:
+                    await _stream_gsr_notify(client, sink, stop_event,
+                                             calibration=load_calibration(mac_address))
+                print(f"GSR: 💾 {sink.summary()}")
+                return True
             
             # Open CSV file for appending
             with open(csv_filename, 'a', newline='') as file:
@@ -47,7 +142,7 @@ async def _read_gsr_internal(mac_address, csv_filename, stop_event):
                 while not stop_event.is_set():
                     try:
                         # Read data from the characteristic
-                        data = await client.read_gatt_char(CHARACTERISTIC_UUID)
+                        data = await client.read_gatt_char(characteristics[CHARACTERISTIC_UUID])
                         gsr_value = int.from_bytes(data, byteorder='little')
                         timestamp = datetime.now().isoformat()
                         
@@ -69,7 +164,7 @@ async def _read_gsr_internal(mac_address, csv_filename, stop_event):
     
     return True
 
-def read_gsr(stop_event, mac_address=ESP32_MAC, csv_filename="gsr_data.csv"):
+def read_gsr(stop_event, mac_address=ESP32_MAC, csv_filename="gsr_data.csv", mode='poll', ble_options=None):
     """
     Main function to read GSR data from ESP32
     
@@ -77,12 +172,17 @@ def read_gsr(stop_event, mac_address=ESP32_MAC, csv_filename="gsr_data.csv"):
         stop_event: Event to signal when to stop
         mac_address (str): ESP32 MAC address (optional)
         csv_filename (str): CSV filename (optional)
+        mode (str): 'poll' reads the characteristic every 100 ms,
+            'notify' receives batched samples pushed by the ESP32
+            (>=100 Hz, with packet loss reporting, see gsr_notify)
+        ble_options (dict): Extra ble_cache.cached_client arguments, e.g.
+            a ble_simulator backend's client_factory and scanner
     
     Returns:
         bool: True if successful, False if error
     """
     try:
-        success = asyncio.run(_read_gsr_internal(mac_address, csv_filename, stop_event))
+        success = asyncio.run(_read_gsr_internal(mac_address, csv_filename, stop_event, mode, ble_options))
         return success
     except KeyboardInterrupt:
         print("\nGSR: ⏹️ Monitoring stopped by user")
@@ -1,43 +1,54 @@
 import asyncio
-import csv
+import time
 from datetime import datetime
-from bleak import BleakClient
 from bleak.exc import BleakError
+from buffered_sink import BufferedCsvSink
+from hrv import parse_heart_rate_measurement, HrvEngine
+from ble_manager import BleDevice
+from ble_cache import cached_client
 
 # Configuration
 DEFAULT_MAC = "24:AC:AC:02:FA:11"
 DEFAULT_CSV = "heart_rate_data.csv"
 HR_SERVICE = "0000180d-0000-1000-8000-00805f9b34fb"
 HR_CHARACTERISTIC = "00002a37-0000-1000-8000-00805f9b34fb"
-
-def save_to_csv(timestamp, heart_rate, csv_filename):
-    """Save data to CSV"""
-    try:
-        with open(csv_filename, 'a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([timestamp, heart_rate])
-        print(f"HR: 💓 {heart_rate} bpm - Saved")
-    except Exception as e:
-        print(f"HR: ❌ Error saving CSV: {e}")
+STATUS_INTERVAL = 5.0  # Seconds between heart rate prints
+CSV_HEADER = ['timestamp', 'heart_rate', 'rr_intervals_ms', 'rmssd_ms', 'sdnn_ms', 'pnn50', 'lf_hf']
 
 def decode_heart_rate(data):
-    """Decode heart rate data"""
+    """Decode a 0x2A37 notification (heart rate, RR intervals, ...), None if malformed"""
     try:
-        return data[1]  # The second byte contains the heart rate
-    except:
+        return parse_heart_rate_measurement(data)
+    except ValueError:
         return None
 
-def create_heart_rate_callback(csv_filename):
-    """Create callback with correct filename"""
+def _format_metric(value):
+    return '' if value is None else round(value, 3)
+
+def create_heart_rate_callback(sink, latest=None, engine=None):
+    """Create callback that queues rows on the sink (no file I/O in the callback)"""
+    engine = engine or HrvEngine()
+
     def heart_rate_callback(sender, data):
         """Callback that processes data"""
-        heart_rate = decode_heart_rate(data)
-        if heart_rate is not None:
+        measurement = decode_heart_rate(data)
+        if measurement is not None:
             timestamp = datetime.now().isoformat()
-            save_to_csv(timestamp, heart_rate, csv_filename)
+            metrics = engine.add(measurement['rr_raw'])
+            rr_ms = ' '.join(f"{rr:.1f}" for rr in measurement['rr_intervals'])
+            sink.write([timestamp, measurement['heart_rate'], rr_ms]
+                       + [_format_metric(metrics[key]) for key in ('rmssd', 'sdnn', 'pnn50', 'lf_hf')])
+            if latest is not None:
+                latest['heart_rate'] = measurement['heart_rate']
+                latest['metrics'] = metrics
     return heart_rate_callback
 
-async def _monitor_heart_rate_internal(mac_address, csv_filename, stop_event):
+def create_hr_device(sink, mac_address=DEFAULT_MAC):
+    """Polar H10 description for ble_manager.BleConnectionManager (rows go to sink, CSV_HEADER columns)"""
+    callback = create_heart_rate_callback(sink)
+    return BleDevice('HR', mac_address, notify=[(HR_CHARACTERISTIC, callback)])
+
+async def _monitor_heart_rate_internal(mac_address, csv_filename, stop_event, durability='flush', ble_options=None):
     """Internal function that does all the work"""
     print("HR: 🚀 Starting Polar H10 monitoring")
     print(f"HR: 📋 MAC: {mac_address}")
@@ -45,30 +56,38 @@ async def _monitor_heart_rate_internal(mac_address, csv_filename, stop_event):
     
     # Create CSV file with headers
     try:
-        with open(csv_filename, 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(['timestamp', 'heart_rate'])
+        sink = BufferedCsvSink(csv_filename, CSV_HEADER, durability=durability)
         print("HR: 📄 CSV file created")
     except Exception as e:
         print(f"HR: ❌ Error creating CSV: {e}")
         return False
     
     # Try Bluetooth connection
+    sink.start()
     try:
         print("HR: 🔗 Connecting to sensor...")
-        async with BleakClient(mac_address, timeout=15.0) as client:
+        async with cached_client(mac_address, [HR_CHARACTERISTIC], timeout=15.0,
+                                 **(ble_options or {})) as (client, characteristics):
             print("HR: ✅ Connected successfully!")
             print("HR: 📊 Starting heart rate monitoring...")
             
-            # Create callback with correct filename
-            callback = create_heart_rate_callback(csv_filename)
+            # Create callback that writes through the buffered sink
+            latest = {}
+            callback = create_heart_rate_callback(sink, latest)
             
             # Start notifications
-            await client.start_notify(HR_CHARACTERISTIC, callback)
+            await client.start_notify(characteristics[HR_CHARACTERISTIC], callback)
             
             # Keep program running until stop event is set
+            next_status = time.time() + STATUS_INTERVAL
             while not stop_event.is_set():
                 await asyncio.sleep(0.1)
+                if time.time() >= next_status and 'heart_rate' in latest:
+                    next_status += STATUS_INTERVAL
+                    rmssd = latest['metrics']['rmssd']
+                    hrv_text = f"RMSSD {rmssd:.1f} ms" if rmssd is not None else "RMSSD --"
+                    print(f"HR: 💓 {latest['heart_rate']} bpm, {hrv_text} - "
+                          f"{sink.rows_written + len(sink.pending)} saved")
                 
     except BleakError as e:
         print(f"HR: ❌ Bluetooth error: {e}")
@@ -76,10 +95,14 @@ async def _monitor_heart_rate_internal(mac_address, csv_filename, stop_event):
     except Exception as e:
         print(f"HR: ❌ Unexpected error: {e}")
         return False
+    finally:
+        await sink.close()
+        print(f"HR: 💾 {sink.summary()}")
     
     return True
 
-def monitor_heart_rate(stop_event, mac_address=DEFAULT_MAC, csv_filename=DEFAULT_CSV):
+def monitor_heart_rate(stop_event, mac_address=DEFAULT_MAC, csv_filename=DEFAULT_CSV, durability='flush',
+                       ble_options=None):
     """
     Main function to monitor Polar H10
     
@@ -87,12 +110,16 @@ def monitor_heart_rate(stop_event, mac_address=DEFAULT_MAC, csv_filename=DEFAULT
         stop_event: Event to signal when to stop
         mac_address (str): Sensor MAC address (optional)
         csv_filename (str): CSV filename (optional)
+        durability (str): 'none', 'flush' or 'fsync', see BufferedCsvSink
+        ble_options (dict): Extra ble_cache.cached_client arguments, e.g.
+            a ble_simulator backend's client_factory and scanner
     
     Returns:
         bool: True if successful, False if error
     """
     try:
-        success = asyncio.run(_monitor_heart_rate_internal(mac_address, csv_filename, stop_event))
+        success = asyncio.run(_monitor_heart_rate_internal(mac_address, csv_filename, stop_event, durability,
+                                                           ble_options))
         return success
     except KeyboardInterrupt:
         print("\nHR: ⏹️ Monitoring stopped by user")
@@ -0,0 +1,301 @@
+import math
+from collections import deque
+import numpy as np
+
+# Heart Rate Measurement characteristic (0x2A37) flag bits
+HR_FORMAT_UINT16 = 0x01
+SENSOR_CONTACT_DETECTED = 0x02
+SENSOR_CONTACT_SUPPORTED = 0x04
+ENERGY_EXPENDED_PRESENT = 0x08
+RR_INTERVAL_PRESENT = 0x10
+RR_UNITS_PER_SECOND = 1024  # RR intervals are sent in 1/1024 s
+
+LF_BAND = (0.04, 0.15)
+HF_BAND = (0.15, 0.40)
+
+# 0x2A37 payloads as sent by the Polar H10 and other chest straps, with the expected decode
+HR_FIXTURES = [
+    # uint8 HR, contact supported and detected, one RR interval
+    ('16484103', {'heart_rate': 72, 'sensor_contact': True, 'energy_expended': None, 'rr_raw': [833]}),
+    # uint8 HR, two RR intervals in one notification
+    ('16473f034403', {'heart_rate': 71, 'sensor_contact': True, 'energy_expended': None, 'rr_raw': [831, 836]}),
+    # contact supported but not detected, no RR
+    ('0400', {'heart_rate': 0, 'sensor_contact': False, 'energy_expended': None, 'rr_raw': []}),
+    # contact not supported
+    ('004b', {'heart_rate': 75, 'sensor_contact': None, 'energy_expended': None, 'rr_raw': []}),
+    # uint16 HR, energy expended, one RR interval
+    ('19780010270002', {'heart_rate': 120, 'sensor_contact': None, 'energy_expended': 10000, 'rr_raw': [512]}),
+    # uint16 HR, contact detected, energy expended and three RR intervals
+    ('1fb400e803800180018001', {'heart_rate': 180, 'sensor_contact': True, 'energy_expended': 1000,
+                                'rr_raw': [384, 384, 384]}),
+]
+
+
+def parse_heart_rate_measurement(data):
+    """
+    Decode a Heart Rate Measurement (0x2A37) notification
+
+    Handles every flag variant: uint8/uint16 heart rate, sensor contact
+    status, energy expended and any number of RR intervals.
+
+    Args:
+        data (bytes): Notification payload
+
+    Returns:
+        dict: heart_rate (bpm), sensor_contact (None if not supported),
+        energy_expended (kJ or None), rr_raw (list of 1/1024 s units)
+        and rr_intervals (list of ms)
+    """
+    data = bytes(data)
+    if len(data) < 2:
+        raise ValueError(f"Heart rate payload too short ({len(data)} bytes)")
+    flags = data[0]
+    offset = 1
+
+    if flags & HR_FORMAT_UINT16:
+        if len(data) < 3:
+            raise ValueError("Heart rate payload truncated (uint16 value)")
+        heart_rate = int.from_bytes(data[1:3], 'little')
+        offset = 3
+    else:
+        heart_rate = data[1]
+        offset = 2
+
+    sensor_contact = None
+    if flags & SENSOR_CONTACT_SUPPORTED:
+        sensor_contact = bool(flags & SENSOR_CONTACT_DETECTED)
+
+    energy_expended = None
+    if flags & ENERGY_EXPENDED_PRESENT:
+        if len(data) < offset + 2:
+            raise ValueError("Heart rate payload truncated (energy expended)")
+        energy_expended = int.from_bytes(data[offset:offset + 2], 'little')
+        offset += 2
+
+    rr_raw = []
+    if flags & RR_INTERVAL_PRESENT:
+        if (len(data) - offset) % 2:
+            raise ValueError("Heart rate payload truncated (RR interval)")
+        rr_raw = [int.from_bytes(data[i:i + 2], 'little') for i in range(offset, len(data), 2)]
+
+    return {
+        'heart_rate': heart_rate,
+        'sensor_contact': sensor_contact,
+        'energy_expended': energy_expended,
+        'rr_raw': rr_raw,
+        'rr_intervals': [rr * 1000 / RR_UNITS_PER_SECOND for rr in rr_raw],
+    }
+
+
+class _SlidingSpectrum:
+    """
+    Sliding DFT of an evenly sampled signal, restricted to the bins needed
+
+    Each new sample updates every tracked bin in O(bins). The bins are
+    recomputed exactly once per window length, which bounds round-off
+    drift at an amortized O(bins) per sample. A Hann window is applied in
+    the frequency domain (three-tap combination of neighbouring bins).
+    """
+
+    def __init__(self, n, sampling_rate, f_low, f_high):
+        self.n = n
+        resolution = sampling_rate / n
+        first = max(1, int(math.floor(f_low / resolution)))
+        last = int(math.ceil(f_high / resolution))
+        self.bins = np.arange(first - 1, last + 2)   # one extra bin each side for the Hann taper
+        self.freqs = self.bins * resolution
+        self.twiddle = np.exp(2j * np.pi * self.bins / n)
+        self.basis = np.exp(-2j * np.pi * np.outer(self.bins, np.arange(n)) / n)
+        self.buffer = np.zeros(n)
+        self.spectrum = np.zeros(len(self.bins), dtype=complex)
+        self.position = 0
+        self.count = 0
+
+    def push(self, value):
+        oldest = self.buffer[self.position]
+        self.buffer[self.position] = value
+        self.position = (self.position + 1) % self.n
+        self.count += 1
+        if self.position == 0:
+            # Exact refresh: the buffer is in time order again
+            self.spectrum = self.basis @ self.buffer
+        else:
+            self.spectrum = (self.spectrum + value - oldest) * self.twiddle
+
+    @property
+    def full(self):
+        return self.count >= self.n
+
+    def band_power(self, bands):
+        """Power (signal units squared) in each (low, high) band, Hann windowed"""
+        hann = 0.5 * self.spectrum[1:-1] - 0.25 * (self.spectrum[:-2] + self.spectrum[2:])
+        # One-sided periodogram; 0.375 is the mean square of the Hann window
+        power = 2 * np.abs(hann) ** 2 / (self.n ** 2 * 0.375)
+        freqs = self.freqs[1:-1]
+        return [float(power[(freqs >= low) & (freqs < high)].sum()) for low, high in bands]
+
+
+class HrvEngine:
+    """
+    Incremental HRV metrics from RR intervals
+
+    Time-domain metrics (RMSSD, SDNN, pNN50) cover the last window_beats
+    intervals and are kept as running integer sums in 1/1024 s units, so
+    each beat costs O(1) and there is no floating-point drift. LF/HF
+    comes from a sliding DFT of the RR tachogram resampled at
+    resample_hz over spectral_seconds; each beat adds a bounded number of
+    samples (at most rr_max_ms * resample_hz / 1000).
+
+    Intervals outside [rr_min_ms, rr_max_ms] are treated as artifacts:
+    they are counted, excluded from the metrics and break the successive
+    difference chain.
+    """
+
+    def __init__(self, window_beats=300, rr_min_ms=300, rr_max_ms=2000, resample_hz=4.0,
+                 spectral_seconds=120):
+        self.window_beats = window_beats
+        self.rr_min = rr_min_ms * RR_UNITS_PER_SECOND / 1000
+        self.rr_max = rr_max_ms * RR_UNITS_PER_SECOND / 1000
+        self.rr = deque()
+        self.diffs = deque()
+        self.sum_rr = 0
+        self.sum_rr2 = 0
+        self.sum_diff2 = 0
+        self.nn50 = 0
+        self.previous = None
+        self.beats = 0
+        self.rejected = 0
+
+        self.resample_period = RR_UNITS_PER_SECOND / resample_hz
+        self.spectrum = _SlidingSpectrum(int(spectral_seconds * resample_hz), resample_hz,
+                                         LF_BAND[0], HF_BAND[1])
+        self.clock = 0          # beat time in 1/1024 s
+        self.knot = None        # (time, rr) of the last accepted beat
+        self.next_sample = None
+
+    def add_rr(self, rr_raw):
+        """Add one RR interval in 1/1024 s units (as sent in 0x2A37)"""
+        rr_raw = int(rr_raw)
+        self.beats += 1
+        self.clock += rr_raw
+        if not self.rr_min <= rr_raw <= self.rr_max:
+            self.rejected += 1
+            self.previous = None
+            return
+
+        self.rr.append(rr_raw)
+        self.sum_rr += rr_raw
+        self.sum_rr2 += rr_raw * rr_raw
+        if len(self.rr) > self.window_beats:
+            old = self.rr.popleft()
+            self.sum_rr -= old
+            self.sum_rr2 -= old * old
+
+        if self.previous is not None:
+            diff = rr_raw - self.previous
+            self.diffs.append(diff)
+            self.sum_diff2 += diff * diff
+            self.nn50 += self._is_nn50(diff)
+            if len(self.diffs) > self.window_beats - 1:
+                old = self.diffs.popleft()
+                self.sum_diff2 -= old * old
+                self.nn50 -= self._is_nn50(old)
+        self.previous = rr_raw
+
+        self._resample(self.clock, rr_raw)
+
+    def add(self, rr_raw_list):
+        """Add every RR interval of one notification and return the current metrics"""
+        for rr in rr_raw_list:
+            self.add_rr(rr)
+        return self.metrics()
+
+    @staticmethod
+    def _is_nn50(diff):
+        # |diff| > 50 ms, in exact integer arithmetic
+        return abs(diff) * 1000 > 50 * RR_UNITS_PER_SECOND
+
+    def _resample(self, time, rr):
+        """Linearly interpolate the tachogram between the last two accepted beats"""
+        if self.knot is None:
+            self.knot = (time, rr)
+            self.next_sample = time
+            return
+        t0, rr0 = self.knot
+        while self.next_sample <= time:
+            fraction = (self.next_sample - t0) / (time - t0)
+            self.spectrum.push((rr0 + fraction * (rr - rr0)) * 1000 / RR_UNITS_PER_SECOND)
+            self.next_sample += self.resample_period
+        self.knot = (time, rr)
+
+    def metrics(self):
+        """
+        Current metrics (ms unless noted); None where there is not enough data yet
+
+        Returns:
+            dict: mean_rr, mean_hr (bpm), sdnn, rmssd, pnn50 (%), lf, hf (ms^2), lf_hf
+        """
+        scale = 1000 / RR_UNITS_PER_SECOND
+        n = len(self.rr)
+        m = len(self.diffs)
+        result = dict.fromkeys(('mean_rr', 'mean_hr', 'sdnn', 'rmssd', 'pnn50', 'lf', 'hf', 'lf_hf'))
+        if n:
+            result['mean_rr'] = self.sum_rr / n * scale
+            result['mean_hr'] = 60000 / result['mean_rr']
+        if n > 1:
+            variance = (n * self.sum_rr2 - self.sum_rr * self.sum_rr) / (n * (n - 1))
+            result['sdnn'] = math.sqrt(max(variance, 0)) * scale
+        if m:
+            result['rmssd'] = math.sqrt(self.sum_diff2 / m) * scale
+            result['pnn50'] = 100 * self.nn50 / m
+        if self.spectrum.full:
+            lf, hf = self.spectrum.band_power([LF_BAND, HF_BAND])
+            result['lf'] = lf
+            result['hf'] = hf
+            result['lf_hf'] = lf / hf if hf > 0 else None
+        return result
+
+
+def _self_test():
+    """Parser fixtures and engine metrics against a direct computation"""
+    for payload, expected in HR_FIXTURES:
+        decoded = parse_heart_rate_measurement(bytes.fromhex(payload))
+        for key, value in expected.items():
+            assert decoded[key] == value, (payload, key, decoded[key], value)
+    for truncated in ('', '16', '01', '164841', '194b00e8'):
+        try:
+            parse_heart_rate_measurement(bytes.fromhex(truncated))
+        except ValueError:
+            continue
+        raise AssertionError(f"Truncated payload {truncated!r} was accepted")
+
+    # 10 minutes of beats: 0.1 Hz (LF) and 0.25 Hz (HF) modulation, plus artifacts
+    rng = np.random.default_rng(0)
+    rr_ms, t = [], 0.0
+    while t < 600:
+        rr = 850 + 40 * np.sin(2 * np.pi * 0.1 * t) + 20 * np.sin(2 * np.pi * 0.25 * t) + rng.normal(0, 5)
+        rr_ms.append(rr)
+        t += rr / 1000
+    rr_raw = np.round(np.array(rr_ms) * RR_UNITS_PER_SECOND / 1000).astype(int)
+    rr_raw[[100, 400]] = [100, 3000]  # missed and doubled beats
+
+    engine = HrvEngine(window_beats=300)
+    for rr in rr_raw:
+        engine.add_rr(rr)
+    metrics = engine.metrics()
+
+    # Direct computation over the same window
+    valid = [rr for rr in rr_raw if engine.rr_min <= rr <= engine.rr_max][-300:]
+    window = np.array(valid) * 1000 / RR_UNITS_PER_SECOND
+    diffs = np.diff(window)
+    assert engine.rejected == 2
+    assert math.isclose(metrics['sdnn'], np.std(window, ddof=1), rel_tol=1e-9)
+    assert math.isclose(metrics['rmssd'], np.sqrt(np.mean(diffs ** 2)), rel_tol=1e-9)
+    assert math.isclose(metrics['pnn50'], 100 * np.mean(np.abs(diffs) > 50), rel_tol=1e-9)
+    assert metrics['lf_hf'] > 1, metrics
+    print("HR: HRV self-test passed: " + ", ".join(
+        f"{key} {value:.2f}" for key, value in metrics.items() if value is not None))
+
+
+if __name__ == "__main__":
+    _self_test()
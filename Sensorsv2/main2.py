@@ -1,10 +1,53 @@
+import asyncio
 import threading
 import time
 from datetime import datetime
 from eeg_recorder import eegHeadset
-from heart_rate_monitor import monitor_heart_rate
+from heart_rate_monitor import CSV_HEADER as HR_CSV_HEADER, create_hr_device
+from polar_pmd import PolarPmdStreams, add_pmd_streams
 from video_recorder import record_video
-from gsr_sensor import read_gsr
+from gsr_sensor import CSV_HEADERS as GSR_CSV_HEADERS, create_gsr_device
+from buffered_sink import BufferedCsvSink
+from ble_manager import BleConnectionManager
+from ble_cache import BleCache
+
+async def _record_ble(stop_event, hr_mac, hr_filename, gsr_mac, gsr_filename, gsr_mode, pmd_prefix):
+    async with BufferedCsvSink(hr_filename, HR_CSV_HEADER) as hr_sink, \
+            BufferedCsvSink(gsr_filename, GSR_CSV_HEADERS[gsr_mode]) as gsr_sink:
+        manager = BleConnectionManager(cache=BleCache())
+        hr_device = manager.add_device(create_hr_device(hr_sink, hr_mac))
+        manager.add_device(create_gsr_device(gsr_sink, gsr_mac, gsr_mode))
+        if pmd_prefix is None:
+            await manager.run(stop_event)
+        else:
+            # 130 Hz ECG and 200 Hz ACC: larger blocks than the 1 Hz sensors
+            async with BufferedCsvSink(f"{pmd_prefix}_ecg.csv", PolarPmdStreams.ECG_HEADER,
+                                       max_rows=2048) as ecg_sink, \
+                    BufferedCsvSink(f"{pmd_prefix}_acc.csv", PolarPmdStreams.ACC_HEADER,
+                                    max_rows=2048) as acc_sink, \
+                    BufferedCsvSink(f"{pmd_prefix}_rpeaks.csv", PolarPmdStreams.PEAK_HEADER) as peak_sink:
+                streams = add_pmd_streams(hr_device, ecg_sink, acc_sink, peak_sink)
+                await manager.run(stop_event)
+            print(f"HR: PMD {streams.summary()}")
+    for device in manager.devices:
+        print(f"BLE: {device.summary()}")
+
+def record_ble_sensors(stop_event, hr_mac, hr_filename, gsr_mac, gsr_filename, gsr_mode='poll',
+                       pmd_prefix=None):
+    """
+    Record heart rate and GSR in one event loop
+
+    Both sensors share a BleConnectionManager, which reconnects (with
+    backoff) and re-subscribes when a link drops, so a lost sensor comes
+    back instead of ending its recording. With pmd_prefix, the Polar H10
+    also streams raw ECG, accelerometer and detected R peaks to
+    <pmd_prefix>_ecg.csv, _acc.csv and _rpeaks.csv over the same link.
+    """
+    try:
+        asyncio.run(_record_ble(stop_event, hr_mac, hr_filename, gsr_mac, gsr_filename, gsr_mode,
+                                pmd_prefix))
+    except Exception as e:
+        print(f"BLE: ❌ Error running sensors: {e}")
 
 def main():
     # Get subject identifier
@@ -18,6 +61,7 @@ def main():
     eeg_filename = f"eeg_{subject_id}_{session_id}.csv"
     hr_filename = f"hr_{subject_id}_{session_id}.csv"
     gsr_filename = f"gsr_{subject_id}_{session_id}.csv"
+    pmd_prefix = f"polar_{subject_id}_{session_id}"
 
 
     ESP32_MAC = "08:A6:F7:6B:48:36" 
@@ -25,9 +69,11 @@ def main():
     # Create threads for each recording modality
     threads = [
         threading.Thread(target=eegHeadset, args=(subject_id, stop_event), name="EEG"),
-        threading.Thread(target=monitor_heart_rate, args=(stop_event, "24:AC:AC:02:FA:11", hr_filename), name="HeartRate"),
         threading.Thread(target=record_video, args=(stop_event, 0), name="Video"),
-        threading.Thread(target=read_gsr, args=(stop_event, ESP32_MAC, gsr_filename), name="GSR")
+        threading.Thread(target=record_ble_sensors,
+                         args=(stop_event, "24:AC:AC:02:FA:11", hr_filename, ESP32_MAC, gsr_filename,
+                               'poll', pmd_prefix),
+                         name="BLE")
     ]
     
     print("\n" + "="*60)
@@ -68,7 +114,8 @@ def main():
         print(f"  - EEG: {eeg_filename}")
         print(f"  - Heart Rate: {hr_filename}")
         print(f"  - GSR: {gsr_filename}")
-        print(f"  - Video: video_16x9_{session_id}.mp4")
+        print(f"  - ECG/ACC/R peaks: {pmd_prefix}_ecg.csv, {pmd_prefix}_acc.csv, {pmd_prefix}_rpeaks.csv")
+        print("  - Video: video_16x9_<start time>_NNN.mp4 (5 min segments)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,491 @@
+import argparse
+import array
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+import time
+import cv2
+import numpy as np
+from video_pipeline import EncodeWorker, Frame
+from video_encoder import open_encoder
+from video_index import FrameIndexWriter, FrameIndex
+from video_overlay import TimestampOverlay
+from video_preview import PreviewWindow
+from camera_cache import open_camera_cached
+
+
+class Camera:
+    """One source of a MultiCameraRecorder: capture object, encoder worker and counters"""
+
+    def __init__(self, name, capture, worker, frame_index=None, preview=None):
+        self.name = name
+        self.capture = capture
+        self.worker = worker
+        self.frame_index = frame_index
+        self.preview = preview
+        self.active = True
+        self.captured = 0
+        self.read_failures = 0
+        self.failures = 0   # consecutive
+
+    def stats(self, elapsed):
+        worker = self.worker
+        return {
+            'captured': self.captured,
+            'capture_fps': round(self.captured / elapsed, 2) if elapsed else 0.0,
+            'encoded': worker.encoded,
+            'repeated': worker.repeated,
+            'skipped': worker.skipped,
+            'dropped_encode': worker.queue.dropped,
+            'late': worker.late,
+            'read_failures': self.read_failures,
+            'max_encode_queue': worker.queue.max_depth,
+        }
+
+
+class MultiCameraRecorder:
+    """
+    Record several cameras with matched frames, one encoder thread per camera
+
+    Each round the capture thread first latches a frame on every camera
+    with grab() (cheap: no decode) and only then decodes them with
+    retrieve(). The latch times of a round are therefore as close as the
+    cameras allow; their spread is the inter-camera skew reported in
+    stats(). With grab_first=False every camera is read() in turn, as
+    separate single-camera loops would, and the skew includes the decode
+    of the cameras before it.
+
+    The overlay and the encode of each camera run in its own EncodeWorker
+    thread, so adding a camera adds an encoder thread instead of adding
+    its encode time to the capture loop. Frame indexes (video_index) are
+    written per camera, so frames can be matched across files by capture
+    time afterwards.
+
+    Free-running USB cameras are not exposure-synchronized: frames in a
+    round may still have been exposed up to one frame period apart. Only
+    a hardware trigger removes that part.
+
+    Args:
+        cameras (dict): name -> capture object with grab()/retrieve()
+            (cv2.VideoCapture, SyntheticCamera)
+        writers (dict): name -> writer with write(image)
+        fps (float): Nominal frame rate of the output files
+        frame_indexes (dict): name -> video_index.FrameIndexWriter (optional)
+        overlays (dict): name -> overlay(image, timestamp, index) (optional)
+        grab_first (bool): Latch all cameras before decoding any
+        max_skew (float): Rounds with a larger latch spread are counted as
+            desynchronized (default half a frame period)
+        preview (bool): One PreviewWindow per camera ('q' in any stops)
+    """
+
+    def __init__(self, cameras, writers, fps, frame_indexes=None, overlays=None, grab_first=True, max_skew=None,
+                 encode_queue=None, keep_timing=True, max_read_failures=30, preview=False, preview_fps=5.0,
+                 preview_scale=0.25):
+        self.fps = float(fps)
+        self.grab_first = grab_first
+        self.max_skew = max_skew if max_skew is not None else 0.5 / self.fps
+        self.max_read_failures = max_read_failures
+        self.stopping = threading.Event()
+        self.cameras = []
+        for name, capture in cameras.items():
+            frame_index = (frame_indexes or {}).get(name)
+            worker = EncodeWorker(writers[name], fps, encode_queue, keep_timing=keep_timing, frame_index=frame_index,
+                                  overlay=(overlays or {}).get(name), on_error=self._encode_failed,
+                                  name=f"Video-encode-{name}")
+            window = PreviewWindow(f'{name} - Press "q" to stop', preview_fps, preview_scale,
+                                   on_key=self._on_key) if preview else None
+            self.cameras.append(Camera(name, capture, worker, frame_index, window))
+
+        self.skews = array.array('d')   # latch spread of every complete round (s)
+        self.rounds = 0
+        self.partial_rounds = 0         # rounds where at least one camera failed to grab
+        self.error = None
+        self.started = None
+        self.finished = None
+
+    def _encode_failed(self, error):
+        self.error = error
+        self.stopping.set()
+
+    def _on_key(self, key):
+        if key == 'q':
+            self.stopping.set()
+
+    def _failed(self, camera):
+        camera.read_failures += 1
+        camera.failures += 1
+        if camera.failures >= self.max_read_failures:
+            print(f"Video: Error: Could not read frames from camera {camera.name}, recording without it")
+            camera.active = False
+            camera.worker.queue.close()
+
+    def _deliver(self, camera, image, monotonic, timestamp):
+        camera.failures = 0
+        camera.worker.put(Frame(camera.captured, timestamp, monotonic, image))
+        camera.captured += 1
+        if camera.preview is not None:
+            camera.preview.show(image)
+
+    def _round(self):
+        """Latch and decode one frame per active camera; returns the latch times of the cameras that grabbed"""
+        cameras = [c for c in self.cameras if c.active]
+        latched = []
+        if self.grab_first:
+            for camera in cameras:
+                ok = camera.capture.grab()
+                latched.append((camera, ok, time.monotonic(), time.time()))
+            for camera, ok, monotonic, timestamp in latched:
+                if ok:
+                    ok, image = camera.capture.retrieve()
+                if ok:
+                    self._deliver(camera, image, monotonic, timestamp)
+                else:
+                    self._failed(camera)
+        else:
+            for camera in cameras:
+                ok = camera.capture.grab()
+                monotonic, timestamp = time.monotonic(), time.time()
+                if ok:
+                    ok, image = camera.capture.retrieve()
+                latched.append((camera, ok, monotonic, timestamp))
+                if ok:
+                    self._deliver(camera, image, monotonic, timestamp)
+                else:
+                    self._failed(camera)
+        return [monotonic for _, ok, monotonic, _ in latched if ok], len(cameras)
+
+    def _capture_loop(self):
+        period = 1.0 / self.fps
+        try:
+            while not self.stopping.is_set():
+                times, active = self._round()
+                if not active:
+                    break
+                self.rounds += 1
+                if len(times) == active:
+                    if active > 1:
+                        self.skews.append(max(times) - min(times))
+                else:
+                    self.partial_rounds += 1
+                    if not times:
+                        time.sleep(period / 2)
+        except Exception as e:
+            self.error = e
+            print(f"Video: Error during capture: {e}")
+        finally:
+            self.stopping.set()
+
+    def run(self, stop_event):
+        """
+        Record until stop_event is set, 'q' is pressed in a preview or every camera fails
+
+        Returns:
+            dict: stats()
+        """
+        self.started = time.monotonic()
+        for camera in self.cameras:
+            camera.worker.start()
+            if camera.preview is not None:
+                camera.preview.start()
+        capture_thread = threading.Thread(target=self._capture_loop, name="Video-capture", daemon=True)
+        capture_thread.start()
+        try:
+            while not self.stopping.is_set() and not stop_event.is_set():
+                stop_event.wait(0.1)
+        finally:
+            self.stopping.set()
+            capture_thread.join()
+            for camera in self.cameras:
+                if camera.preview is not None:
+                    camera.preview.close()
+            # Each worker drains its queued frames before it exits
+            for camera in self.cameras:
+                camera.worker.close()
+            self.finished = time.monotonic()
+        return self.stats()
+
+    def skew_stats(self):
+        """Latch spread per round in ms: mean, median, p95, max and the rounds above max_skew"""
+        if not self.skews:
+            return {'rounds': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0, 'desynced': 0}
+        skews = np.frombuffer(self.skews, dtype=np.float64) * 1e3
+        return {
+            'rounds': len(skews),
+            'mean_ms': round(float(skews.mean()), 3),
+            'p50_ms': round(float(np.percentile(skews, 50)), 3),
+            'p95_ms': round(float(np.percentile(skews, 95)), 3),
+            'max_ms': round(float(skews.max()), 3),
+            'desynced': int(np.count_nonzero(skews > self.max_skew * 1e3)),
+        }
+
+    def stats(self):
+        elapsed = ((self.finished or time.monotonic()) - self.started) if self.started else 0.0
+        return {
+            'seconds': round(elapsed, 2),
+            'rounds': self.rounds,
+            'partial_rounds': self.partial_rounds,
+            'skew': self.skew_stats(),
+            'cameras': {camera.name: camera.stats(elapsed) for camera in self.cameras},
+        }
+
+    def summary(self):
+        s = self.stats()
+        skew = s['skew']
+        lines = [f"{len(self.cameras)} cameras, {s['rounds']} rounds in {s['seconds']} s, "
+                 f"skew mean {skew['mean_ms']} ms / p95 {skew['p95_ms']} ms / max {skew['max_ms']} ms, "
+                 f"{skew['desynced']} rounds above {self.max_skew * 1e3:.1f} ms, {s['partial_rounds']} partial"]
+        for name, c in s['cameras'].items():
+            lines.append(f"  {name}: {c['captured']} captured ({c['capture_fps']} fps), {c['encoded']} written "
+                         f"({c['repeated']} repeated, {c['skipped']} skipped), dropped {c['dropped_encode']}, "
+                         f"{c['late']} late, {c['read_failures']} read failures")
+        return "\n".join(lines)
+
+
+class SyntheticCamera:
+    """
+    Free-running camera stand-in with grab()/retrieve()
+
+    The sensor completes a frame every 1/fps s, offset by phase; the
+    driver keeps only the newest one. grab() latches it (waiting for the
+    next one if it was already latched), retrieve() costs decode_cost s
+    like an MJPEG decode, and exposure is the true capture time of the
+    latched frame, for checking measured skew against the ground truth.
+    """
+
+    def __init__(self, width=640, height=360, fps=30.0, phase=0.0, decode_cost=0.004, seed=0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.phase = phase
+        self.decode_cost = decode_cost
+        self.start = time.monotonic()
+        self.latched = -1
+        self.exposure = None
+        self.lost = 0
+        self.image = np.random.default_rng(seed).integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+    def _frame_time(self, n):
+        return self.start + self.phase + n / self.fps
+
+    def grab(self):
+        newest = int((time.monotonic() - self.start - self.phase) * self.fps)
+        if newest <= self.latched:
+            newest = self.latched + 1
+            time.sleep(max(0.0, self._frame_time(newest) - time.monotonic()))
+        self.lost += max(0, newest - self.latched - 1)
+        self.latched = newest
+        self.exposure = self._frame_time(newest)
+        return True
+
+    def retrieve(self):
+        time.sleep(self.decode_cost)
+        return True, self.image.copy()
+
+    def read(self):
+        self.grab()
+        return self.retrieve()
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FRAME_WIDTH: self.width, cv2.CAP_PROP_FRAME_HEIGHT: self.height,
+                cv2.CAP_PROP_FPS: self.fps}.get(prop, 0.0)
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        pass
+
+
+def open_camera(index, width=1280, height=720):
+    """
+    cv2.VideoCapture in the requested (or native) size from the camera cache
+
+    The camera runs in the verified cached or probed mode; nothing is set
+    on it afterwards, since a later CAP_PROP_FPS can switch drivers to
+    another mode than the one checked.
+
+    Returns:
+        tuple: (capture, config) as camera_cache.open_camera_cached, or
+        (None, None) if it does not open
+    """
+    return open_camera_cached(index, width, height)
+
+
+def record_cameras(stop_event, cameras=None, width=1280, height=720, fps=None, frame_counter=False, encoder='auto',
+                   segment_seconds=300, preview=False, prefix="video"):
+    """
+    Record several cameras into <prefix>_<name>_<time>_NNN.<ext> with frame indexes
+
+    Args:
+        stop_event: Event to signal when to stop
+        cameras (dict): name -> camera index, e.g. {'face': 0, 'hands': 1, 'workspace': 2}
+        width, height (int): Requested resolution (each camera may use its own)
+        fps (float): Output frame rate (default: the lowest rate the cameras
+            were measured to deliver in their cached mode, or 30)
+        frame_counter (bool), encoder (str), segment_seconds (float): As record_video
+        preview (bool): Small preview window per camera
+    """
+    cameras = cameras or {'cam0': 0}
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    captures, configs, writers, indexes, overlays = {}, {}, {}, {}, {}
+    try:
+        for name, index in cameras.items():
+            cap, config = open_camera(index, width, height)
+            if cap is not None:
+                captures[name], configs[name] = cap, config
+        if not captures:
+            return None
+        rates = {name: config['fps'] for name, config in configs.items()}
+        if fps:
+            for name, rate in rates.items():
+                if 0 < rate < 0.95 * fps:
+                    print(f"Video: Warning: {name} delivers {rate} fps in its {configs[name]['width']}x"
+                          f"{configs[name]['height']} mode, below the requested {fps} fps")
+        fps = fps or min((r for r in rates.values() if r > 0), default=30)
+
+        for name, cap in captures.items():
+            w, h = configs[name]['width'], configs[name]['height']
+            base = f"{prefix}_{name}_{timestamp}"
+            writers[name] = open_encoder(base, w, h, fps, backend=encoder, segment_seconds=segment_seconds)
+            indexes[name] = FrameIndexWriter(f"{base}.fidx", fps, w, h, writers[name].segment_frames,
+                                             writers[name].pattern, metadata={'camera': name, 'device': cameras[name]})
+            overlays[name] = TimestampOverlay(frame_counter=frame_counter)
+            print(f"Video: {name} (camera {cameras[name]}) {w}x{h} -> {writers[name].pattern} "
+                  f"({writers[name].backend} encoder)")
+
+        recorder = MultiCameraRecorder(captures, writers, fps, indexes, overlays, preview=preview)
+        print(f"Video: Recording {len(captures)} cameras at {fps} fps")
+        stats = recorder.run(stop_event)
+        print(f"Video: {recorder.summary()}")
+        return stats
+
+    except Exception as e:
+        print(f"Video: Error during multi-camera recording: {e}")
+
+    finally:
+        for writer in writers.values():
+            writer.release()
+        for index in indexes.values():
+            index.close()
+            print(f"Video: {FrameIndex(index.filename).summary()}")
+        for cap in captures.values():
+            cap.release()
+
+
+def _run_synthetic(cameras, writers, seconds, fps=30.0, **options):
+    recorder = MultiCameraRecorder(cameras, writers, fps, **options)
+    exposures = []
+    original = recorder._round
+
+    def round_with_exposures():
+        result = original()
+        exposures.append([c.exposure for c in cameras.values()])
+        return result
+    recorder._round = round_with_exposures
+
+    stop_event = threading.Event()
+    threading.Timer(seconds, stop_event.set).start()
+    stats = recorder.run(stop_event)
+    spread = np.ptp(np.array(exposures[1:]), axis=1) * 1e3
+    stats['exposure_skew_p95_ms'] = round(float(np.percentile(spread, 95)), 3)
+    return recorder, stats
+
+
+def _self_test(seconds=3.0, fps=30.0):
+    """Synthetic cameras: latch skew of grab-first vs serial read, encode scaling and real output files"""
+    from video_pipeline import _SlowWriter
+    phases = (0.0, 0.004, 0.009)   # free-running sensors: the latch spread cannot go below 9 ms
+    decode_cost = 0.006
+
+    def cameras():
+        return {f"cam{i}": SyntheticCamera(fps=fps, phase=phase, decode_cost=decode_cost, seed=i)
+                for i, phase in enumerate(phases)}
+
+    results = {}
+    for grab_first in (False, True):
+        cams = cameras()
+        writers = {name: _SlowWriter(cost=0.001, stall=0) for name in cams}
+        recorder, stats = _run_synthetic(cams, writers, seconds, fps, grab_first=grab_first)
+        results[grab_first] = stats
+        skew = stats['skew']
+        print(f"Video: {'grab/retrieve' if grab_first else 'serial read':<13} latch skew mean {skew['mean_ms']:.2f} "
+              f"ms, p95 {skew['p95_ms']:.2f} ms, max {skew['max_ms']:.2f} ms; exposure skew p95 "
+              f"{stats['exposure_skew_p95_ms']:.2f} ms")
+    # Serial reads add the decodes of the earlier cameras to the spread
+    assert results[True]['skew']['mean_ms'] < results[False]['skew']['mean_ms'] - decode_cost * 1e3, results
+
+    # Encoders far slower than one frame each: serialized they could not keep up (3 x 25 ms > 33 ms)
+    cams = cameras()
+    writers = {name: _SlowWriter(cost=0.025, stall=0) for name in cams}
+    recorder, stats = _run_synthetic(cams, writers, seconds, fps)
+    print(f"Video: 3 encoders at 25 ms/frame, one thread each:\n{recorder.summary()}")
+    for name, c in stats['cameras'].items():
+        assert c['capture_fps'] > 0.9 * fps and c['dropped_encode'] == 0, (name, c)
+        assert c['encoded'] >= c['captured'] - 1, (name, c)
+
+    # Real encoder and frame index files
+    directory = tempfile.mkdtemp(prefix="multi_camera_")
+    try:
+        cams = cameras()
+        writers, indexes = {}, {}
+        for name in cams:
+            base = os.path.join(directory, name)
+            writers[name] = open_encoder(base, 640, 360, fps, backend='cv2', segment_seconds=1, fourcc='MJPG')
+            indexes[name] = FrameIndexWriter(f"{base}.fidx", fps, 640, 360, writers[name].segment_frames,
+                                             writers[name].pattern)
+        overlays = {name: TimestampOverlay(frame_counter=True) for name in cams}
+        recorder, stats = _run_synthetic(cams, writers, seconds, fps, frame_indexes=indexes, overlays=overlays)
+        for name in cams:
+            writers[name].release()
+            indexes[name].close()
+            index = FrameIndex(indexes[name].filename)
+            assert len(index) == writers[name].frames == stats['cameras'][name]['encoded'], name
+            assert len(writers[name].files) == int(np.ceil(len(index) / fps)), writers[name].files
+            print(f"Video: {index.summary()}, {len(writers[name].files)} segments")
+        # Frames from the same round are matched across cameras by capture time
+        first = FrameIndex(indexes['cam0'].filename)
+        other = FrameIndex(indexes['cam2'].filename)
+        matched = other.frames_at(np.array([first.time_of(i) for i in range(len(first))]))
+        assert np.all(np.abs(matched - np.arange(len(first))) <= 1), matched
+    finally:
+        shutil.rmtree(directory)
+    print("Video: multi-camera self-test passed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record several cameras with one encoder thread each")
+    parser.add_argument('cameras', nargs='*', help="name=index (e.g. face=0 hands=1) or camera indices")
+    parser.add_argument('--fps', type=float, default=None)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--encoder', default='auto', choices=('auto', 'ffmpeg', 'cv2'))
+    parser.add_argument('--preview', action='store_true', help="Small preview window per camera")
+    parser.add_argument('--self-test', action='store_true', help="Run the synthetic camera test")
+    args = parser.parse_args()
+    if args.self_test or not args.cameras:
+        _self_test()
+        return
+
+    cameras = {}
+    for spec in args.cameras:
+        name, _, index = spec.rpartition('=')
+        cameras[name or f"cam{index}"] = int(index)
+    stop_event = threading.Event()
+    thread = threading.Thread(target=record_cameras, name="Video",
+                              args=(stop_event, cameras, args.width, args.height, args.fps),
+                              kwargs={'encoder': args.encoder, 'preview': args.preview})
+    thread.start()
+    print("Press Enter to stop recording")
+    try:
+        input()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+import asyncio
+from datetime import datetime
+import numpy as np
+from scipy.signal import butter, sosfilt, sosfilt_zi
+
+# Polar Measurement Data (PMD) service
+PMD_SERVICE = "fb005c80-02e7-f387-1cad-8acd2d8df0c8"
+PMD_CONTROL = "fb005c81-02e7-f387-1cad-8acd2d8df0c8"  # write + indicate
+PMD_DATA = "fb005c82-02e7-f387-1cad-8acd2d8df0c8"     # notify
+
+# Measurement types and control point opcodes
+ECG = 0x00
+ACC = 0x02
+MEASUREMENT_NAMES = {ECG: 'ecg', ACC: 'acc'}
+OP_GET_SETTINGS = 0x01
+OP_START = 0x02
+OP_STOP = 0x03
+CONTROL_RESPONSE = 0xF0
+PMD_ERRORS = {
+    0: 'success', 1: 'invalid op code', 2: 'invalid measurement type', 3: 'not supported',
+    4: 'invalid length', 5: 'invalid parameter', 6: 'already in state', 7: 'invalid resolution',
+    8: 'invalid sample rate', 9: 'invalid range', 10: 'invalid MTU', 11: 'invalid number of channels',
+    12: 'invalid state', 13: 'device in charger',
+}
+
+# Settings: (setting type, uint16 value) pairs
+SETTING_SAMPLE_RATE = 0x00
+SETTING_RESOLUTION = 0x01
+SETTING_RANGE = 0x02
+ECG_SETTINGS = {SETTING_SAMPLE_RATE: 130, SETTING_RESOLUTION: 14}
+ACC_SETTINGS = {SETTING_SAMPLE_RATE: 200, SETTING_RESOLUTION: 16, SETTING_RANGE: 8}
+SAMPLE_RATES = {ECG: 130, ACC: 200}
+
+POLAR_EPOCH_NS = 946684800 * 10**9  # Sensor timestamps count from 2000-01-01
+HEADER_SIZE = 10                    # type, uint64 timestamp (ns), frame type
+
+# ACC frame type -> bytes per axis (uncompressed frames)
+ACC_FRAME_BYTES = {0x00: 1, 0x01: 2, 0x02: 3}
+
+# PMD data frames in the H10 layout with their expected decode
+PMD_FIXTURES = [
+    # ECG, frame type 0, four int24 samples in uV (positive, negative, extremes)
+    ('00' + '00e40b5402c4c40a' + '00' + '2c0100' + 'd4feff' + 'ffff7f' + '000080',
+     {'type': ECG, 'timestamp_ns': 0x0ac4c402540be400, 'samples': [300, -300, 8388607, -8388608]}),
+    # ACC, frame type 1, two samples of (x, y, z) int16 in mG
+    ('02' + '00e40b5402c4c40a' + '01' + 'e8030000f0fc' + '0b00f5ffe803',
+     {'type': ACC, 'timestamp_ns': 0x0ac4c402540be400, 'samples': [[1000, 0, -784], [11, -11, 1000]]}),
+    # ACC, frame type 0, one sample of int8 axes
+    ('02' + '00e40b5402c4c40a' + '00' + '7f80ff',
+     {'type': ACC, 'timestamp_ns': 0x0ac4c402540be400, 'samples': [[127, -128, -1]]}),
+]
+CONTROL_FIXTURES = [
+    ('f00200000000', {'op': OP_START, 'type': ECG, 'error': 0}),
+    ('f0020206', {'op': OP_START, 'type': ACC, 'error': 6}),
+]
+
+
+def start_command(measurement, settings):
+    """Control point command that starts a stream with the given settings"""
+    command = bytearray([OP_START, measurement])
+    for setting, value in settings.items():
+        command += bytes([setting, 1]) + int(value).to_bytes(2, 'little')
+    return bytes(command)
+
+
+def stop_command(measurement):
+    return bytes([OP_STOP, measurement])
+
+
+def parse_control_response(data):
+    """Decode a control point indication: {'op', 'type', 'error', 'parameters'}"""
+    data = bytes(data)
+    if len(data) < 4 or data[0] != CONTROL_RESPONSE:
+        raise ValueError(f"Not a PMD control point response: {data.hex()}")
+    return {'op': data[1], 'type': data[2], 'error': data[3], 'parameters': data[5:]}
+
+
+def _signed(values, bits):
+    """Sign-extend unsigned integer arrays holding `bits`-bit two's complement values"""
+    sign = 1 << (bits - 1)
+    return (values ^ sign) - sign
+
+
+def unpack_int24(payload):
+    """Little-endian int24 samples -> int32 array, without a per-sample loop"""
+    raw = np.frombuffer(payload, dtype=np.uint8)
+    raw = raw[:len(raw) - len(raw) % 3].reshape(-1, 3).astype(np.int32)
+    return _signed(raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16), 24)
+
+
+def decode_pmd_frame(data):
+    """
+    Decode one PMD data notification
+
+    Returns:
+        dict: type (ECG/ACC), timestamp_ns (sensor clock, time of the last
+        sample), frame_type and samples (int32: (n,) ECG in uV, (n, 3) ACC in mG)
+    """
+    data = bytes(data)
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f"PMD frame too short ({len(data)} bytes)")
+    measurement = data[0]
+    timestamp = int.from_bytes(data[1:9], 'little')
+    frame_type = data[9]
+    payload = data[HEADER_SIZE:]
+    if frame_type & 0x80:
+        raise ValueError(f"Compressed PMD frame type 0x{frame_type:02x} is not supported")
+
+    if measurement == ECG and frame_type == 0x00:
+        samples = unpack_int24(payload)
+    elif measurement == ACC and frame_type in ACC_FRAME_BYTES:
+        width = ACC_FRAME_BYTES[frame_type]
+        if width == 3:
+            samples = unpack_int24(payload).reshape(-1, 3)
+        else:
+            dtype = '<i1' if width == 1 else '<i2'
+            usable = len(payload) - len(payload) % (3 * width)
+            samples = np.frombuffer(payload[:usable], dtype=dtype).reshape(-1, 3).astype(np.int32)
+    else:
+        raise ValueError(f"Unsupported PMD frame: type {measurement}, frame type {frame_type}")
+    return {'type': measurement, 'timestamp_ns': timestamp, 'frame_type': frame_type, 'samples': samples}
+
+
+def sample_times_ns(timestamp_ns, n, sampling_rate):
+    """Sensor time of each sample; the frame timestamp is the last sample"""
+    return timestamp_ns - ((n - 1 - np.arange(n)) * (1e9 / sampling_rate)).astype(np.int64)
+
+
+class RPeakDetector:
+    """
+    Streaming R-peak detector for 130 Hz H10 ECG (Pan-Tompkins style)
+
+    Band-pass 5-15 Hz, squared derivative, 150 ms moving integration,
+    and an adaptive threshold at half the running R energy. A candidate
+    is confirmed once the refractory period (250 ms) has passed without a
+    larger one; its position is then refined to the maximum of the
+    band-passed signal in the integration window.
+    """
+
+    def __init__(self, sampling_rate=130, refractory=0.25, integration=0.15, learning_seconds=2.0):
+        self.fs = sampling_rate
+        self.sos = butter(2, [5, 15], btype='bandpass', fs=sampling_rate, output='sos')
+        self.zi = None
+        self.window = max(1, int(round(integration * sampling_rate)))
+        self.refractory = int(round(refractory * sampling_rate))
+        self.learning = int(learning_seconds * sampling_rate)
+        history = self.window + self.refractory + 2
+        self.filtered_tail = np.zeros(history)
+        self.energy_tail = np.zeros(self.window)
+        self.last_filtered = 0.0
+        self.processed = 0
+        self.signal_level = None
+        self.learning_max = 0.0
+        self.candidate = None   # (index, energy)
+        self.last_peak = None
+        self.peaks = 0
+
+    def process(self, ecg):
+        """
+        Feed a block of ECG samples
+
+        Returns:
+            list: (sample index, RR interval in ms or None) per confirmed R peak
+        """
+        x = np.asarray(ecg, dtype=np.float64)
+        if len(x) == 0:
+            return []
+        if self.zi is None:
+            self.zi = sosfilt_zi(self.sos) * x[0]
+        filtered, self.zi = sosfilt(self.sos, x, zi=self.zi)
+
+        derivative = np.diff(filtered, prepend=self.last_filtered)
+        self.last_filtered = filtered[-1]
+        squared = np.concatenate([self.energy_tail, derivative ** 2])
+        cumulative = np.cumsum(squared)
+        energy = (cumulative[self.window:] - cumulative[:-self.window]) / self.window
+        self.energy_tail = squared[-self.window:]
+
+        history = np.concatenate([self.filtered_tail, filtered])
+        offset = self.processed - len(self.filtered_tail)  # sample index of history[0]
+        start = self.processed
+        self.processed += len(x)
+        self.filtered_tail = history[-len(self.filtered_tail):]
+
+        if self.signal_level is None:
+            # Learn the R energy from the first seconds before detecting
+            learned = start + len(x) >= self.learning
+            self.learning_max = max(self.learning_max, float(energy.max()))
+            if not learned:
+                return []
+            self.signal_level = self.learning_max
+
+        peaks = []
+        threshold = 0.5 * self.signal_level
+        for i in np.flatnonzero(energy > threshold).tolist() + [None]:
+            index = start + i if i is not None else self.processed
+            if self.candidate is not None and index - self.candidate[0] > self.refractory:
+                peaks.append(self._confirm(history, offset))
+                threshold = 0.5 * self.signal_level
+            if i is None or energy[i] <= threshold:
+                continue
+            if self.last_peak is not None and index - self.last_peak <= self.refractory:
+                continue
+            if self.candidate is None or energy[i] > self.candidate[1]:
+                self.candidate = (index, float(energy[i]))
+        return peaks
+
+    def _confirm(self, history, offset):
+        index, value = self.candidate
+        self.candidate = None
+        self.signal_level = 0.875 * self.signal_level + 0.125 * value
+        # The integrated energy lags the R wave; find the band-passed maximum
+        lo = max(index - self.window - offset, 0)
+        hi = index - offset + 1
+        r_index = offset + lo + int(np.argmax(history[lo:hi]))
+        rr = None if self.last_peak is None else (r_index - self.last_peak) * 1000 / self.fs
+        self.last_peak = r_index
+        self.peaks += 1
+        return r_index, rr
+
+
+class PolarPmdStreams:
+    """
+    ECG/ACC streaming over PMD for a connected Polar H10
+
+    data_callback and control_callback are the notification handlers for
+    PMD_DATA and PMD_CONTROL; start() negotiates the streams. Decoded
+    samples go to the sinks as rows:
+        ECG: timestamp, sensor_time_ns, ecg_uv
+        ACC: timestamp, sensor_time_ns, x_mg, y_mg, z_mg
+        R peaks: timestamp, sensor_time_ns, rr_ms
+    Host timestamps are the sensor clock anchored to the host clock at the
+    first frame.
+    """
+
+    ECG_HEADER = ['timestamp', 'sensor_time_ns', 'ecg_uv']
+    ACC_HEADER = ['timestamp', 'sensor_time_ns', 'x_mg', 'y_mg', 'z_mg']
+    PEAK_HEADER = ['timestamp', 'sensor_time_ns', 'rr_ms']
+
+    def __init__(self, ecg_sink=None, acc_sink=None, peak_sink=None, detector=None):
+        self.sinks = {ECG: ecg_sink, ACC: acc_sink}
+        self.peak_sink = peak_sink
+        self.detector = detector or RPeakDetector(SAMPLE_RATES[ECG])
+        self.ecg_times = []   # sensor times not yet matched to confirmed peaks
+        self.responses = asyncio.Queue()
+        self.anchor = None
+        self.samples = {ECG: 0, ACC: 0}
+        self.errors = 0
+
+    def control_callback(self, sender, data):
+        try:
+            self.responses.put_nowait(parse_control_response(data))
+        except ValueError as e:
+            print(f"HR: ⚠️ PMD: {e}")
+
+    def data_callback(self, sender, data):
+        try:
+            frame = decode_pmd_frame(data)
+        except ValueError as e:
+            self.errors += 1
+            print(f"HR: ⚠️ PMD: {e}")
+            return
+        measurement, samples = frame['type'], frame['samples']
+        times = sample_times_ns(frame['timestamp_ns'], len(samples), SAMPLE_RATES[measurement])
+        self.samples[measurement] += len(samples)
+        stamps = self._host_timestamps(times)
+
+        sink = self.sinks.get(measurement)
+        if sink is not None:
+            columns = [stamps, times.tolist()]
+            columns += [samples.tolist()] if samples.ndim == 1 else [c.tolist() for c in samples.T]
+            sink.writerows(zip(*columns))
+        if measurement == ECG:
+            self._detect(samples, times)
+
+    def _host_timestamps(self, times):
+        if self.anchor is None:
+            self.anchor = (np.datetime64(datetime.now(), 'ns'), int(times[-1]))
+        host = self.anchor[0] + (times - self.anchor[1]).astype('timedelta64[ns]')
+        return np.datetime_as_string(host, unit='us').tolist()
+
+    def _detect(self, samples, times):
+        first = self.detector.processed
+        self.ecg_times.append((first, times))
+        for index, rr in self.detector.process(samples):
+            # Sensor time of the peak (it may belong to an earlier frame)
+            for start, block in self.ecg_times:
+                if start <= index < start + len(block):
+                    sensor_time = int(block[index - start])
+                    break
+            else:
+                continue
+            if self.peak_sink is not None:
+                self.peak_sink.write([self._host_timestamps(np.array([sensor_time]))[0], sensor_time,
+                                      '' if rr is None else round(rr, 1)])
+        # Keep only the frames a future (refined) peak can fall into
+        horizon = self.detector.processed - len(self.detector.filtered_tail)
+        self.ecg_times = [(s, b) for s, b in self.ecg_times if s + len(b) > horizon]
+
+    async def _command(self, client, command, timeout=5.0):
+        await client.write_gatt_char(PMD_CONTROL, command, response=True)
+        response = await asyncio.wait_for(self.responses.get(), timeout)
+        if response['error'] not in (0, 6):  # 6: already streaming, e.g. after a reconnect
+            name = MEASUREMENT_NAMES.get(command[1], command[1])
+            raise RuntimeError(f"PMD {name}: {PMD_ERRORS.get(response['error'], response['error'])}")
+        return response
+
+    async def start(self, client, characteristics=None):
+        """Start the streams that have a sink (ECG also when only R peaks are wanted)"""
+        if self.sinks[ECG] is not None or self.peak_sink is not None:
+            await self._command(client, start_command(ECG, ECG_SETTINGS))
+            print("HR: 📡 PMD ECG streaming at 130 Hz")
+        if self.sinks[ACC] is not None:
+            await self._command(client, start_command(ACC, ACC_SETTINGS))
+            print("HR: 📡 PMD ACC streaming at 200 Hz")
+
+    def summary(self):
+        return (f"{self.samples[ECG]} ECG samples, {self.samples[ACC]} ACC samples, "
+                f"{self.detector.peaks} R peaks, {self.errors} bad frames")
+
+
+def add_pmd_streams(device, ecg_sink=None, acc_sink=None, peak_sink=None):
+    """
+    Add PMD ECG/ACC streaming to the ble_manager.BleDevice of a Polar H10
+
+    The streams share the connection used for heart rate and are
+    renegotiated after every reconnect.
+
+    Returns:
+        PolarPmdStreams
+    """
+    streams = PolarPmdStreams(ecg_sink, acc_sink, peak_sink)
+    device.notify += [(PMD_CONTROL, streams.control_callback), (PMD_DATA, streams.data_callback)]
+    device.on_connect.append(streams.start)
+    return streams
+
+
+def _synthetic_ecg(fs, seconds, rng):
+    """ECG-like signal (uV): QRS spikes with varying RR, T waves, wander and noise"""
+    rr = 0.8 + 0.05 * np.sin(np.arange(int(seconds)) / 3) + rng.normal(0, 0.01, int(seconds))
+    beats = np.cumsum(rr)
+    beats = beats[beats < seconds - 1]
+    t = np.arange(int(seconds * fs)) / fs
+    ecg = 150 * np.sin(2 * np.pi * 0.2 * t) + rng.normal(0, 15, len(t))
+    for beat in beats:
+        ecg += 1200 * np.exp(-0.5 * ((t - beat) / 0.012) ** 2)
+        ecg -= 250 * np.exp(-0.5 * ((t - beat - 0.03) / 0.015) ** 2)
+        ecg += 300 * np.exp(-0.5 * ((t - beat - 0.25) / 0.05) ** 2)
+    return ecg, np.round(beats * fs).astype(int)
+
+
+def _self_test():
+    """Frame fixtures, control responses, and synthetic ECG and ACC streamed through add_pmd_streams"""
+    from ble_manager import BleDevice
+    for payload, expected in PMD_FIXTURES:
+        frame = decode_pmd_frame(bytes.fromhex(payload))
+        assert frame['type'] == expected['type'] and frame['timestamp_ns'] == expected['timestamp_ns']
+        assert frame['samples'].tolist() == expected['samples'], (payload, frame['samples'].tolist())
+    for payload, expected in CONTROL_FIXTURES:
+        response = parse_control_response(bytes.fromhex(payload))
+        assert all(response[key] == value for key, value in expected.items()), response
+    assert start_command(ECG, ECG_SETTINGS).hex() == '02000001820001010e00'
+    assert start_command(ACC, ACC_SETTINGS).hex() == '02020001c8000101100002010800'
+
+    fs = SAMPLE_RATES[ECG]
+    rng = np.random.default_rng(3)
+    ecg, beats = _synthetic_ecg(fs, 120, rng)
+    samples = np.round(ecg).astype(np.int32)
+    # ACC in mG: gravity on z plus movement, and the +-8 G range limits in the first frame
+    t = np.arange(120 * SAMPLE_RATES[ACC]) / SAMPLE_RATES[ACC]
+    acc = np.stack([300 * np.sin(2 * np.pi * 0.5 * t), -200 * np.cos(2 * np.pi * 1.3 * t),
+                    1000 + rng.normal(0, 20, len(t))], axis=1).round().astype(np.int32)
+    acc[:2] = [[-8000, 8000, -1], [7999, -7999, 0]]
+
+    class Rows:
+        def __init__(self):
+            self.rows = []
+
+        def write(self, row):
+            self.rows.append(row)
+
+        def writerows(self, rows):
+            self.rows.extend(rows)
+
+    class Client:
+        """Answers every PMD start command with success, as the H10 does"""
+        def __init__(self):
+            self.commands = []
+
+        async def write_gatt_char(self, uuid, command, response=None):
+            self.commands.append(bytes(command))
+            callbacks[PMD_CONTROL](None, bytes([CONTROL_RESPONSE, OP_START, command[1], 0]))
+
+    ecg_rows, acc_rows, peak_rows = Rows(), Rows(), Rows()
+    device = BleDevice('HR', 'AA:BB:CC:DD:EE:FF')
+    streams = add_pmd_streams(device, ecg_rows, acc_rows, peak_rows)
+    callbacks = dict(device.notify)
+    client = Client()
+    asyncio.run(device.on_connect[0](client, None))
+    assert client.commands == [start_command(ECG, ECG_SETTINGS), start_command(ACC, ACC_SETTINGS)]
+
+    # Frames as the H10 sends them (73 ECG samples, 36 ACC samples of frame type 1), in arrival order
+    packets = []
+    timestamp = 10**12
+    for i in range(0, len(samples), 73):
+        block = samples[i:i + 73]
+        timestamp += int(len(block) * 1e9 / fs)
+        raw = (block.astype(np.int64) & 0xFFFFFF).astype('<u4').view(np.uint8).reshape(-1, 4)[:, :3]
+        packets.append((timestamp, bytes([ECG]) + timestamp.to_bytes(8, 'little') + b'\x00' + raw.tobytes()))
+    acc_start = timestamp = 10**12 + 3 * 10**6
+    for i in range(0, len(acc), 36):
+        block = acc[i:i + 36]
+        timestamp += int(len(block) * 1e9 / SAMPLE_RATES[ACC])
+        packets.append((timestamp, bytes([ACC]) + timestamp.to_bytes(8, 'little') + b'\x01'
+                        + block.astype('<i2').tobytes()))
+    for _, packet in sorted(packets, key=lambda p: p[0]):
+        callbacks[PMD_DATA](None, packet)
+
+    assert [row[2] for row in ecg_rows.rows] == samples.tolist()
+    assert streams.samples[ACC] == len(acc) == len(acc_rows.rows), streams.summary()
+    assert [list(row[2:]) for row in acc_rows.rows] == acc.tolist()
+    sensor_times = np.array([row[1] for row in acc_rows.rows])
+    assert sensor_times[0] == acc_start + 5 * 10**6 and set(np.diff(sensor_times)) == {5 * 10**6}
+    host_times = np.array([row[0] for row in acc_rows.rows], dtype='datetime64[us]')
+    assert set(np.diff(host_times).astype(int)) == {5000}, "ACC host timestamps are not 200 Hz"
+    detected = np.array([(row[1] - (10**12 + int(1e9 / fs))) for row in peak_rows.rows]) / 1e9 * fs
+    learning = beats[beats >= streams.detector.learning + fs]
+    matched = [np.min(np.abs(detected - b)) <= 2 for b in learning]
+    assert all(matched), f"{len(learning) - sum(matched)} beats missed"
+    assert len(detected) <= len(beats), "False positives"
+    rr = [row[2] for row in peak_rows.rows[1:]]
+    print(f"HR: PMD self-test passed: {streams.summary()}, RR {np.mean(rr):.0f} ± {np.std(rr):.0f} ms")
+
+
+if __name__ == "__main__":
+    _self_test()
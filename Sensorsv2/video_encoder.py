@@ -0,0 +1,238 @@
+import os
+import shutil
+import subprocess
+import threading
+import time
+import cv2
+import numpy as np
+
+# Container used by cv2.VideoWriter for each fourcc
+FOURCC_EXTENSIONS = {'mp4v': 'mp4', 'avc1': 'mp4', 'XVID': 'avi', 'MJPG': 'avi'}
+
+
+class CvEncoder:
+    """cv2.VideoWriter behind the encoder interface (write/release/filename)"""
+
+    def __init__(self, filename, width, height, fps, fourcc='mp4v'):
+        self.filename = filename
+        self.size = (width, height)
+        self.writer = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*fourcc), fps, self.size)
+        if not self.writer.isOpened():
+            raise RuntimeError(f"cv2.VideoWriter could not open {filename} with {fourcc}")
+        self.frames = 0
+
+    def write(self, image):
+        self.writer.write(image)
+        self.frames += 1
+
+    def release(self):
+        self.writer.release()
+
+
+class FfmpegEncoder:
+    """
+    Pipe raw BGR frames to an ffmpeg subprocess
+
+    Encoding runs in ffmpeg's own process (and threads), so it does not
+    compete with capture for the GIL. MP4 output is fragmented by default:
+    if the session crashes, everything up to the last fragment is still
+    playable.
+
+    Args:
+        codec (str): ffmpeg video codec (libx264, libx265, h264_nvenc, ...)
+        preset (str), crf (int): Speed/quality settings (None to omit)
+        pix_fmt (str): Output pixel format (yuv420p plays everywhere)
+        ffmpeg (str): Executable name or path
+        extra_args (list): Extra output options
+    """
+
+    def __init__(self, filename, width, height, fps, codec='libx264', preset='veryfast', crf=23,
+                 pix_fmt='yuv420p', ffmpeg='ffmpeg', fragmented=True, threads=None, extra_args=()):
+        self.filename = filename
+        self.shape = (height, width, 3)
+        command = [ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostats', '-y',
+                   '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', f'{fps}',
+                   '-i', '-', '-an', '-c:v', codec]
+        if preset is not None:
+            command += ['-preset', preset]
+        if crf is not None:
+            command += ['-crf', str(crf)]
+        if threads is not None:
+            command += ['-threads', str(threads)]
+        command += ['-pix_fmt', pix_fmt]
+        if fragmented and filename.endswith('.mp4'):
+            command += ['-movflags', '+frag_keyframe+empty_moov+default_base_moof']
+        command += list(extra_args) + [filename]
+        self.command = command
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.PIPE)
+        self.frames = 0
+
+    def write(self, image):
+        if image.shape != self.shape:
+            raise ValueError(f"Frame shape {image.shape} does not match the encoder's {self.shape}")
+        try:
+            self.process.stdin.write(np.ascontiguousarray(image).data)
+        except (BrokenPipeError, OSError):
+            raise RuntimeError(f"ffmpeg stopped: {self._error()}")
+        self.frames += 1
+
+    def _error(self):
+        self.process.wait()
+        message = self.process.stderr.read().decode(errors='replace').strip()
+        return message.splitlines()[-1] if message else f"exit code {self.process.returncode}"
+
+    def release(self):
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+        if self.process.wait() != 0:
+            print(f"Video: ⚠️ ffmpeg failed on {self.filename}: {self._error()}")
+
+
+class SegmentedWriter:
+    """
+    Rotate output into segments of a fixed number of frames
+
+    open_segment(index) returns the encoder of segment `index`. The next
+    segment is opened before the previous one is closed, and closing
+    (which waits for the encoder to flush) happens in a background thread,
+    so rotation does not stall the encoder stage.
+    """
+
+    def __init__(self, open_segment, segment_frames=None):
+        self.open_segment = open_segment
+        self.segment_frames = segment_frames
+        self.writer = None
+        self.files = []
+        self.frames = 0
+        self.closing = []
+
+    def write(self, image):
+        if self.writer is None or (self.segment_frames and self.writer.frames >= self.segment_frames):
+            self._rotate()
+        self.writer.write(image)
+        self.frames += 1
+
+    def _rotate(self):
+        previous = self.writer
+        self.writer = self.open_segment(len(self.files))
+        self.files.append(self.writer.filename)
+        if previous is not None:
+            closer = threading.Thread(target=previous.release, name="Video-segment-close", daemon=True)
+            closer.start()
+            self.closing.append(closer)
+
+    def release(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+        for closer in self.closing:
+            closer.join()
+        self.closing = []
+
+    def isOpened(self):
+        return True
+
+
+def ffmpeg_available(ffmpeg='ffmpeg'):
+    return shutil.which(ffmpeg) is not None
+
+
+def open_encoder(base_name, width, height, fps, backend='auto', segment_seconds=None, codec='libx264',
+                 preset='veryfast', crf=23, ffmpeg='ffmpeg', fourcc='mp4v', extension=None, **ffmpeg_options):
+    """
+    Encoder for a recording, optionally split into fixed-duration segments
+
+    Args:
+        base_name (str): Output name without extension; segments are
+            <base_name>_000.<ext>, <base_name>_001.<ext>, ...
+        backend (str): 'ffmpeg', 'cv2', or 'auto' (ffmpeg when installed)
+        segment_seconds (float): Segment duration, None for one file
+        codec, preset, crf: ffmpeg settings
+        fourcc (str): cv2.VideoWriter codec for the 'cv2' backend
+
+    Returns:
+        SegmentedWriter: write(image), release(), files, plus backend and
+        pattern (the file name, %03d standing for the segment number)
+    """
+    if backend == 'auto':
+        backend = 'ffmpeg' if ffmpeg_available(ffmpeg) else 'cv2'
+    if backend == 'ffmpeg':
+        if not ffmpeg_available(ffmpeg):
+            raise RuntimeError(f"{ffmpeg} not found; install ffmpeg or use backend='cv2'")
+        extension = extension or 'mp4'
+    elif backend == 'cv2':
+        extension = extension or FOURCC_EXTENSIONS.get(fourcc, 'avi')
+    else:
+        raise ValueError(f"Unknown encoder backend '{backend}' (expected 'auto', 'ffmpeg' or 'cv2')")
+
+    def open_segment(index):
+        filename = f"{base_name}_{index:03d}.{extension}" if segment_seconds else f"{base_name}.{extension}"
+        if backend == 'ffmpeg':
+            return FfmpegEncoder(filename, width, height, fps, codec, preset, crf, ffmpeg=ffmpeg, **ffmpeg_options)
+        return CvEncoder(filename, width, height, fps, fourcc)
+
+    segment_frames = int(round(segment_seconds * fps)) if segment_seconds else None
+    writer = SegmentedWriter(open_segment, segment_frames)
+    writer.backend = backend
+    writer.pattern = f"{base_name}_%03d.{extension}" if segment_seconds else f"{base_name}.{extension}"
+    return writer
+
+
+def _synthetic_frames(width, height, count):
+    """Moving gradient with a little noise: compresses like a real scene, unlike pure noise"""
+    y, x = np.mgrid[0:height, 0:width]
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 12, (height, width, 3), dtype=np.uint8)
+    for i in range(count):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[..., 0] = (x + 4 * i) % 256
+        frame[..., 1] = (y + 2 * i) % 256
+        frame[..., 2] = ((x + y) // 4 + i) % 256
+        frame += noise
+        yield frame
+
+
+def _benchmark(width=1280, height=720, fps=30, seconds=4, directory='encoder_benchmark'):
+    """CPU time, encode speed and file size per backend (segments of 2 s)"""
+    os.makedirs(directory, exist_ok=True)
+    frames = list(_synthetic_frames(width, height, fps * seconds))
+    backends = [
+        ('cv2 mp4v', dict(backend='cv2', fourcc='mp4v')),
+        ('cv2 MJPG', dict(backend='cv2', fourcc='MJPG')),
+        ('cv2 XVID', dict(backend='cv2', fourcc='XVID')),
+        ('ffmpeg x264 ultrafast', dict(backend='ffmpeg', preset='ultrafast', crf=23)),
+        ('ffmpeg x264 veryfast', dict(backend='ffmpeg', preset='veryfast', crf=23)),
+        ('ffmpeg x264 medium', dict(backend='ffmpeg', preset='medium', crf=23)),
+    ]
+    print(f"Video: encoding {len(frames)} frames at {width}x{height} ({seconds} s of video)")
+    for name, options in backends:
+        if options['backend'] == 'ffmpeg' and not ffmpeg_available():
+            print(f"Video: {name:<22} skipped (ffmpeg not installed)")
+            continue
+        base = os.path.join(directory, name.replace(' ', '_'))
+        try:
+            writer = open_encoder(base, width, height, fps, segment_seconds=2, **options)
+        except RuntimeError as e:
+            print(f"Video: {name:<22} skipped ({e})")
+            continue
+        cpu = time.process_time()
+        children = os.times()
+        start = time.perf_counter()
+        for frame in frames:
+            writer.write(frame)
+        writer.release()
+        elapsed = time.perf_counter() - start
+        after = os.times()
+        cpu = (time.process_time() - cpu
+               + (after.children_user - children.children_user) + (after.children_system - children.children_system))
+        size = sum(os.path.getsize(f) for f in writer.files)
+        print(f"Video: {name:<22} {len(frames) / elapsed:6.1f} fps, CPU {cpu / seconds * 100:5.0f}% of one core "
+              f"per real-time second, {size / seconds / 1e6 * 8:6.2f} Mbit/s, {len(writer.files)} segments")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import struct
+import time
+import numpy as np
+
+# File layout:
+#   b'VIDX' | uint32 header length | JSON header (padded to 64 bytes)
+#   then one fixed-size record per frame written to the video, in order.
+# Frame n of the recording is record n, so the file can be memory-mapped
+# and searched without parsing; a truncated trailing record is ignored.
+FILE_MAGIC = b'VIDX'
+FORMAT_VERSION = 1
+HEADER_ALIGN = 64
+FRAME_RECORD = np.dtype([
+    ('monotonic_ns', '<i8'),   # time.monotonic() at capture
+    ('wall_ns', '<i8'),        # time.time() at capture (same clock as the sensor CSVs)
+    ('capture_index', '<u4'),  # frame number from the capture stage
+    ('flags', '<u4'),
+])
+
+# Record flags
+REPEATED = 1    # no frame was captured for this slot; the previous one is repeated
+GAP_BEFORE = 2  # captured frames were lost (camera, dropped or skipped) just before this one
+LATE = 4        # reached the encoder later than the pipeline's max_latency
+FLAG_NAMES = {REPEATED: 'repeated', GAP_BEFORE: 'gap_before', LATE: 'late'}
+
+
+class FrameIndexWriter:
+    """
+    Sidecar with the capture times of every frame written to a video
+
+    Records are buffered and written in blocks of whole records, so a
+    crash loses at most the last block_frames frames of the index.
+    """
+
+    def __init__(self, filename, fps, width=None, height=None, segment_frames=None, video_pattern=None,
+                 metadata=None, block_frames=256):
+        self.filename = filename
+        self.block = np.zeros(block_frames, dtype=FRAME_RECORD)
+        self.pending = 0
+        self.frames_written = 0
+
+        header = {
+            'version': FORMAT_VERSION,
+            'fps': fps,
+            'width': width,
+            'height': height,
+            'segment_frames': segment_frames,
+            'video_pattern': video_pattern,
+            'created': time.time(),
+            'metadata': metadata or {},
+        }
+        payload = json.dumps(header).encode('utf-8')
+        used = len(FILE_MAGIC) + 4 + len(payload)
+        payload += b' ' * (-used % HEADER_ALIGN)
+
+        self.file = open(filename, 'wb')
+        self.file.write(FILE_MAGIC)
+        self.file.write(struct.pack('<I', len(payload)))
+        self.file.write(payload)
+
+    def append(self, monotonic, wall, capture_index, flags=0):
+        """Record the next video frame (times in seconds, as time.monotonic()/time.time())"""
+        record = self.block[self.pending]
+        record['monotonic_ns'] = int(monotonic * 1e9)
+        record['wall_ns'] = int(wall * 1e9)
+        record['capture_index'] = capture_index
+        record['flags'] = flags
+        self.pending += 1
+        self.frames_written += 1
+        if self.pending == len(self.block):
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.file.write(memoryview(self.block[:self.pending]).cast('B'))
+            self.pending = 0
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrameIndex:
+    """
+    Memory-mapped reader of a frame index sidecar
+
+    Lookups are binary searches over the mapped records, so a query is
+    O(log n) and opening an hours-long index does not read it.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            if f.read(4) != FILE_MAGIC:
+                raise ValueError(f"{filename} is not a video frame index")
+            header_len = struct.unpack('<I', f.read(4))[0]
+            self.header = json.loads(f.read(header_len).decode('utf-8'))
+        self.fps = self.header['fps']
+        self.segment_frames = self.header.get('segment_frames')
+        self.video_pattern = self.header.get('video_pattern')
+
+        start = 8 + header_len
+        count = max(0, os.path.getsize(filename) - start) // FRAME_RECORD.itemsize
+        if count:
+            self.records = np.memmap(filename, dtype=FRAME_RECORD, mode='r', offset=start, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=FRAME_RECORD)
+        self._wall_sorted = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def _search_times(self, t, clock):
+        """Sorted int64 times and the query in the same clock"""
+        if clock == 'monotonic':
+            return self.records['monotonic_ns'], int(t * 1e9)
+        if clock != 'wall':
+            raise ValueError(f"Unknown clock '{clock}' (expected 'wall' or 'monotonic')")
+        if self._wall_sorted is None:
+            self._wall_sorted = bool(np.all(np.diff(self.records['wall_ns']) >= 0))
+        if self._wall_sorted:
+            return self.records['wall_ns'], int(t * 1e9)
+        # The wall clock was stepped during the recording: map through the first frame's offset
+        first = self.records[0]
+        return self.records['monotonic_ns'], int(t * 1e9) - int(first['wall_ns']) + int(first['monotonic_ns'])
+
+    def frame_at(self, t, clock='wall'):
+        """Index of the frame captured closest to t (seconds, time.time() or time.monotonic())"""
+        if not len(self.records):
+            raise ValueError(f"{self.filename} has no frames")
+        times, target = self._search_times(t, clock)
+        i = int(np.searchsorted(times, target))
+        if i == 0:
+            return 0
+        if i == len(times):
+            return i - 1
+        return i if times[i] - target < target - times[i - 1] else i - 1
+
+    def frames_at(self, t, clock='wall'):
+        """Vectorized frame_at for an array of times"""
+        if len(self.records) < 2:
+            return np.zeros(np.shape(t), dtype=np.intp)
+        times, offset = self._search_times(0.0, clock)
+        targets = (np.asarray(t, dtype=np.float64) * 1e9).astype(np.int64) + offset
+        after = np.clip(np.searchsorted(times, targets), 1, len(times) - 1)
+        before = after - 1
+        return np.where(targets - times[before] <= times[after] - targets, before, after)
+
+    def frames_between(self, t0, t1, clock='wall'):
+        """range of the frames captured in [t0, t1)"""
+        times, a = self._search_times(t0, clock)
+        _, b = self._search_times(t1, clock)
+        return range(int(np.searchsorted(times, a)), int(np.searchsorted(times, b)))
+
+    def time_of(self, frame, clock='wall'):
+        """Capture time of a frame in seconds"""
+        return int(self.records[frame]['wall_ns' if clock == 'wall' else 'monotonic_ns']) / 1e9
+
+    def segment_of(self, frame):
+        """(video file, frame number within that file) for a frame of the recording"""
+        if not self.segment_frames:
+            return self.video_pattern, frame
+        segment, offset = divmod(frame, self.segment_frames)
+        return self.video_pattern % segment, offset
+
+    def summary(self):
+        if not len(self.records):
+            return f"{os.path.basename(self.filename)}: no frames"
+        flags = self.records['flags']
+        monotonic = self.records['monotonic_ns']
+        duration = (int(monotonic[-1]) - int(monotonic[0])) / 1e9
+        captured = np.count_nonzero((flags & REPEATED) == 0)
+        return (f"{os.path.basename(self.filename)}: {len(self)} frames, {duration:.1f} s, "
+                f"measured {captured / duration if duration else 0:.2f} fps (nominal {self.fps}), "
+                f"{np.count_nonzero(flags & REPEATED)} repeated, {np.count_nonzero(flags & GAP_BEFORE)} gaps, "
+                f"{np.count_nonzero(flags & LATE)} late")
+
+
+def _benchmark(hours=3.0, fps=30.0, queries=100_000, filename='frame_index_benchmark.fidx'):
+    """Write an hours-long index with jittered capture times and time the lookups"""
+    n = int(hours * 3600 * fps)
+    rng = np.random.default_rng(0)
+    intervals = 1 / fps + rng.normal(0, 0.002, n)
+    monotonic = 1000.0 + np.cumsum(np.abs(intervals))
+    wall = monotonic + 1.7e9
+
+    start = time.perf_counter()
+    with FrameIndexWriter(filename, fps, segment_frames=int(300 * fps), video_pattern='video_%03d.mp4') as writer:
+        for i in range(n):
+            writer.append(monotonic[i], wall[i], i, REPEATED if i % 1000 == 999 else 0)
+    write_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = FrameIndex(filename)
+    open_time = time.perf_counter() - start
+    targets = rng.uniform(wall[0], wall[-1], queries)
+    start = time.perf_counter()
+    found = [index.frame_at(t) for t in targets[:10000]]
+    query_time = (time.perf_counter() - start) / 10000
+    start = time.perf_counter()
+    vectorized = index.frames_at(targets)
+    vector_time = (time.perf_counter() - start) / queries
+    start = time.perf_counter()
+    scanned = [int(np.argmin(np.abs(wall - t))) for t in targets[:100]]
+    scan_time = (time.perf_counter() - start) / 100
+
+    assert found == vectorized[:10000].tolist()
+    assert scanned == vectorized[:100].tolist()
+    assert index.segment_of(9000) == ('video_001.mp4', 0)
+    assert index.frame_at(wall[-1] + 10) == n - 1 and index.frame_at(0) == 0
+    assert list(index.frames_between(wall[10], wall[20])) == list(range(10, 20))
+    print(f"Video: {index.summary()}")
+    print(f"Video: {os.path.getsize(filename) / 1e6:.1f} MB, written in {write_time:.1f} s, opened in "
+          f"{open_time * 1e3:.2f} ms; frame_at {query_time * 1e6:.1f} us, frames_at {vector_time * 1e6:.2f} us "
+          f"per query, linear scan {scan_time * 1e3:.1f} ms")
+    del index
+    os.remove(filename)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a video frame index or find the frame at a time")
+    parser.add_argument('index', nargs='?', help=".fidx file (runs the benchmark when omitted)")
+    parser.add_argument('times', nargs='*', type=float, help="Wall-clock times (time.time()) to look up")
+    args = parser.parse_args()
+    if not args.index:
+        _benchmark()
+        return
+    index = FrameIndex(args.index)
+    print(f"Video: {index.summary()}")
+    for t in args.times:
+        frame = index.frame_at(t)
+        video, offset = index.segment_of(frame)
+        print(f"Video: t={t:.3f} -> frame {frame} ({video} frame {offset}), "
+              f"captured at {index.time_of(frame):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import datetime
+import time
+import cv2
+import numpy as np
+
+DIGITS = '0123456789'
+
+
+class TimestampOverlay:
+    """
+    Timestamp label drawn into a fixed corner of every frame, in place
+
+    The label only changes once per second, so it is rendered with
+    cv2.putText into a small sprite when the second changes; every other
+    frame just copies (opaque background) or alpha-blends (background
+    None) that sprite into the ROI. No full-frame copy is made.
+
+    With frame_counter, a zero-padded frame number is shown before the
+    time for syncing against other streams. Its digits are pre-rendered
+    glyphs, so the per-frame cost is a few small copies, not a putText.
+
+    Args:
+        position (str): 'bottom_right' or 'top_left'
+        font_scale (float), color (tuple), thickness (int), line_type (int):
+            cv2.putText settings
+        background (tuple): Box color, or None to blend the text alone
+        margin (int): Distance from the frame edges
+        padding (int): Space between the text and the box edges
+        frame_counter (bool): Show the frame number
+        counter_digits (int): Width of the frame number (wraps beyond it)
+    """
+
+    def __init__(self, position='bottom_right', font_scale=0.6, color=(255, 255, 255), thickness=2,
+                 line_type=cv2.LINE_AA, background=(0, 0, 0), margin=10, padding=5, frame_counter=False,
+                 counter_digits=6, time_format='%Y-%m-%d %H:%M:%S', font=cv2.FONT_HERSHEY_SIMPLEX):
+        if position not in ('bottom_right', 'top_left'):
+            raise ValueError(f"Unknown overlay position '{position}'")
+        self.position = position
+        self.font = font
+        self.font_scale = font_scale
+        self.color = color
+        self.thickness = thickness
+        self.line_type = line_type
+        self.background = background
+        self.margin = margin
+        self.padding = padding
+        self.frame_counter = frame_counter
+        self.counter_digits = counter_digits
+        self.time_format = time_format
+
+        # Fixed layout: every digit gets the width of the widest one
+        sizes = [cv2.getTextSize(d, font, font_scale, thickness) for d in DIGITS]
+        self.digit_width = max(size[0][0] for size in sizes)
+        self.text_height = max(size[0][1] for size in sizes)
+        self.descent = max(size[1] for size in sizes)
+        template = datetime.datetime(2000, 1, 1).strftime(time_format)
+        self.time_width = sum(self.digit_width if c.isdigit() else self._width(c) for c in template)
+        self.counter_width = (self._width('#') + counter_digits * self.digit_width + self._width(' ')
+                              if frame_counter else 0)
+        self.box_width = self.counter_width + self.time_width + 2 * padding
+        self.box_height = self.text_height + self.descent + 2 * padding
+        self.baseline = padding + self.text_height
+
+        self.glyphs = [self._render(d, self.digit_width) for d in DIGITS]
+        self.second = None
+        self.sprite = None   # (image, alpha) of the whole box for the current second
+        self.roi = None      # (frame shape, frame slices, sprite slices)
+        self.blend = None    # text pixels to blend when there is no background
+        self.hash_width = self._width('#')
+        self.frames = 0
+        self.renders = 0
+
+    def _width(self, text):
+        return cv2.getTextSize(text, self.font, self.font_scale, self.thickness)[0][0]
+
+    def _render(self, text, width, fixed_digits=False):
+        """(BGR image, alpha or None) of text drawn on a box-high canvas"""
+        image = np.empty((self.box_height, width, 3), dtype=np.uint8)
+        image[:] = self.background if self.background is not None else 0
+        mask = np.zeros((self.box_height, width), dtype=np.uint8)
+        x = 0
+        # Draw character by character so digits stay on a fixed grid
+        for c in (text if fixed_digits else [text]):
+            advance = self.digit_width if c.isdigit() else self._width(c)
+            cv2.putText(image, c, (x, self.baseline), self.font, self.font_scale, self.color,
+                        self.thickness, self.line_type)
+            if self.background is None:
+                cv2.putText(mask, c, (x, self.baseline), self.font, self.font_scale, 255,
+                            self.thickness, self.line_type)
+            x += advance
+        if self.background is not None:
+            return image, None
+        if self.line_type != cv2.LINE_AA:
+            # Hard-edged text: a plain mask, so drawing it is a masked copy
+            return image, (mask >= 128).astype(np.float32)
+        return image, mask.astype(np.float32) / 255
+
+    def _render_second(self, second):
+        """Sprite of the whole box (counter area blank) for one second"""
+        label = datetime.datetime.fromtimestamp(second).strftime(self.time_format)
+        image = np.empty((self.box_height, self.box_width, 3), dtype=np.uint8)
+        image[:] = self.background if self.background is not None else 0
+        alpha = np.zeros((self.box_height, self.box_width), dtype=np.float32) if self.background is None else None
+
+        x = self.padding
+        if self.frame_counter:
+            hash_image, hash_alpha = self._render('#', self._width('#'))
+            image[:, x:x + hash_image.shape[1]] = hash_image
+            if alpha is not None:
+                alpha[:, x:x + hash_image.shape[1]] = hash_alpha
+            x += self.counter_width
+        text_image, text_alpha = self._render(label, self.time_width, fixed_digits=True)
+        image[:, x:x + self.time_width] = text_image
+        if alpha is not None:
+            alpha[:, x:x + self.time_width] = text_alpha
+        return image, alpha
+
+    def _blend_terms(self, sprite_slice):
+        """(image, mask, weights, inverse weights) of the clipped sprite:
+        a plain masked copy for hard-edged text, a weighted blend otherwise"""
+        image = np.ascontiguousarray(self.sprite[0][sprite_slice])
+        alpha = np.ascontiguousarray(self.sprite[1][sprite_slice])
+        if np.all((alpha == 0) | (alpha == 1)):
+            return image, alpha.astype(np.uint8), None, None
+        return image, None, alpha, 1 - alpha
+
+    def _locate(self, shape):
+        """Frame and sprite slices of the box, clipped to the frame"""
+        height, width = shape[:2]
+        if self.position == 'bottom_right':
+            x0 = width - self.margin - self.box_width
+            y0 = height - self.margin - self.box_height
+        else:
+            x0, y0 = self.margin, self.margin
+        fx0, fy0 = max(x0, 0), max(y0, 0)
+        fx1, fy1 = min(x0 + self.box_width, width), min(y0 + self.box_height, height)
+        frame_slice = (slice(fy0, fy1), slice(fx0, fx1))
+        sprite_slice = (slice(fy0 - y0, fy1 - y0), slice(fx0 - x0, fx1 - x0))
+        return shape, frame_slice, sprite_slice
+
+    def _draw_counter(self, index):
+        image, alpha = self.sprite[0], self.sprite[1]
+        x = self.padding + self.hash_width
+        number = index % (10 ** self.counter_digits)
+        for position in range(self.counter_digits - 1, -1, -1):
+            glyph_image, glyph_alpha = self.glyphs[number % 10]
+            number //= 10
+            cell = slice(x + position * self.digit_width, x + (position + 1) * self.digit_width)
+            image[:, cell] = glyph_image
+            if alpha is not None:
+                alpha[:, cell] = glyph_alpha
+
+    def __call__(self, frame, timestamp=None, index=None):
+        """
+        Draw the label on frame (modified in place)
+
+        Args:
+            frame (np.ndarray): BGR image
+            timestamp (float): Capture time (time.time()), default now
+            index (int): Frame number for the counter, default frames seen so far
+
+        Returns:
+            np.ndarray: The same frame
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        index = self.frames if index is None else index
+        self.frames += 1
+
+        second = int(timestamp)
+        if second != self.second:
+            self.second = second
+            self.sprite = self._render_second(second)
+            self.blend = None
+            self.renders += 1
+        if self.roi is None or self.roi[0] != frame.shape:
+            self.roi = self._locate(frame.shape)
+            self.blend = None
+        if self.frame_counter:
+            self._draw_counter(index)
+            self.blend = None
+
+        _, frame_slice, sprite_slice = self.roi
+        roi = frame[frame_slice]
+        if self.sprite[1] is None:
+            roi[:] = self.sprite[0][sprite_slice]
+            return frame
+        # Only the text is drawn; the rest of the box keeps the frame content
+        if self.blend is None:
+            self.blend = self._blend_terms(sprite_slice)
+        image, mask, weights, inverse = self.blend
+        if mask is not None:
+            cv2.copyTo(image, mask, roi)
+        else:
+            roi[:] = cv2.blendLinear(image, roi, weights, inverse)
+        return frame
+
+
+def _draw_per_frame(frame):
+    """The original VideoRecorder.add_timestamp (copy, strftime, getTextSize, rectangle, putText)"""
+    frame = frame.copy()
+    timestamp_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    font, font_scale, thickness = cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
+    text_size = cv2.getTextSize(timestamp_str, font, font_scale, thickness)[0]
+    text_x = frame.shape[1] - text_size[0] - 10
+    text_y = frame.shape[0] - 10
+    cv2.rectangle(frame, (text_x - 5, text_y - text_size[1] - 5), (text_x + text_size[0] + 5, text_y + 5),
+                  (0, 0, 0), -1)
+    cv2.putText(frame, timestamp_str, (text_x, text_y), font, font_scale, (255, 255, 255), thickness,
+                cv2.LINE_AA)
+    return frame
+
+
+def _benchmark(frames=300):
+    """Per-frame overlay cost at 720p and 1080p, 30 fps timestamps"""
+    variants = [
+        ('per-frame putText + copy', None),
+        ('sprite, opaque', dict()),
+        ('sprite, opaque + counter', dict(frame_counter=True)),
+        ('sprite, blended', dict(background=None, position='top_left', font_scale=1, color=(0, 255, 0),
+                                 line_type=cv2.LINE_8)),
+        ('sprite, blended + counter', dict(background=None, frame_counter=True)),
+    ]
+    rng = np.random.default_rng(0)
+    for width, height in ((1280, 720), (1920, 1080)):
+        frame = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        start_time = time.time()
+        for name, options in variants:
+            overlay = TimestampOverlay(**options) if options is not None else None
+            start = time.perf_counter()
+            for i in range(frames):
+                if overlay is None:
+                    _draw_per_frame(frame)
+                else:
+                    overlay(frame, start_time + i / 30)
+            cost = (time.perf_counter() - start) / frames
+            renders = f", {overlay.renders} renders" if overlay is not None else ""
+            print(f"Video: {height}p {name:<27} {cost * 1e6:8.1f} us/frame{renders}")
+
+    # The counter shows the frame index and the box matches the original position
+    overlay = TimestampOverlay(frame_counter=True)
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+    overlay(frame, 0.0, 123456)
+    first = frame.copy()
+    overlay(frame, 0.5, 123457)
+    assert not np.array_equal(first, frame) and frame[-11, -11].tolist() == [0, 0, 0]
+    overlay(frame, 0.9, 123456)
+    assert np.array_equal(first, frame), "Counter glyphs must be deterministic"
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,390 @@
+import collections
+import threading
+import time
+from video_index import REPEATED, GAP_BEFORE, LATE
+from video_preview import PreviewWindow
+
+# One captured frame: sequence number, capture time (time.time() and time.monotonic()) and the BGR image
+Frame = collections.namedtuple('Frame', ['index', 'timestamp', 'monotonic', 'image'])
+
+DROP_OLDEST = 'drop_oldest'  # keep the newest frames (bounded latency)
+DROP_NEWEST = 'drop_newest'  # keep the queued frames, reject the incoming one
+BLOCK = 'block'              # back-pressure: the producer waits (never use on the capture side)
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class FrameQueue:
+    """
+    Bounded queue between pipeline stages with an explicit policy when full
+
+    put() never raises: it returns False when a frame was dropped, and
+    dropped counts every frame lost to the policy.
+    """
+
+    def __init__(self, maxsize, policy=DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown drop policy '{policy}' (expected one of {POLICIES})")
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.items = collections.deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+        self.max_depth = 0
+
+    def put(self, item):
+        with self.condition:
+            if self.closed:
+                return False
+            if len(self.items) >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    self.items.popleft()
+                    self.dropped += 1
+                elif self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                else:
+                    while len(self.items) >= self.maxsize and not self.closed:
+                        self.condition.wait()
+                    if self.closed:
+                        return False
+            self.items.append(item)
+            self.max_depth = max(self.max_depth, len(self.items))
+            self.condition.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """Next item, or None on timeout or once the queue is closed and empty"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.items or self.closed, timeout)
+            if not self.items:
+                return None
+            item = self.items.popleft()
+            self.condition.notify_all()
+            return item
+
+    def close(self):
+        """No more puts; get() drains what is left, then returns None"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def __len__(self):
+        return len(self.items)
+
+
+class EncodeWorker:
+    """
+    Encode stage: a FrameQueue and a thread writing its frames to one file
+
+    With keep_timing frames are placed on the nominal fps grid by capture
+    time: a gap (dropped or late frames) repeats the previous frame and
+    frames more than one slot early are skipped, so the file keeps the
+    real-time duration of the session.
+
+    Args:
+        writer: Object with write(image), e.g. video_encoder.open_encoder()
+        fps (float): Nominal frame rate of the output file
+        queue_size (int), policy (str): Queue size (default one second of
+            frames) and drop policy
+        max_latency (float): Frames reaching the encoder later than this
+            (seconds after capture) are counted as late
+        frame_index (video_index.FrameIndexWriter): Receives the capture
+            times and flags of every frame written (owned by the caller)
+        overlay (callable): overlay(image, timestamp, index), drawn here
+            before writing (instead of in the capture thread)
+        on_error (callable): Called with the exception if writing fails
+    """
+
+    def __init__(self, writer, fps, queue_size=None, policy=DROP_OLDEST, max_latency=1.0, keep_timing=True,
+                 frame_index=None, overlay=None, on_error=None, name="Video-encode"):
+        self.writer = writer
+        self.fps = float(fps)
+        self.max_latency = max_latency
+        self.keep_timing = keep_timing
+        self.frame_index = frame_index
+        self.overlay = overlay
+        self.on_error = on_error
+        self.name = name
+        self.queue = FrameQueue(queue_size or max(2, int(round(self.fps))), policy)
+        self.thread = None
+        self.error = None
+
+        # Counters
+        self.encoded = 0   # frames written, including repeats
+        self.repeated = 0
+        self.skipped = 0
+        self.late = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self.thread.start()
+        return self
+
+    def put(self, frame):
+        """Queue a frame (never blocks unless the policy is BLOCK); False if it was dropped"""
+        return self.queue.put(frame)
+
+    def close(self):
+        """Write the queued frames and stop the thread"""
+        self.queue.close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _write(self, frame, flags):
+        self.writer.write(frame.image)
+        self.encoded += 1
+        if self.frame_index is not None:
+            self.frame_index.append(frame.monotonic, frame.timestamp, frame.index, flags)
+
+    def _loop(self):
+        period = 1.0 / self.fps
+        start = None
+        next_slot = 0
+        last = None   # last frame written
+        try:
+            while True:
+                frame = self.queue.get()
+                if frame is None:
+                    break
+                flags = 0
+                if time.time() - frame.timestamp > self.max_latency:
+                    self.late += 1
+                    flags |= LATE
+                # Captured frames missing before this one (dropped, skipped or never delivered)
+                if last is not None and (frame.index != last.index + 1
+                                         or frame.monotonic - last.monotonic > 1.5 * period):
+                    flags |= GAP_BEFORE
+
+                if self.keep_timing:
+                    if start is None:
+                        start = frame.monotonic
+                    slot = int((frame.monotonic - start) * self.fps + 0.5)
+                    if slot < next_slot - 1:
+                        self.skipped += 1
+                        continue
+                    while last is not None and next_slot < slot:
+                        self._write(last, REPEATED)
+                        self.repeated += 1
+                        next_slot += 1
+                if self.overlay is not None:
+                    self.overlay(frame.image, frame.timestamp, frame.index)
+                self._write(frame, flags)
+                next_slot += 1
+                last = frame
+        except Exception as e:
+            self.error = e
+            print(f"Video: Error during encoding: {e}")
+            self.queue.close()
+            if self.on_error is not None:
+                self.on_error(e)
+
+
+class VideoPipeline:
+    """
+    Capture -> encode (+ optional preview) in separate threads
+
+    The capture thread only reads frames, stamps them and hands them on,
+    so a slow encode or a stalled preview window no longer delays
+    cap.read(). The encode queue of the EncodeWorker (default one second
+    of frames, drop oldest) absorbs encoder hiccups. The preview (video_preview) runs in
+    its own thread at preview_fps and preview_scale and only ever sees
+    the latest frame; with preview=False (headless) no window is opened
+    and recording stops on stop_event alone.
+
+    Args:
+        capture: Object with read() -> (ok, image), e.g. cv2.VideoCapture
+        writer: Object with write(image), e.g. cv2.VideoWriter
+        fps (float): Nominal frame rate of the output file
+        preview (bool): Show a live preview window ('q' in it stops)
+        preview_fps (float), preview_scale (float): Preview rate and size
+        overlay (callable): overlay(image, timestamp, index), draws in place
+            on every frame in the capture thread (e.g. the timestamp)
+        encode_queue (int), encode_policy (str), max_latency (float),
+        keep_timing (bool), frame_index: See EncodeWorker
+    """
+
+    def __init__(self, capture, writer, fps, preview=True, overlay=None, encode_queue=None,
+                 encode_policy=DROP_OLDEST, max_latency=1.0, keep_timing=True,
+                 window_name='Recording - Press "q" to stop', max_read_failures=30, frame_index=None,
+                 preview_fps=10.0, preview_scale=0.5):
+        self.capture = capture
+        self.writer = writer
+        self.fps = float(fps)
+        self.preview = preview
+        self.overlay = overlay
+        self.window_name = window_name
+        self.max_read_failures = max_read_failures
+        self.encoder = EncodeWorker(writer, fps, encode_queue, encode_policy, max_latency, keep_timing,
+                                    frame_index, on_error=self._encode_failed)
+        self.preview_window = PreviewWindow(window_name, preview_fps, preview_scale,
+                                            on_key=self._on_key) if preview else None
+        self.stopping = threading.Event()
+        self.error = None
+
+        # Counters
+        self.captured = 0
+        self.read_failures = 0
+        self.capture_gaps = 0   # camera delivered a frame > 1.5 periods after the previous one
+        self.started = None
+        self.finished = None
+
+    def _capture_loop(self):
+        period = 1.0 / self.fps
+        previous = None
+        failures = 0
+        try:
+            while not self.stopping.is_set():
+                ok, image = self.capture.read()
+                now = time.monotonic()
+                timestamp = time.time()
+                if not ok:
+                    self.read_failures += 1
+                    failures += 1
+                    if failures >= self.max_read_failures:
+                        print("Video: Error: Could not read frame")
+                        break
+                    time.sleep(period / 2)
+                    continue
+                failures = 0
+                if previous is not None and now - previous > 1.5 * period:
+                    self.capture_gaps += 1
+                previous = now
+
+                if self.overlay is not None:
+                    self.overlay(image, timestamp, self.captured)
+                frame = Frame(self.captured, timestamp, now, image)
+                self.captured += 1
+                self.encoder.put(frame)
+                if self.preview_window is not None:
+                    self.preview_window.show(image)
+        except Exception as e:
+            self.error = e
+            print(f"Video: Error during capture: {e}")
+        finally:
+            self.stopping.set()
+
+    def _encode_failed(self, error):
+        self.error = error
+        self.stopping.set()
+
+    def _on_key(self, key):
+        if key == 'q':
+            self.stopping.set()
+
+    def run(self, stop_event):
+        """
+        Record until stop_event is set, 'q' is pressed in the preview or capture fails
+
+        Returns:
+            dict: stats()
+        """
+        self.started = time.monotonic()
+        if self.preview_window is not None:
+            self.preview_window.start()
+        capture_thread = threading.Thread(target=self._capture_loop, name="Video-capture", daemon=True)
+        self.encoder.start()
+        capture_thread.start()
+        try:
+            while not self.stopping.is_set() and not stop_event.is_set():
+                stop_event.wait(0.1)
+        finally:
+            self.stopping.set()
+            capture_thread.join()
+            if self.preview_window is not None:
+                self.preview_window.close()
+            # The encoder drains the queued frames before it exits
+            self.encoder.close()
+            self.finished = time.monotonic()
+        return self.stats()
+
+    def stats(self):
+        preview = self.preview_window
+        elapsed = ((self.finished or time.monotonic()) - self.started) if self.started else 0.0
+        return {
+            'seconds': round(elapsed, 2),
+            'captured': self.captured,
+            'capture_fps': round(self.captured / elapsed, 2) if elapsed else 0.0,
+            'encoded': self.encoder.encoded,
+            'repeated': self.encoder.repeated,
+            'skipped': self.encoder.skipped,
+            'dropped_encode': self.encoder.queue.dropped,
+            'dropped_preview': preview.skipped if preview is not None else 0,
+            'late': self.encoder.late,
+            'capture_gaps': self.capture_gaps,
+            'read_failures': self.read_failures,
+            'max_encode_queue': self.encoder.queue.max_depth,
+            'shown': preview.shown if preview is not None else 0,
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"{s['captured']} frames captured in {s['seconds']} s ({s['capture_fps']} fps), "
+                f"{s['encoded']} written ({s['repeated']} repeated, {s['skipped']} skipped), "
+                f"dropped {s['dropped_encode']} encode / {s['dropped_preview']} preview, "
+                f"{s['late']} late, {s['capture_gaps']} capture gaps")
+
+
+class _SyntheticCamera:
+    """
+    Camera stand-in: a frame every 1/fps s on a fixed clock; frames not
+    read in time are lost, as with a real driver's small buffer
+    """
+
+    def __init__(self, width=1920, height=1080, fps=30.0):
+        import numpy as np
+        self.fps = fps
+        self.start = time.monotonic()
+        self.last_slot = -1
+        self.lost = 0
+        self.image = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+    def read(self):
+        now = time.monotonic()
+        slot = int((now - self.start) * self.fps) + 1
+        time.sleep(max(0.0, self.start + slot / self.fps - now))
+        self.lost += max(0, slot - self.last_slot - 1)
+        self.last_slot = slot
+        return True, self.image.copy()
+
+
+class _SlowWriter:
+    """Encoder stand-in: `cost` s per frame plus a `stall` s hiccup every `stall_every` frames"""
+
+    def __init__(self, cost=0.02, stall=0.4, stall_every=60):
+        self.cost = cost
+        self.stall = stall
+        self.stall_every = stall_every
+        self.frames = 0
+
+    def write(self, image):
+        self.frames += 1
+        time.sleep(self.cost + (self.stall if self.frames % self.stall_every == 0 else 0.0))
+
+
+def _benchmark(seconds=5.0, fps=30.0):
+    """Serial read/write loop vs pipeline with a 1080p30 source and an encoder with periodic stalls"""
+    # Serial, as the original start_recording loop
+    camera, writer = _SyntheticCamera(fps=fps), _SlowWriter()
+    end = time.monotonic() + seconds
+    captured = 0
+    while time.monotonic() < end:
+        ok, image = camera.read()
+        writer.write(image.copy())
+        captured += 1
+    print(f"Video: serial   {captured / seconds:.1f} fps captured, {camera.lost} camera frames lost, "
+          f"file duration {writer.frames / fps:.1f} s of {seconds:.0f} s")
+
+    camera, writer = _SyntheticCamera(fps=fps), _SlowWriter()
+    pipeline = VideoPipeline(camera, writer, fps, preview=False)
+    stop_event = threading.Event()
+    threading.Timer(seconds, stop_event.set).start()
+    stats = pipeline.run(stop_event)
+    print(f"Video: pipeline {stats['capture_fps']:.1f} fps captured, {camera.lost} camera frames lost, "
+          f"file duration {writer.frames / fps:.1f} s of {stats['seconds']:.0f} s")
+    print(f"Video: {pipeline.summary()}")
+    assert camera.lost < 0.05 * stats['captured'] and stats['dropped_encode'] == 0, stats
+
+
+if __name__ == "__main__":
+    _benchmark()
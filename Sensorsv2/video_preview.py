@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+import time
+import cv2
+
+
+def gui_available():
+    """False when OpenCV was built without a GUI backend or there is no display to open a window on"""
+    build = cv2.getBuildInformation()
+    start = build.find('GUI:')
+    if start >= 0 and build[start:build.find('\n', start)].split(':', 1)[1].strip() == 'NONE':
+        return False
+    if sys.platform.startswith('linux') and not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')):
+        return False
+    return True
+
+
+class PreviewWindow:
+    """
+    Live view in its own thread, at a reduced rate and resolution
+
+    show() only keeps a reference to the latest frame, so the recording
+    loop never waits for the display. The window thread picks up the
+    newest frame every 1/fps s, downscales it and shows it; frames
+    replaced before being shown are counted in skipped. cv2.waitKey is
+    only called by that thread (it also paces it), and every key pressed
+    is passed to on_key(char).
+
+    If no window can be opened (headless OpenCV, no display), a warning
+    is printed and show() becomes a no-op: recording is not affected.
+
+    Args:
+        window_name (str): Title of the window
+        fps (float): Preview rate (None or 0: as fast as frames arrive)
+        scale (float): Size of the preview relative to the frame
+        on_key (callable): Called with each key pressed in the window
+    """
+
+    def __init__(self, window_name, fps=10.0, scale=0.5, on_key=None):
+        self.window_name = window_name
+        self.interval = 1.0 / fps if fps else 0.0
+        self.scale = scale
+        self.on_key = on_key
+        self.latest = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.available = True
+        self.shown = 0
+        self.skipped = 0
+
+    def start(self):
+        if not gui_available():
+            print("Video: ⚠️ No display available, recording without preview")
+            self.available = False
+            return self
+        self.thread = threading.Thread(target=self._loop, name="Video-preview", daemon=True)
+        self.thread.start()
+        return self
+
+    def show(self, image):
+        """Offer a frame to the preview (not copied: the caller must not modify it afterwards)"""
+        if not self.available:
+            return
+        with self.lock:
+            if self.latest is not None:
+                self.skipped += 1
+            self.latest = image
+
+    def _take(self):
+        with self.lock:
+            image, self.latest = self.latest, None
+            return image
+
+    def _loop(self):
+        opened = False
+        next_show = time.monotonic()
+        try:
+            while not self.stopped.is_set():
+                image = self._take()
+                if image is not None:
+                    if self.scale != 1.0:
+                        image = cv2.resize(image, None, fx=self.scale, fy=self.scale,
+                                           interpolation=cv2.INTER_AREA)
+                    cv2.imshow(self.window_name, image)
+                    opened = True
+                    self.shown += 1
+
+                next_show = max(next_show + self.interval, time.monotonic())
+                if not opened:
+                    self.stopped.wait(max(self.interval, 0.01))
+                    continue
+                # waitKey both services the window and sleeps until the next preview frame
+                key = cv2.waitKey(max(1, int((next_show - time.monotonic()) * 1000))) & 0xFF
+                if key != 0xFF and self.on_key is not None:
+                    self.on_key(chr(key))
+        except cv2.error as e:
+            message = (getattr(e, 'err', None) or str(e).strip() or type(e).__name__).split('. ')[0]
+            print(f"Video: ⚠️ Preview unavailable ({message}), recording without preview")
+            self.available = False
+        finally:
+            if opened:
+                try:
+                    cv2.destroyWindow(self.window_name)
+                    cv2.waitKey(1)
+                except cv2.error:
+                    pass
+
+    def close(self):
+        """Stop the window thread and close the window"""
+        self.stopped.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
@@ -1,34 +1,45 @@
-import cv2
 import datetime
 import threading
+from video_pipeline import VideoPipeline
+from video_overlay import TimestampOverlay
+from video_encoder import open_encoder
+from video_index import FrameIndexWriter, FrameIndex
+from camera_cache import CameraCache, open_camera_cached
 
 class VideoRecorder:
-    def __init__(self, camera_index=0):
+    def __init__(self, camera_index=0, frame_counter=False, encoder='auto', segment_seconds=300, headless=False,
+                 preview_fps=10, preview_scale=0.5):
         self.camera_index = camera_index
+        self.headless = headless                # No window: stop only through stop_event
+        self.preview_fps = preview_fps          # Preview refresh rate and size (recording is not affected)
+        self.preview_scale = preview_scale
+        self.encoder = encoder                  # 'ffmpeg', 'cv2' or 'auto' (see video_encoder)
+        self.segment_seconds = segment_seconds  # New file every N seconds (None: one file)
         self.is_recording = False
         self.video_writer = None
         self.cap = None
+        self.pipeline = None
+        self.frame_index = None
+        self.camera_cache = CameraCache()       # Backend, modes and real fps per camera (camera_cache.json)
+        
+        # Timestamp label (and optional frame number), rendered once per second
+        self.overlay = TimestampOverlay(frame_counter=frame_counter)
         
         # 16:9 resolution (you can change these values)
         self.width = 1280   # 1280x720 (HD)
         self.height = 720   # You can also use 1920x1080 (Full HD)
     
     def setup_camera(self):
-        """Configure camera with 16:9 resolution"""
-        self.cap = cv2.VideoCapture(self.camera_index)
+        """Configure camera with 16:9 resolution (cached backend and mode, see camera_cache)"""
+        self.cap, config = open_camera_cached(self.camera_index, self.width, self.height, self.camera_cache)
         
         # Check if camera opened successfully
-        if not self.cap.isOpened():
-            print(f"Video: Error: Could not open camera {self.camera_index}")
+        if self.cap is None:
             return False
         
-        # Force 16:9 resolution
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
-        
-        # Check actual resolution accepted by camera
-        actual_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        actual_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        # Resolution accepted by camera
+        actual_width = config['width']
+        actual_height = config['height']
         
         print(f"Video: Requested resolution: {self.width}x{self.height}")
         print(f"Video: Camera's actual resolution: {actual_width}x{actual_height}")
@@ -39,58 +50,29 @@ class VideoRecorder:
             self.width = actual_width
             self.height = actual_height
         
-        # Get FPS
-        fps = int(self.cap.get(cv2.CAP_PROP_FPS))
+        # Measured FPS (what the camera really delivers, not what the driver reports)
+        fps = int(round(config['fps']))
         if fps == 0:
             fps = 30  # Default value
         
         return fps, self.width, self.height
     
     def create_video_writer(self, fps, width, height):
-        """Create object to write video in MP4 format"""
+        """Create the MP4 encoder (ffmpeg pipe, or cv2.VideoWriter with mp4v as fallback)"""
         # Generate filename with timestamp
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"video_16x9_{timestamp}.mp4"
         
-        # Define codec for MP4
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        self.video_writer = open_encoder(f"video_16x9_{timestamp}", width, height, fps, backend=self.encoder,
+                                         segment_seconds=self.segment_seconds, fourcc='mp4v')
         
-        self.video_writer = cv2.VideoWriter(filename, fourcc, fps, (width, height))
-        return filename
+        # Sidecar with the capture time of every frame (see video_index.FrameIndex)
+        self.frame_index = FrameIndexWriter(f"video_16x9_{timestamp}.fidx", fps, width, height,
+                                            self.video_writer.segment_frames, self.video_writer.pattern)
+        return self.video_writer.pattern
     
-    def add_timestamp(self, frame):
-        """Add timestamp to bottom right corner"""
-        # Get current date and time
-        now = datetime.datetime.now()
-        timestamp_str = now.strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Configure text
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        font_scale = 0.6
-        color = (255, 255, 255)  # White
-        thickness = 2
-        
-        # Get text size
-        text_size = cv2.getTextSize(timestamp_str, font, font_scale, thickness)[0]
-        
-        # Position (bottom right corner with margin)
-        margin = 10
-        text_x = frame.shape[1] - text_size[0] - margin
-        text_y = frame.shape[0] - margin
-        
-        # Add semi-transparent background for better readability
-        bg_color = (0, 0, 0)  # Black
-        bg_margin = 5
-        cv2.rectangle(frame, 
-                     (text_x - bg_margin, text_y - text_size[1] - bg_margin),
-                     (text_x + text_size[0] + bg_margin, text_y + bg_margin),
-                     bg_color, -1)
-        
-        # Add text
-        cv2.putText(frame, timestamp_str, (text_x, text_y), 
-                   font, font_scale, color, thickness, cv2.LINE_AA)
-        
-        return frame
+    def add_timestamp(self, frame, timestamp=None, index=None):
+        """Add timestamp (capture time, default now) to bottom right corner, in place"""
+        return self.overlay(frame, timestamp, index)
     
     def start_recording(self, stop_event):
         """Start recording"""
@@ -104,30 +86,21 @@ class VideoRecorder:
         filename = self.create_video_writer(fps, width, height)
         
         self.is_recording = True
-        print(f"Video: Recording to: {filename}")
+        print(f"Video: Recording to: {filename} ({self.video_writer.backend} encoder)")
         print(f"Video: Resolution: {width}x{height} ({(width/height):.2f}:1 ratio)")
-        print("Video: Press 'q' to stop recording")
+        if self.headless:
+            print("Video: Headless mode, recording until the session stops")
+        else:
+            print("Video: Press 'q' in the preview window to stop recording")
         
         try:
-            while self.is_recording and not stop_event.is_set():
-                ret, frame = self.cap.read()
-                
-                if not ret:
-                    print("Video: Error: Could not read frame")
-                    break
-                
-                # Add timestamp to frame
-                frame_with_timestamp = self.add_timestamp(frame.copy())
-                
-                # Write frame to video
-                self.video_writer.write(frame_with_timestamp)
-                
-                # Show video in real time
-                cv2.imshow('Recording - Press "q" to stop', frame_with_timestamp)
-                
-                # Exit if 'q' is pressed
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+            # Capture, encoding and preview run in separate stages, so a slow
+            # encode or window stall does not hold up cap.read()
+            self.pipeline = VideoPipeline(self.cap, self.video_writer, fps, preview=not self.headless,
+                                          overlay=self.add_timestamp, frame_index=self.frame_index,
+                                          preview_fps=self.preview_fps, preview_scale=self.preview_scale)
+            self.pipeline.run(stop_event)
+            print(f"Video: {self.pipeline.summary()}")
                     
         except Exception as e:
             print(f"Video: Error during recording: {e}")
@@ -143,20 +116,31 @@ class VideoRecorder:
             self.video_writer.release()
             print("Video: Video saved successfully")
         
+        if self.frame_index is not None and not self.frame_index.file.closed:
+            self.frame_index.close()
+            print(f"Video: {FrameIndex(self.frame_index.filename).summary()}")
+        
         if self.cap is not None:
             self.cap.release()
-        
-        cv2.destroyAllWindows()
+            self.cap = None
+        # The preview window is closed by its own thread (video_preview.PreviewWindow)
 
-def record_video(stop_event, camera_index=0):
+def record_video(stop_event, camera_index=0, frame_counter=False, encoder='auto', segment_seconds=300,
+                 headless=False, preview_fps=10, preview_scale=0.5):
     """
     Function to record video
     
     Args:
         stop_event: Event to signal when to stop
         camera_index (int): Camera index (default 0)
+        frame_counter (bool): Burn the frame number next to the timestamp
+        encoder (str): 'ffmpeg', 'cv2' or 'auto' (ffmpeg when installed)
+        segment_seconds (float): Start a new file every N seconds (None: one file)
+        headless (bool): No preview window; recording stops with stop_event
+        preview_fps (float), preview_scale (float): Preview refresh rate and size
     """
-    recorder = VideoRecorder(camera_index)
+    recorder = VideoRecorder(camera_index, frame_counter, encoder, segment_seconds, headless, preview_fps,
+                             preview_scale)
     try:
         recorder.start_recording(stop_event)
     except Exception as e:
@@ -3,6 +3,7 @@ import datetime
 import threading
 import time
 import sys
+from camera_cache import CameraCache, open_camera_cached
 
 class VideoRecorder:
     def __init__(self, camera_index=0):
@@ -10,70 +11,46 @@ class VideoRecorder:
         self.is_recording = False
         self.video_writer = None
         self.cap = None
+        self.camera_cache = CameraCache()   # Backend, modes and real fps per camera (camera_cache.json)
         
         # 16:9 resolution (you can change these values)
         self.width = 1280   # 1280x720 (HD)
         self.height = 720   # You can also use 1920x1080 (Full HD)
     
     def setup_camera(self):
-        """Configure camera with robust error handling"""
+        """Open the camera with its cached backend and mode (probes only on a cache miss or mismatch)"""
         print(f"Video: Attempting to open camera at index {self.camera_index}")
         
-        # Try different backends if available
-        backends = [
-            cv2.CAP_DSHOW,  # DirectShow (Windows)
-            cv2.CAP_ANY     # Auto-detect
-        ]
-        
-        for backend in backends:
-            try:
-                self.cap = cv2.VideoCapture(self.camera_index, backend)
-                if self.cap.isOpened():
-                    print(f"Video: Successfully opened camera with backend {backend}")
-                    break
-            except Exception as e:
-                print(f"Video: Error with backend {backend}: {e}")
-        
-        # If still not opened, try without specifying backend
-        if not self.cap or not self.cap.isOpened():
-            self.cap = cv2.VideoCapture(self.camera_index)
+        self.cap, config = open_camera_cached(self.camera_index, self.width, self.height, self.camera_cache)
         
         # Check if camera opened successfully
-        if not self.cap.isOpened():
-            print(f"Video: Error: Could not open camera {self.camera_index}")
-            
+        if self.cap is None:
             # Try alternative camera indices
             for i in range(1, 4):  # Try indices 1, 2, 3
+                if i == self.camera_index:
+                    continue
                 print(f"Video: Trying alternative camera index {i}")
-                self.cap = cv2.VideoCapture(i)
-                if self.cap.isOpened():
+                self.cap, config = open_camera_cached(i, self.width, self.height, self.camera_cache)
+                if self.cap is not None:
                     print(f"Video: Successfully opened camera at index {i}")
                     self.camera_index = i
                     break
             
-            if not self.cap.isOpened():
+            if self.cap is None:
                 print("Video: Could not open any camera")
                 return False
         
-        # Try to set resolution
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
-        
-        # Check actual resolution accepted by camera
-        actual_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        actual_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        
         print(f"Video: Requested resolution: {self.width}x{self.height}")
-        print(f"Video: Camera's actual resolution: {actual_width}x{actual_height}")
+        print(f"Video: Camera's actual resolution: {config['width']}x{config['height']}")
         
         # If camera doesn't support requested resolution, use available
-        if actual_width != self.width or actual_height != self.height:
+        if config['width'] != self.width or config['height'] != self.height:
             print("Video: Using camera's native resolution")
-            self.width = actual_width
-            self.height = actual_height
+            self.width = config['width']
+            self.height = config['height']
         
-        # Get FPS
-        fps = int(self.cap.get(cv2.CAP_PROP_FPS))
+        # Measured FPS (what the camera really delivers, not what the driver reports)
+        fps = int(round(config['fps']))
         if fps == 0:
             fps = 30  # Default value
         
@@ -3,8 +3,11 @@ import sys
 from bleak import BleakClient
 from datetime import datetime
 from pathlib import Path
-import pandas as pd
+import numpy as np
 import keyboard  # pip install keyboard
+from columnar_logger import ColumnarCsvLogger
+from Sensorsv2.eda import EdaStream
+from Sensorsv2.gsr_calibration import GsrCalibration, STATUS_NAMES
 
 # BLE config
 ESP32_MAC = "08:A6:F7:6B:37:C2"
@@ -14,45 +17,43 @@ CHARACTERISTIC_UUID = "beb5483e-36e1-4688-b7f5-ea07361b26a8"
 ADC_RESOLUTION = 4095
 VCC = 3.3
 R_FIXED = 10000
+# Conversion table for all 4096 ADC codes (0 = saturado, 4095 = circuito abierto -> NaN)
+CALIBRACION = GsrCalibration(vcc=VCC, r_fixed=R_FIXED, adc_max=ADC_RESOLUTION)
 
-# Thresholds for impulse detection
-THRESHOLD_MIN = 0.1
-THRESHOLD_MAX = 0.5
+# Skin conductance response (impulse) detection
+SAMPLE_RATE = 4  # Hz, one read every 0.25 s
+SCR_MIN_AMPLITUDE = 0.1  # µS
+
+CSV_COLUMNS = ["timestamp", "datetime", "ADC", "microsiemens", "impulse"]
+CSV_DTYPES = [np.float64, None, np.int64, np.float64, np.bool_]
 
 # Global control
-csv_path = None
+registro = None
 guardando = False
-ventana_gsr = []
+eda_stream = EdaStream(SAMPLE_RATE, min_amplitude=SCR_MIN_AMPLITUDE)
 
 # Windows event loop policy
 if sys.platform.startswith('win'):
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-def adc_to_microsiemens(adc_value, vcc=VCC, adc_resolution=ADC_RESOLUTION, r_fixed=R_FIXED):
-    v_out = adc_value / adc_resolution * vcc
-    try:
-        r_skin = r_fixed * (v_out / (vcc - v_out))
-        microsiemens = (1 / r_skin) * 1e6
-    except ZeroDivisionError:
-        microsiemens = 0
-    return microsiemens
+def adc_to_microsiemens(adc_value):
+    # NaN for saturated / open-circuit codes instead of a misleading 0
+    return float(CALIBRACION.convert(adc_value))
 
 def crear_archivo_csv():
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     nombre_archivo = f"GSR_data_{timestamp}.csv"
     ruta = Path.cwd() / nombre_archivo
-    df = pd.DataFrame(columns=["timestamp", "datetime", "ADC", "microsiemens", "impulse"])
-    df.to_csv(ruta, index=False)
+    registro = ColumnarCsvLogger(ruta, CSV_COLUMNS, CSV_DTYPES)
     print(f"📝 Guardado iniciado: {ruta}")
-    return ruta
+    return registro
 
-def guardar_lectura(ruta, ts_unix, ts_human, adc, microsiemens, impulse):
-    df = pd.DataFrame([[ts_unix, ts_human, adc, microsiemens, impulse]],
-                      columns=["timestamp", "datetime", "ADC", "microsiemens", "impulse"])
-    df.to_csv(ruta, mode='a', header=False, index=False)
+def guardar_lectura(registro, ts_unix, ts_human, adc, microsiemens, impulse):
+    # Buffered in memory, written to disk in blocks
+    registro.append(ts_unix, ts_human, adc, microsiemens, impulse)
 
 async def run():
-    global guardando, csv_path, ventana_gsr
+    global guardando, registro
     client = BleakClient(ESP32_MAC)
     try:
         await client.connect()
@@ -70,28 +71,33 @@ async def run():
                 ts_unix = datetime.now().timestamp()
                 ts_human = datetime.now().isoformat(sep=' ', timespec='milliseconds')
 
-                # Media móvil y detección de impulso
-                ventana_gsr.append(gsr_uS)
-                if len(ventana_gsr) > 10:
-                    ventana_gsr.pop(0)
-                media_movil = sum(ventana_gsr) / len(ventana_gsr)
-                delta = gsr_uS - media_movil
-                impulse = THRESHOLD_MIN < delta < THRESHOLD_MAX
+                # Componentes tónica/fásica y detección de impulso (SCR)
+                if np.isnan(gsr_uS):
+                    print(f"⚠️ ADC {adc}: {STATUS_NAMES[int(CALIBRACION.status(adc))]}")
+                    tonic = phasic = float('nan')
+                    scr = None
+                else:
+                    tonic, phasic, scr = eda_stream.push(gsr_uS)
+                impulse = scr is not None
 
                 # Mostrar
-                print(f"[{ts_unix:.3f}] {ts_human} → ADC: {adc} → {gsr_uS:.2f} µS | Δ={delta:.2f} → Impulse: {impulse}")
+                print(f"[{ts_unix:.3f}] {ts_human} → ADC: {adc} → {gsr_uS:.2f} µS | "
+                      f"tónica={tonic:.2f} fásica={phasic:.2f} → Impulse: {impulse}")
+                if impulse:
+                    print(f"⚡ SCR: amplitud {scr['amplitude_us']:.2f} µS, subida {scr['rise_time_s']:.2f} s")
 
                 # Comenzar/detener guardado
                 if keyboard.is_pressed('s') and not guardando:
-                    csv_path = crear_archivo_csv()
+                    registro = crear_archivo_csv()
                     guardando = True
 
                 elif keyboard.is_pressed('q') and guardando:
+                    registro.close()
                     print("🛑 Guardado detenido.")
                     guardando = False
 
                 if guardando:
-                    guardar_lectura(csv_path, ts_unix, ts_human, adc, gsr_uS, impulse)
+                    guardar_lectura(registro, ts_unix, ts_human, adc, gsr_uS, impulse)
 
             except Exception as e:
                 print(f"⚠️ Error: {e}")
@@ -101,6 +107,8 @@ async def run():
     except asyncio.CancelledError:
         print("\n🔚 Interrupción recibida, desconectando...")
     finally:
+        if registro is not None:
+            registro.close()
         if client.is_connected:
             await client.disconnect()
             print("✅ Dispositivo BLE desconectado.")
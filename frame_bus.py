@@ -0,0 +1,650 @@
+import argparse
+import collections
+import os
+import threading
+import time
+from datetime import datetime
+import cv2
+import numpy as np
+from columnar_logger import ColumnarCsvLogger
+from vision_metrics import CSV_COLUMNS, CSV_DTYPES, SUMMARY_COLUMNS, attention_fatigue, hand_orientation
+
+# One published frame: sequence number, capture time (time.time()) and the
+# shared images. Both are read-only: analyzers that draw must copy first.
+BusFrame = collections.namedtuple('BusFrame', ['index', 'timestamp', 'bgr', 'rgb'])
+
+# FatigueAnalyzer result: face landmarks, head angles (degrees) and flags; all None without a face
+FatigueResult = collections.namedtuple('FatigueResult',
+                                       ['face', 'pitch', 'yaw', 'roll', 'ear', 'attention', 'fatigue'])
+# One hand found by HandOrientationAnalyzer, angles in degrees
+HandPose = collections.namedtuple('HandPose', ['label', 'landmarks', 'pitch', 'roll', 'yaw'])
+
+
+class LatestSlot:
+    """
+    One-frame mailbox between the bus and one analyzer
+
+    put() replaces whatever frame is waiting (counted in skipped), so a
+    slow analyzer always gets the newest frame and never holds up the
+    capture loop or the other analyzers.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.frame = None
+        self.closed = False
+        self.skipped = 0
+
+    def put(self, frame):
+        with self.condition:
+            if self.frame is not None:
+                self.skipped += 1
+            self.frame = frame
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """Newest frame not taken yet, or None on timeout or once closed"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.frame is not None or self.closed, timeout)
+            frame, self.frame = self.frame, None
+            return frame
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class Analyzer:
+    """
+    Plugin run by a FrameBus in its own worker thread
+
+    Subclasses implement process(frame) and return any result; setup()
+    and close() create and free the model inside the worker thread, and
+    draw(image, result) renders a result onto a copy of the frame for the
+    preview. frame.bgr and frame.rgb are shared by all analyzers and
+    read-only.
+    """
+
+    name = 'analyzer'
+
+    def setup(self):
+        pass
+
+    def process(self, frame):
+        raise NotImplementedError
+
+    def draw(self, image, result):
+        pass
+
+    def close(self):
+        pass
+
+
+class _MediaPipeAnalyzer(Analyzer):
+    """Common part of the MediaPipe solutions: model created in setup(), RGB frame in, results out"""
+
+    def __init__(self, **options):
+        self.options = options
+        self.model = None
+
+    def _create(self, mp):
+        raise NotImplementedError
+
+    def setup(self):
+        import mediapipe as mp   # Optional dependency, only needed by these plugins
+        self.mp = mp
+        self.model = self._create(mp)
+
+    def process(self, frame):
+        # A read-only array is passed to MediaPipe by reference, without a copy
+        return self.model.process(frame.rgb)
+
+    def close(self):
+        if self.model is not None:
+            self.model.close()
+
+
+class HandsAnalyzer(_MediaPipeAnalyzer):
+    """mediapipe Hands (as OnlyHand.py / Hand_rotation_inclination.py / HandsCobot_mezzaninne.py)"""
+
+    name = 'hands'
+
+    def __init__(self, static_image_mode=False, max_num_hands=2, min_detection_confidence=0.7, **options):
+        super().__init__(static_image_mode=static_image_mode, max_num_hands=max_num_hands,
+                         min_detection_confidence=min_detection_confidence, **options)
+
+    def _create(self, mp):
+        return mp.solutions.hands.Hands(**self.options)
+
+    def draw(self, image, result):
+        drawing, hands = self.mp.solutions.drawing_utils, self.mp.solutions.hands
+        for hand in result.multi_hand_landmarks or []:
+            drawing.draw_landmarks(image, hand, hands.HAND_CONNECTIONS)
+
+
+class FaceMeshAnalyzer(_MediaPipeAnalyzer):
+    """mediapipe FaceMesh (as head_rotation.py / detector_atencion_fatiga.py)"""
+
+    name = 'face_mesh'
+
+    def __init__(self, static_image_mode=False, max_num_faces=1, **options):
+        super().__init__(static_image_mode=static_image_mode, max_num_faces=max_num_faces, **options)
+
+    def _create(self, mp):
+        return mp.solutions.face_mesh.FaceMesh(**self.options)
+
+    def draw(self, image, result):
+        drawing, face_mesh = self.mp.solutions.drawing_utils, self.mp.solutions.face_mesh
+        for face in result.multi_face_landmarks or []:
+            drawing.draw_landmarks(image, face, face_mesh.FACEMESH_CONTOURS, landmark_drawing_spec=None)
+
+
+class HolisticAnalyzer(_MediaPipeAnalyzer):
+    """mediapipe Holistic: pose and both hands (as POSE_detection.py)"""
+
+    name = 'holistic'
+
+    def __init__(self, static_image_mode=False, model_complexity=1, **options):
+        super().__init__(static_image_mode=static_image_mode, model_complexity=model_complexity, **options)
+
+    def _create(self, mp):
+        return mp.solutions.holistic.Holistic(**self.options)
+
+    def draw(self, image, result):
+        drawing, holistic = self.mp.solutions.drawing_utils, self.mp.solutions.holistic
+        drawing.draw_landmarks(image, result.left_hand_landmarks, holistic.HAND_CONNECTIONS)
+        drawing.draw_landmarks(image, result.right_hand_landmarks, holistic.HAND_CONNECTIONS)
+        drawing.draw_landmarks(image, result.pose_landmarks, holistic.POSE_CONNECTIONS)
+
+
+class HandOrientationAnalyzer(HandsAnalyzer):
+    """Hands plus pitch, roll and yaw of every hand (as Hand_rotation_inclination.py); result: [HandPose]"""
+
+    name = 'hand_orientation'
+
+    def process(self, frame):
+        return self.measure(super().process(frame))
+
+    def measure(self, results):
+        hands = []
+        for landmarks, handedness in zip(results.multi_hand_landmarks or [], results.multi_handedness or []):
+            pitch, roll, yaw = hand_orientation(landmarks.landmark)
+            hands.append(HandPose(handedness.classification[0].label, landmarks, pitch, roll, yaw))
+        return hands
+
+    def draw(self, image, result):
+        drawing, hands = self.mp.solutions.drawing_utils, self.mp.solutions.hands
+        for hand in result:
+            drawing.draw_landmarks(image, hand.landmarks, hands.HAND_CONNECTIONS)
+            text = f"{hand.label} Hand Pitch: {hand.pitch:.1f} Roll: {hand.roll:.1f} Yaw: {hand.yaw:.1f}"
+            cv2.putText(image, text, (10, 120 if hand.label == 'Left' else 150), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.6, (0, 255, 0), 2)
+
+
+class FatigueAnalyzer(FaceMeshAnalyzer):
+    """
+    Attention and fatigue from head pose and eye aspect ratio (as detector_atencion_fatiga.py)
+
+    Runs FaceMesh on the shared RGB frame and applies
+    vision_metrics.attention_fatigue to the first face. With csv_path,
+    every frame with a face is logged in the columns of
+    detector_atencion_fatiga.py (stamped with the capture time), and
+    close() writes summary_<name> with the attention and fatigue
+    percentages next to it.
+    """
+
+    name = 'fatigue'
+
+    def __init__(self, csv_path=None, **options):
+        super().__init__(**options)
+        self.csv_path = csv_path
+        self.logger = None
+        self.frames = 0
+        self.attention_frames = 0
+        self.fatigue_frames = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    def process(self, frame):
+        return self.measure(frame, super().process(frame))
+
+    def measure(self, frame, results):
+        if not results.multi_face_landmarks:
+            return FatigueResult(None, None, None, None, None, None, None)
+        face = results.multi_face_landmarks[0]
+        height, width = frame.rgb.shape[:2]
+        coords = [(p.x * width, p.y * height) for p in face.landmark]
+        pitch, yaw, roll, ear, attention, fatigue = attention_fatigue(frame.rgb, coords)
+
+        self.frames += 1
+        self.attention_frames += attention
+        self.fatigue_frames += fatigue
+        if self.first_timestamp is None:
+            self.first_timestamp = frame.timestamp
+        self.last_timestamp = frame.timestamp
+        if self.csv_path is not None:
+            if self.logger is None:
+                self.logger = ColumnarCsvLogger(self.csv_path, CSV_COLUMNS, CSV_DTYPES)
+            ts_human = datetime.fromtimestamp(frame.timestamp).isoformat(sep=' ', timespec='milliseconds')
+            self.logger.append(frame.timestamp, ts_human, yaw, pitch, roll, ear, attention, fatigue)
+        return FatigueResult(face, pitch, yaw, roll, ear, attention, fatigue)
+
+    def percentages(self):
+        """(attention %, fatigue %) over the frames with a face"""
+        if not self.frames:
+            return 0.0, 0.0
+        return self.attention_frames / self.frames * 100, self.fatigue_frames / self.frames * 100
+
+    def draw(self, image, result):
+        if result.face is None:
+            return
+        drawing, face_mesh = self.mp.solutions.drawing_utils, self.mp.solutions.face_mesh
+        drawing.draw_landmarks(image, result.face, face_mesh.FACEMESH_CONTOURS, landmark_drawing_spec=None)
+        cv2.putText(image, f"Yaw: {result.yaw:.1f}, Pitch: {result.pitch:.1f}, Roll: {result.roll:.1f}",
+                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0) if result.attention else (0, 0, 255), 2)
+        cv2.putText(image, f"EAR: {result.ear:.2f} | Fatigue: {result.fatigue}", (10, 60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0) if result.fatigue else (200, 255, 200), 2)
+        attention_pct, fatigue_pct = self.percentages()
+        cv2.putText(image, f"Attn: {attention_pct:.1f}%, Fatigue: {fatigue_pct:.1f}%", (10, 90),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (180, 255, 180), 2)
+
+    def close(self):
+        super().close()
+        if self.logger is None:
+            return
+        self.logger.close()
+        attention_pct, fatigue_pct = self.percentages()
+        directory, name = os.path.split(str(self.csv_path))
+        summary_path = os.path.join(directory, 'summary_' + name)
+        with ColumnarCsvLogger(summary_path, SUMMARY_COLUMNS, block_rows=1) as summary:
+            summary.append(self.last_timestamp - self.first_timestamp, self.frames, self.attention_frames,
+                           self.fatigue_frames, round(attention_pct, 2), round(fatigue_pct, 2))
+        print(f"Vision: {self.frames} frames with a face, attention {attention_pct:.1f}%, "
+              f"fatigue {fatigue_pct:.1f}% -> {self.csv_path}")
+
+
+PLUGINS = {cls.name: cls for cls in (HandsAnalyzer, FaceMeshAnalyzer, HolisticAnalyzer,
+                                     HandOrientationAnalyzer, FatigueAnalyzer)}
+
+
+class _Worker:
+    """Thread feeding one analyzer from its LatestSlot"""
+
+    def __init__(self, analyzer, on_result=None):
+        self.analyzer = analyzer
+        self.name = analyzer.name
+        self.on_result = on_result
+        self.slot = LatestSlot()
+        self.thread = None
+        self.latest = (None, None)   # (frame, result) of the last processed frame
+        self.processed = 0
+        self.errors = 0
+        self.busy = 0.0              # seconds spent in process()
+        self.latency = 0.0           # sum of capture -> result delays
+        self.started = None
+        self.failed = None
+
+    def start(self):
+        self.started = time.monotonic()
+        self.thread = threading.Thread(target=self._loop, name=f"Vision-{self.name}", daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        try:
+            self.analyzer.setup()
+        except Exception as e:
+            self.failed = e
+            print(f"Vision: ⚠️ {self.name} could not start: {e}")
+            return
+        try:
+            while True:
+                frame = self.slot.get()
+                if frame is None:
+                    break
+                start = time.perf_counter()
+                try:
+                    result = self.analyzer.process(frame)
+                except Exception as e:
+                    self.errors += 1
+                    if self.errors == 1:
+                        print(f"Vision: ⚠️ {self.name} failed on frame {frame.index}: {e}")
+                    continue
+                self.busy += time.perf_counter() - start
+                self.latency += time.time() - frame.timestamp
+                self.processed += 1
+                self.latest = (frame, result)
+                if self.on_result is not None:
+                    self.on_result(self.name, frame, result)
+        finally:
+            self.analyzer.close()
+
+    def stop(self):
+        self.slot.close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def stats(self, elapsed):
+        return {
+            'processed': self.processed,
+            'fps': round(self.processed / elapsed, 2) if elapsed else 0.0,
+            'skipped': self.slot.skipped,
+            'errors': self.errors,
+            'process_ms': round(self.busy / self.processed * 1e3, 2) if self.processed else 0.0,
+            'latency_ms': round(self.latency / self.processed * 1e3, 2) if self.processed else 0.0,
+            'running': self.failed is None,
+        }
+
+
+class FrameBus:
+    """
+    One camera, many analyzers
+
+    A single capture thread reads each frame, flips it if asked, converts
+    it to RGB once and publishes the pair to every analyzer's LatestSlot.
+    Each analyzer runs in its own worker thread at its own pace: a slow
+    model only skips frames, it never delays capture or a faster model.
+    MediaPipe releases the GIL while a graph runs, so the models run in
+    parallel.
+
+    Args:
+        capture: Object with read() -> (ok, image), e.g. cv2.VideoCapture
+        analyzers (list): Analyzer instances (names must be unique)
+        flip (bool): Mirror frames horizontally (selfie view)
+        on_result (callable): on_result(name, frame, result), called in the
+            analyzer's worker thread after every processed frame
+    """
+
+    def __init__(self, capture, analyzers, flip=False, on_result=None, max_read_failures=30):
+        names = [a.name for a in analyzers]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Analyzer names must be unique: {names}")
+        self.capture = capture
+        self.flip = flip
+        self.max_read_failures = max_read_failures
+        self.workers = {a.name: _Worker(a, on_result) for a in analyzers}
+        self.stopping = threading.Event()
+        self.thread = None
+        self.latest_frame = None
+        self.captured = 0
+        self.conversions = 0
+        self.read_failures = 0
+        self.error = None
+        self.started = None
+        self.finished = None
+
+    def latest(self, name):
+        """(frame, result) of the last frame processed by an analyzer"""
+        return self.workers[name].latest
+
+    def _capture_loop(self):
+        failures = 0
+        try:
+            while not self.stopping.is_set():
+                ok, image = self.capture.read()
+                timestamp = time.time()
+                if not ok:
+                    self.read_failures += 1
+                    failures += 1
+                    if failures >= self.max_read_failures:
+                        print("Vision: Error: Could not read frame")
+                        break
+                    time.sleep(0.01)
+                    continue
+                failures = 0
+                if self.flip:
+                    image = cv2.flip(image, 1)
+                rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+                self.conversions += 1
+                image.flags.writeable = False
+                rgb.flags.writeable = False
+                frame = BusFrame(self.captured, timestamp, image, rgb)
+                self.captured += 1
+                self.latest_frame = frame
+                for worker in self.workers.values():
+                    worker.slot.put(frame)
+        except Exception as e:
+            self.error = e
+            print(f"Vision: Error during capture: {e}")
+        finally:
+            self.stopping.set()
+
+    def start(self):
+        self.started = time.monotonic()
+        for worker in self.workers.values():
+            worker.start()
+        self.thread = threading.Thread(target=self._capture_loop, name="Vision-capture", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+        for worker in self.workers.values():
+            worker.stop()
+        self.finished = time.monotonic()
+
+    def run(self, stop_event):
+        """Run until stop_event is set or capture fails; returns stats()"""
+        self.start()
+        try:
+            while not self.stopping.is_set() and not stop_event.is_set():
+                stop_event.wait(0.1)
+        finally:
+            self.stop()
+        return self.stats()
+
+    def stats(self):
+        elapsed = ((self.finished or time.monotonic()) - self.started) if self.started else 0.0
+        return {
+            'seconds': round(elapsed, 2),
+            'captured': self.captured,
+            'capture_fps': round(self.captured / elapsed, 2) if elapsed else 0.0,
+            'rgb_conversions': self.conversions,
+            'read_failures': self.read_failures,
+            'analyzers': {name: worker.stats(elapsed) for name, worker in self.workers.items()},
+        }
+
+    def summary(self):
+        s = self.stats()
+        lines = [f"{s['captured']} frames in {s['seconds']} s ({s['capture_fps']} fps), "
+                 f"{s['rgb_conversions']} RGB conversions"]
+        for name, a in s['analyzers'].items():
+            state = "" if a['running'] else " (not running)"
+            lines.append(f"  {name}: {a['processed']} frames ({a['fps']} fps), {a['skipped']} skipped, "
+                         f"{a['process_ms']} ms per frame, {a['latency_ms']} ms latency, "
+                         f"{a['errors']} errors{state}")
+        return "\n".join(lines)
+
+
+class _SyntheticCamera:
+    """Camera stand-in: a new frame every 1/fps s"""
+
+    def __init__(self, width=640, height=480, fps=30.0):
+        self.fps = fps
+        self.start = time.monotonic()
+        self.frame = 0
+        self.image = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+    def read(self):
+        self.frame += 1
+        time.sleep(max(0.0, self.start + self.frame / self.fps - time.monotonic()))
+        return True, self.image.copy()
+
+
+class _SleepAnalyzer(Analyzer):
+    """Model stand-in: sleeps `cost` s per frame (releases the GIL like a native model)"""
+
+    def __init__(self, name, cost):
+        self.name = name
+        self.cost = cost
+        self.checked = 0
+
+    def process(self, frame):
+        if self.checked < 3:
+            # Every analyzer sees the same shared, read-only RGB conversion
+            assert not frame.rgb.flags.writeable and not frame.bgr.flags.writeable
+            assert np.array_equal(frame.rgb, frame.bgr[..., ::-1])
+            self.checked += 1
+        time.sleep(self.cost)
+        return frame.index
+
+
+def _self_test(seconds=4.0, fps=30.0):
+    """Fast, medium and slow analyzers on one synthetic camera, against a serial loop"""
+    costs = {'hands': 0.012, 'face_mesh': 0.02, 'holistic': 0.12}
+
+    # Serial, as one script calling every model on every frame
+    camera = _SyntheticCamera(fps=fps)
+    analyzers = [_SleepAnalyzer(name, cost) for name, cost in costs.items()]
+    end = time.monotonic() + seconds
+    frames = 0
+    while time.monotonic() < end:
+        ok, image = camera.read()
+        for analyzer in analyzers:
+            rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            rgb.flags.writeable = image.flags.writeable = False
+            analyzer.process(BusFrame(frames, time.time(), image, rgb))
+        frames += 1
+    print(f"Vision: serial {frames / seconds:.1f} fps for every model, {frames * len(costs)} RGB conversions")
+
+    bus = FrameBus(_SyntheticCamera(fps=fps), [_SleepAnalyzer(name, cost) for name, cost in costs.items()])
+    stop_event = threading.Event()
+    threading.Timer(seconds, stop_event.set).start()
+    stats = bus.run(stop_event)
+    print(f"Vision: bus\n{bus.summary()}")
+    # The capture loop keeps the camera rate and converts each frame once, whatever the models cost
+    assert stats['captured'] >= 0.95 * fps * seconds and stats['rgb_conversions'] == stats['captured'], stats
+    fast, slow = stats['analyzers']['hands'], stats['analyzers']['holistic']
+    assert fast['processed'] >= 0.9 * stats['captured'], fast
+    assert slow['processed'] >= 0.8 * seconds / costs['holistic'], slow
+    assert slow['skipped'] > 0 and fast['skipped'] < slow['skipped'], stats
+    print("Vision: frame bus self-test passed")
+
+
+def _synthetic_face(yaw, ear, width=640, height=480):
+    """FaceMesh-like results for a face turned by `yaw` degrees with eyes open to `ear`"""
+    from types import SimpleNamespace
+    from vision_metrics import LANDMARKS, MODEL_POINTS, POSE_LANDMARKS, camera_matrix
+
+    rvec = np.array([0.0, np.radians(yaw), 0.0])  # turned about the vertical axis
+    projected, _ = cv2.projectPoints(MODEL_POINTS, rvec, np.array([0.0, 0.0, 600.0]),
+                                     camera_matrix(width, height), np.zeros((4, 1)))
+    points = np.full((468, 2), (width / 2, height / 2))
+    for name, point in zip(POSE_LANDMARKS, projected.reshape(-1, 2)):
+        points[LANDMARKS[name]] = point
+    # Eyes 30 px wide starting at the projected outer corners, lids opened to the given ratio
+    for eye, corner in (('left_eye', 0), ('right_eye', 3)):
+        indices = LANDMARKS[eye]
+        start = points[indices[corner]] - (0 if corner == 0 else np.array([30.0, 0.0]))
+        lid = ear * 30 / 2
+        shape = [(0, 0), (10, -lid), (20, -lid), (30, 0), (20, lid), (10, lid)]
+        for index, offset in zip(indices, shape):
+            if index != indices[corner]:
+                points[index] = start + offset
+    landmarks = [SimpleNamespace(x=x / width, y=y / height, z=0.0) for x, y in points]
+    return SimpleNamespace(multi_face_landmarks=[SimpleNamespace(landmark=landmarks)])
+
+
+def _plugin_self_test():
+    """FatigueAnalyzer and HandOrientationAnalyzer measurements and CSV output, on synthetic landmarks"""
+    import csv
+    import tempfile
+    from types import SimpleNamespace
+
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'attention_fatigue_test.csv')
+        fatigue = FatigueAnalyzer(csv_path=path)
+        # Facing the camera with open eyes, turned away, eyes closing, no face
+        cases = [(0.0, 0.30), (30.0, 0.30), (5.0, 0.10)]
+        for i, (yaw, ear) in enumerate(cases):
+            result = fatigue.measure(BusFrame(i, 1.7e9 + i, image, image), _synthetic_face(yaw, ear))
+            assert abs(abs(result.yaw) - yaw) < 0.5 and abs(result.ear - ear) < 1e-6, result[1:]
+            assert result.attention == (yaw < 15) and result.fatigue == (ear < 0.23), result[1:]
+        empty = fatigue.measure(BusFrame(3, 1.7e9 + 3, image, image), SimpleNamespace(multi_face_landmarks=None))
+        assert empty.face is None
+        fatigue.close()
+        with open(path) as f:
+            rows = list(csv.DictReader(f))
+        assert [row['attention'] for row in rows] == ['True', 'False', 'True']
+        assert [row['fatigue'] for row in rows] == ['False', 'False', 'True']
+        with open(os.path.join(directory, 'summary_attention_fatigue_test.csv')) as f:
+            summary = next(csv.DictReader(f))
+        assert summary['total_frames'] == '3' and float(summary['attention_pct']) == round(200 / 3, 2)
+
+    def hand(yaw):
+        points = [SimpleNamespace(x=0.5, y=0.6, z=0.0) for _ in range(21)]
+        points[9] = SimpleNamespace(x=0.5, y=0.4, z=0.0)
+        points[5] = SimpleNamespace(x=0.45, y=0.42, z=0.0)
+        points[17] = SimpleNamespace(x=0.45 + 0.13 * np.cos(np.radians(yaw)),
+                                     y=0.42 + 0.13 * np.sin(np.radians(yaw)), z=0.0)
+        return SimpleNamespace(landmark=points)
+
+    results = SimpleNamespace(multi_hand_landmarks=[hand(0.0), hand(30.0)],
+                              multi_handedness=[SimpleNamespace(classification=[SimpleNamespace(label=label)])
+                                                for label in ('Left', 'Right')])
+    left, right = HandOrientationAnalyzer().measure(results)
+    assert left.label == 'Left' and np.allclose([left.pitch, left.roll, left.yaw], 0, atol=1e-9), left
+    assert abs(right.yaw - 30) < 1e-9 and abs(right.pitch) < 1e-9, right
+    print("Vision: fatigue and hand orientation plugins self-test passed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several MediaPipe analyzers on one camera")
+    parser.add_argument('plugins', nargs='*', help=f"Analyzers to run: {', '.join(PLUGINS)} "
+                                                   f"(default: hand_orientation fatigue)")
+    parser.add_argument('--camera', type=int, default=0)
+    parser.add_argument('--flip', action='store_true', help="Mirror the image (selfie view)")
+    parser.add_argument('--preview-fps', type=float, default=15.0)
+    parser.add_argument('--log', action='store_true',
+                        help="Write attention_fatigue_<time>.csv (and its summary) from the fatigue analyzer")
+    parser.add_argument('--self-test', action='store_true', help="Run the synthetic camera test")
+    args = parser.parse_args()
+    if args.self_test:
+        _self_test()
+        _plugin_self_test()
+        return
+    plugins = args.plugins or ['hand_orientation', 'fatigue']
+    unknown = [name for name in plugins if name not in PLUGINS]
+    if unknown:
+        parser.error(f"Unknown analyzer(s) {', '.join(unknown)}")
+
+    from Sensorsv2.camera_cache import open_camera_cached
+    from Sensorsv2.video_preview import PreviewWindow
+    cap, config = open_camera_cached(args.camera, 640, 480)
+    if cap is None:
+        return
+    options = {name: {} for name in plugins}
+    if args.log and 'fatigue' in options:
+        options['fatigue']['csv_path'] = f"attention_fatigue_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    bus = FrameBus(cap, [PLUGINS[name](**options[name]) for name in plugins], flip=args.flip).start()
+    stop_event = threading.Event()
+    preview = PreviewWindow("Vision - Press 'q' to stop", args.preview_fps, 1.0,
+                            on_key=lambda key: key in ('q', '\x1b') and stop_event.set()).start()
+    print("Press Ctrl+C (or 'q' in the preview) to stop")
+    try:
+        while not stop_event.is_set() and not bus.stopping.is_set():
+            stop_event.wait(1.0 / args.preview_fps)
+            frame = bus.latest_frame
+            if frame is None or not preview.available:
+                continue
+            # Draw the latest result of every analyzer on a copy of the newest frame
+            image = frame.bgr.copy()
+            for name, worker in bus.workers.items():
+                result = worker.latest[1]
+                if result is not None:
+                    worker.analyzer.draw(image, result)
+            preview.show(image)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        preview.close()
+        bus.stop()
+        cap.release()
+        print(f"Vision: {bus.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import math
+import cv2
+import numpy as np
+
+# Face mesh landmark indices
+LANDMARKS = {
+    "nose_tip": 1,
+    "chin": 152,
+    "left_eye_corner": 33,
+    "right_eye_corner": 263,
+    "left_mouth_corner": 61,
+    "right_mouth_corner": 291,
+    # p1..p6 of the eye aspect ratio: corner, two upper lid, corner, two lower lid points
+    "left_eye": [33, 160, 158, 133, 153, 144],
+    "right_eye": [362, 385, 387, 263, 373, 380],
+}
+
+# 3D face model (approximate, in mm), same order as the pose landmarks above
+MODEL_POINTS = np.array([
+    [0.0, 0.0, 0.0],         # Nose tip
+    [0.0, -63.6, -12.5],     # Chin
+    [-43.3, 32.7, -26.0],    # Left eye corner
+    [43.3, 32.7, -26.0],     # Right eye corner
+    [-28.9, -28.9, -24.1],   # Left mouth corner
+    [28.9, -28.9, -24.1]     # Right mouth corner
+], dtype=np.float64)
+POSE_LANDMARKS = ["nose_tip", "chin", "left_eye_corner", "right_eye_corner", "left_mouth_corner",
+                  "right_mouth_corner"]
+
+ATTENTION_MAX_YAW = 15    # degrees
+FATIGUE_MIN_PITCH = -15   # degrees, head dropping
+FATIGUE_MAX_EAR = 0.23    # eyes closing
+
+# attention_fatigue_*.csv written by detector_atencion_fatiga.py and frame_bus.FatigueAnalyzer
+CSV_COLUMNS = ["timestamp", "datetime", "yaw", "pitch", "roll", "ear", "attention", "fatigue"]
+CSV_DTYPES = [np.float64, None, np.float64, np.float64, np.float64, np.float64, np.bool_, np.bool_]
+SUMMARY_COLUMNS = ["total_time_s", "total_frames", "attention_frames", "fatigue_frames",
+                   "attention_pct", "fatigue_pct"]
+
+
+def camera_matrix(width, height):
+    """Pinhole camera with the focal length approximated by the image width"""
+    return np.array([
+        [width, 0, width / 2],
+        [0, width, height / 2],
+        [0, 0, 1]
+    ], dtype=np.float64)
+
+
+def get_head_pose(image, landmarks):
+    """
+    Head pitch, yaw and roll in degrees
+
+    Args:
+        image: Frame (only its size is used)
+        landmarks: Pixel (x, y) of every face mesh landmark
+
+    Returns:
+        tuple: (pitch, yaw, roll)
+    """
+    image_points = np.array([landmarks[LANDMARKS[name]] for name in POSE_LANDMARKS], dtype=np.float64)
+    height, width = image.shape[:2]
+    success, rotation_vector, _ = cv2.solvePnP(MODEL_POINTS, image_points, camera_matrix(width, height),
+                                               np.zeros((4, 1)))
+    rmat, _ = cv2.Rodrigues(rotation_vector)
+    angles, _, _, _, _, _ = cv2.RQDecomp3x3(rmat)
+    pitch, yaw, roll = angles
+    return pitch, yaw, roll
+
+
+def compute_ear(eye_landmarks):
+    """Eye aspect ratio of six (x, y) eye points p1..p6: (|p2-p6| + |p3-p5|) / (2 |p1-p4|)"""
+    p = np.asarray(eye_landmarks, dtype=np.float64)
+    horizontal = np.linalg.norm(p[0] - p[3])
+    vertical = np.linalg.norm(p[1] - p[5]) + np.linalg.norm(p[2] - p[4])
+    return vertical / (2.0 * horizontal) if horizontal != 0 else 0
+
+
+def attention_fatigue(image, landmarks):
+    """
+    Head pose, eye aspect ratio and the attention / fatigue flags of one face
+
+    Returns:
+        tuple: (pitch, yaw, roll, ear, attention, fatigue)
+    """
+    pitch, yaw, roll = get_head_pose(image, landmarks)
+    ear_left = compute_ear([landmarks[i] for i in LANDMARKS["left_eye"]])
+    ear_right = compute_ear([landmarks[i] for i in LANDMARKS["right_eye"]])
+    ear = (ear_left + ear_right) / 2.0
+    attention = abs(yaw) < ATTENTION_MAX_YAW
+    fatigue = pitch < FATIGUE_MIN_PITCH or ear < FATIGUE_MAX_EAR
+    return pitch, yaw, roll, ear, attention, fatigue
+
+
+def calculate_angle(p1, p2, p3):
+    """Angle p1-p2-p3 in degrees between landmarks with x, y, z"""
+    v1 = np.array([p1.x - p2.x, p1.y - p2.y, p1.z - p2.z])
+    v2 = np.array([p3.x - p2.x, p3.y - p2.y, p3.z - p2.z])
+    angle_rad = math.atan2(np.linalg.norm(np.cross(v1, v2)), np.dot(v1, v2))
+    return np.degrees(angle_rad)
+
+
+def hand_orientation(landmarks):
+    """
+    Pitch, roll and yaw of a hand in degrees from MediaPipe Hands landmarks
+
+    Uses the wrist (0), index MCP (5), middle MCP (9) and pinky MCP (17):
+    the palm normal gives pitch and roll, the index-to-pinky line the yaw.
+    """
+    wrist = landmarks[0]
+    index_mcp = landmarks[5]
+    pinky_mcp = landmarks[17]
+    middle_mcp = landmarks[9]
+
+    # Hand axis (wrist to middle MCP) and lateral axis (index MCP to pinky MCP)
+    hand_vector = np.array([middle_mcp.x - wrist.x, middle_mcp.y - wrist.y, middle_mcp.z - wrist.z])
+    lateral_vector = np.array([pinky_mcp.x - index_mcp.x, pinky_mcp.y - index_mcp.y, pinky_mcp.z - index_mcp.z])
+
+    # Palm normal
+    normal_vector = np.cross(hand_vector, lateral_vector)
+    normal_vector /= np.linalg.norm(normal_vector)
+    lateral_vector /= np.linalg.norm(lateral_vector)
+
+    pitch = math.asin(-normal_vector[1])                    # Rotation about X
+    roll = math.atan2(normal_vector[0], normal_vector[2])   # Rotation about Z
+    yaw = math.atan2(lateral_vector[1], lateral_vector[0])  # Lateral turn (Y)
+    return np.degrees(pitch), np.degrees(roll), np.degrees(yaw)